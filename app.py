@@ -3,16 +3,147 @@ import core.extractor as extractor
 import core.visualizer_mermaid as visualizer_mermaid
 import core.generator as generator
 import core.validator as validator
+from core import cache
+from core import compactor
+from core import metrics
+from core import resilience
+from core import rule_index
+from core import service
+from core import store
+from core.zones import ZONE_PRIORITY, classify_rules
 import json
+import sqlite3
+import time
 
 st.set_page_config(page_title="Logic Foundry", layout="wide")
 
+# With LOGIC_FOUNDRY_SERVICE_URL set, model stages run as jobs on a shared core.service
+# process (its pool and cache are shared by every reviewer); otherwise they run in-process.
+SERVICE = service.ServiceClient() if service.SERVICE_URL else None
+
+# --- Memoized derived artifacts ---
+# Streamlit re-runs this script on every interaction. These are keyed by the logic hash
+# (the leading-underscore argument is not hashed), so reruns reuse the previous results.
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_mermaid(logic_hash, _logic_data, view="auto", page=1, page_size=visualizer_mermaid.PAGE_SIZE, expand=()):
+    with metrics.timer("logic_foundry_render_seconds", renderer="mermaid"):
+        return visualizer_mermaid.generate_mermaid(_logic_data, view, page, page_size, expand)
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def cached_exports(logic_hash, _logic_data):
+    rules = _logic_data.get("rules", [])
+    stats = _logic_data.get("stats", {})
+    zone_counts = {}
+    for zone in classify_rules(rules):
+        zone_counts[zone] = zone_counts.get(zone, 0) + 1
+    return {
+        "json_bytes": json.dumps(_logic_data, indent=2).encode("utf-8"),
+        "rule_count": stats.get("rule_count", len(rules)),
+        "complexity_score": stats.get("complexity_score", 0),
+        "zone_counts": zone_counts,
+        # Flat rows for the paginated rule table
+        "rows": [
+            {"id": r.get("id", ""), "trigger": r.get("trigger", ""), "action": r.get("action", ""), "reason": r.get("reason", "")}
+            for r in rules
+        ]
+    }
+
+def save_artifact(method, *args):
+    # History is best effort: a locked or read-only database must not break the analysis
+    if not st.session_state.get('save_history', True):
+        return None
+    try:
+        return getattr(store.get_store(), method)(*args)
+    except (sqlite3.Error, OSError) as e:
+        st.toast(f"Not saved to history: {e}")
+        return None
+
+def index_rules(logic_data, logic_hash):
+    # Adds the rules to the cross-module catalog; best effort, like the history
+    if not st.session_state.get('save_history', True):
+        return
+    try:
+        rule_index.get_index().index_module(logic_data, logic_hash, source=logic_data.get("module_name"))
+    except (sqlite3.Error, OSError) as e:
+        st.toast(f"Not added to the rule catalog: {e}")
+
+def remote_stage(kind, **params):
+    # Runs one stage as a service job: yields its partial results while polling and returns
+    # the job result. The Cancel button stops the job on the service, not just this page.
+    job = SERVICE.submit(kind, **params)
+    cancel = st.empty()
+    cancel.button("Cancel", key=f"cancel_{job['id']}", on_click=cancel_job, args=(job["id"],))
+    try:
+        return (yield from SERVICE.follow(job["id"]))
+    finally:
+        cancel.empty()
+
+def remote_result(kind, **params):
+    progress = remote_stage(kind, **params)
+    while True:
+        try:
+            next(progress)
+        except StopIteration as done:
+            return done.value
+
+def cancel_job(job_id):
+    try:
+        SERVICE.cancel(job_id)
+        st.toast("Job cancelled")
+    except service.ServiceError as e:
+        st.toast(f"Could not cancel: {e}")
+
+def remote_extract_stream(code_text, model_name, use_cache):
+    # Same contract as extractor.extract_logic_stream: yields rules, returns the result
+    try:
+        job_result = yield from remote_stage("extract", code=code_text, model=model_name, mode="stream", use_cache=use_cache)
+        return job_result["logic"]
+    except service.ServiceError as e:
+        return {"error": f"Extraction service failed: {e}"}
+
+def remote_extract(code_text, model_name, use_cache, mode="chunked", state=None):
+    try:
+        job_result = remote_result("extract", code=code_text, model=model_name, mode=mode, state=state, use_cache=use_cache)
+        return job_result["logic"], job_result["state"]
+    except service.ServiceError as e:
+        return {"error": f"Extraction service failed: {e}"}, state
+
+def remote_generate_all(logic_json, languages, model_name, use_cache):
+    # Same contract as generator.generate_all: (language, code) pairs as each one completes
+    finished = set()
+    try:
+        for language, code in remote_stage("generate", logic=logic_json, languages=languages, model=model_name, use_cache=use_cache):
+            finished.add(language)
+            yield language, code
+    except service.ServiceError as e:
+        for language in languages:
+            if language not in finished:
+                yield language, f"# Error generating code with the service: {e}"
+
+def remote_validate(logic_json, code_text, model_name, use_cache, target_language, local_execution=False):
+    try:
+        return remote_result("validate", logic=logic_json, code=code_text, model=model_name, use_cache=use_cache, target_language=target_language, local_execution=local_execution)["report"]
+    except service.ServiceError as e:
+        return {"score": 0, "status": "ERROR", "summary": f"Validation failed to run: {e}", "discrepancies": []}
+
+def open_artifact(artifact):
+    # Restores a stored analysis into the session exactly as if it had just been produced
+    st.session_state['logic_data'] = artifact["logic_data"]
+    st.session_state['logic_hash'] = artifact["logic_hash"]
+    st.session_state['modern_codes'] = artifact["modern_codes"]
+    st.session_state['audits'] = artifact["audits"]
+    st.session_state.pop('modern_code_lang', None)
+    if artifact.get("source") is not None:
+        st.session_state['code_input'] = artifact["source"]
+
 st.title("Logic Foundry 🏭")
 st.markdown("Extract and visualize business logic from code.")
 
 # Sidebar Configuration
 with st.sidebar:
     st.header("Settings")
+    if SERVICE is not None:
+        st.caption(f"Model stages run on the shared service at {SERVICE.base_url}; its cache and reliability settings apply.")
     # OpenRouter Model Selection
     model_name = st.selectbox(
         "AI Model", 
@@ -25,37 +156,215 @@ with st.sidebar:
         ]
     )
 
+    extraction_mode = st.radio(
+        "Extraction Mode",
+        ["Streaming", "Incremental", "Map-reduce"],
+        help=(
+            "Streaming shows rules as soon as the model emits them. "
+            "Incremental re-analyzes only the functions changed since the last run and keeps rule IDs stable. "
+            "Map-reduce splits large files and extracts the pieces concurrently."
+        )
+    )
+
+    # Result Cache
+    st.subheader("Result Cache")
+    refresh_cache = st.checkbox("Bypass cache (force refresh)", value=False, help="Re-run every stage against the model and overwrite the cached result.")
+    use_cache = not refresh_cache
+    cache_stats = cache.get_cache().stats()
+    c_col1, c_col2 = st.columns(2)
+    c_col1.metric("Cache Hits", cache_stats["hits"])
+    c_col2.metric("Cache Misses", cache_stats["misses"])
+    if st.button("Clear Cache"):
+        cache.get_cache().clear()
+        st.toast("Cache cleared")
+
+    # Prompt Compaction
+    st.subheader("Prompt Compaction")
+    compact_prompts = st.checkbox("Compact prompts", value=True, help="Strip comments, blank lines and repeated blocks from code and minify rule JSON before each model call.")
+    compact_stats = compactor.stats()
+    p_col1, p_col2 = st.columns(2)
+    p_col1.metric("Tokens Saved", compact_stats["tokens_saved"])
+    p_col2.metric("Prompt Shrink", f"{compact_stats['saved_ratio']:.0%}")
+
+    # Reliability
+    st.subheader("Reliability")
+    deadline = st.number_input("Request deadline (s)", min_value=10, max_value=600, value=int(resilience.settings()["deadline"]), step=10, help="Total time a model call may take, retries included. Timeouts, 429s and 5xx errors are retried with backoff.")
+    hedge = st.checkbox(
+        f"Hedge slow requests ({resilience.HEDGE_MODEL})",
+        value=resilience.settings()["hedge"],
+        help="If the selected model is slower than its recent p95, send the same request to the fallback model and use whichever answers first."
+    )
+    # Passed with each model call, so one session's choice never changes another's
+    llm_policy = {"deadline": deadline, "hedge": hedge}
+
+    # Verification
+    st.subheader("Verification")
+    local_execution = st.checkbox(
+        "Run generated Python locally",
+        value=False,
+        help="Check thresholds in Python implementations by executing the generated code on this machine before asking the model. The code is not sandboxed: it runs with this app's file and network access, so only enable this for code you trust. A shared service must be started with --allow-local-execution."
+    )
+    if local_execution:
+        st.warning("Audits of Python implementations will execute the generated code on this machine.")
+
+    # History: extractions, generated code and audits persisted in the artifact store
+    st.subheader("History")
+    st.checkbox("Save analyses to history", value=True, key="save_history", help="Keep every extraction, generated implementation and audit in a local database so it can be reopened without new model calls.")
+    try:
+        history = store.get_store().history()
+    except (sqlite3.Error, OSError) as e:
+        history = []
+        st.caption(f"History unavailable: {e}")
+    if history:
+        picked = st.selectbox(
+            "Previous analyses",
+            history,
+            format_func=lambda row: f"{row['module_name']} · {row['rule_count']} rules · {time.strftime('%Y-%m-%d %H:%M', time.localtime(row['opened']))}"
+        )
+        if st.button("Open", help=f"{picked['languages']} implementations, {picked['audits']} audits stored"):
+            artifact = store.get_store().load(picked["logic_hash"])
+            if artifact is not None:
+                open_artifact(artifact)
+                st.toast(f"Opened {artifact['module_name']}")
+    else:
+        st.caption("No saved analyses yet.")
+
+    h_col1, h_col2 = st.columns(2)
+    if h_col1.button("Export History", disabled=not history):
+        st.session_state['history_export'] = store.get_store().export_archive()
+    if st.session_state.get('history_export'):
+        h_col2.download_button("Download", st.session_state['history_export'], file_name="logic_foundry_history.jsonl.gz", mime="application/gzip")
+    uploaded = st.file_uploader("Import History", type=["gz", "jsonl"])
+    # The uploader keeps its file across reruns; import each upload only once
+    if uploaded is not None and st.session_state.get('history_imported') != uploaded.file_id:
+        try:
+            imported = store.get_store().import_archive(uploaded.getvalue())
+            st.session_state['history_imported'] = uploaded.file_id
+            st.toast(f"Imported {imported} analyses")
+        except (ValueError, OSError, sqlite3.Error) as e:
+            st.error(f"Import failed: {e}")
+
 # Main Input
 col1, col2 = st.columns([1, 1])
 
 with col1:
     st.subheader("1. Input Legacy Code")
-    code_input = st.text_area("Paste Spaghetti Code Here", height=400)
+    code_input = st.text_area("Paste Spaghetti Code Here", height=400, key="code_input")
     extract_btn = st.button("Extract Logic", type="primary")
 
+# Tabs for Output
+# ---------------------------------------------------------
+# UPDATE: Added "⚖️ Validator" as the 4th tab
+tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["📊 Flowchart", "📄 Raw Logic", "✨ Modern Code", "⚖️ Validator", "📈 Stats", "🔎 Catalog"])
+# ---------------------------------------------------------
+
 if extract_btn and code_input:
     with st.spinner("Extracting Logic..."):
         # Run Extractor
-        result = extractor.extract_logic(code_input, model_name)
+        if extraction_mode == "Incremental":
+            # Only functions/blocks changed since the previous run are sent to the model
+            if SERVICE is not None:
+                result, st.session_state['extract_state'] = remote_extract(code_input, model_name, use_cache, "incremental", st.session_state.get('extract_state'))
+            else:
+                result, st.session_state['extract_state'] = extractor.extract_logic_incremental(
+                    code_input,
+                    model_name,
+                    st.session_state.get('extract_state'),
+                    use_cache=use_cache,
+                    policy=llm_policy,
+                    compact=compact_prompts
+                )
+            last_run = st.session_state['extract_state'].get('last_run', {})
+            st.caption(f"Re-extracted {last_run.get('reextracted', 0)} of {last_run.get('units', 0)} units; reused {last_run.get('reused', 0)}.")
+        elif extraction_mode == "Streaming" and len(code_input.splitlines()) <= extractor.CHUNK_LINES:
+            # Stream rules into the Flowchart and Raw Logic tabs as they arrive
+            with tab1:
+                flow_placeholder = st.empty()
+            with tab2:
+                raw_placeholder = st.empty()
+            with col1:
+                progress_placeholder = st.empty()
+
+            if SERVICE is not None:
+                stream = remote_extract_stream(code_input, model_name, use_cache)
+            else:
+                stream = extractor.extract_logic_stream(code_input, model_name, use_cache=use_cache, policy=llm_policy, compact=compact_prompts)
+            partial = {"module_name": "Extracting...", "stats": {"complexity_score": 0, "rule_count": 0}, "rules": []}
+            last_render = 0.0
+            while True:
+                try:
+                    rule = next(stream)
+                except StopIteration as done:
+                    result = done.value
+                    break
+                partial["rules"].append(rule)
+                partial["stats"]["rule_count"] = len(partial["rules"])
+                progress_placeholder.caption(f"Received {len(partial['rules'])} rules...")
+                # Throttle redraws so long streams don't spend their time re-rendering
+                if time.monotonic() - last_render > 0.3:
+                    flow_placeholder.markdown(f"```mermaid\n{visualizer_mermaid.generate_mermaid(partial)}\n```")
+                    raw_placeholder.json(partial)
+                    last_render = time.monotonic()
+
+            flow_placeholder.empty()
+            raw_placeholder.empty()
+            progress_placeholder.empty()
+        else:
+            # Large inputs are split at function/class boundaries and extracted concurrently
+            if SERVICE is not None:
+                result, _ = remote_extract(code_input, model_name, use_cache)
+            else:
+                result = extractor.extract_logic_chunked(code_input, model_name, use_cache=use_cache, policy=llm_policy, compact=compact_prompts)
         st.session_state['logic_data'] = result
-        st.session_state['modern_code'] = None # Reset code when new logic extracted
+        # Derived artifacts (Mermaid, JSON export, stats) are memoized per logic hash
+        st.session_state['logic_hash'] = cache.content_hash(result)
+        st.session_state['modern_codes'] = {} # Reset code when new logic extracted
+        st.session_state['audits'] = {}
+        if "error" not in result:
+            save_artifact("save_extraction", code_input, result, model_name, st.session_state['logic_hash'])
+            index_rules(result, st.session_state['logic_hash'])
+            # Logic seen before brings back its stored implementations and audits
+            artifact = save_artifact("load", st.session_state['logic_hash'])
+            if artifact is not None:
+                st.session_state['modern_codes'] = artifact["modern_codes"]
+                st.session_state['audits'] = artifact["audits"]
         st.success("Extraction Complete!")
-
-# Tabs for Output
-# ---------------------------------------------------------
-# UPDATE: Added "⚖️ Validator" as the 4th tab
-tab1, tab2, tab3, tab4, tab5 = st.tabs(["📊 Flowchart", "📄 Raw Logic", "✨ Modern Code", "⚖️ Validator", "📈 Stats"])
-# ---------------------------------------------------------
+        for warning in result.get("warnings", []):
+            st.warning(warning)
 
 if 'logic_data' in st.session_state:
     logic_data = st.session_state['logic_data']
+    if 'logic_hash' not in st.session_state:
+        st.session_state['logic_hash'] = cache.content_hash(logic_data)
+    logic_hash = st.session_state['logic_hash']
+    exports = cached_exports(logic_hash, logic_data)
     
     # Tab 1: Flowchart
     with tab1:
         st.subheader("Logic Visualization")
         try:
+            # Large rule sets start collapsed to one node per zone; the browser cannot lay out thousands
+            rule_total = len(exports["rows"])
+            large = rule_total > visualizer_mermaid.MAX_FULL_RULES
+            detail_options = ["Zone summary", "Pages"] + ([] if large else ["All rules"])
+            f_col1, f_col2, f_col3 = st.columns([2, 2, 1])
+            detail = f_col1.radio("Detail", detail_options, index=0 if large else len(detail_options) - 1, horizontal=True,
+                                  help=f"Charts show at most {visualizer_mermaid.MAX_FULL_RULES} rules at a time.")
+            view = {"Zone summary": "summary", "Pages": "page", "All rules": "full"}[detail]
+            expand = ()
+            chart_size = visualizer_mermaid.PAGE_SIZE
+            if view == "summary":
+                present = [zone for zone in visualizer_mermaid.ZONE_ORDER if exports["zone_counts"].get(zone)]
+                expand = tuple(f_col2.multiselect("Expand zones", present, format_func=lambda zone: zone.title() if zone != "default" else "Other"))
+            elif view == "page":
+                chart_size = f_col2.selectbox("Rules per chart", [25, 50, 100, 150], index=1)
+            chart_pages = visualizer_mermaid.page_count(exports["zone_counts"], view, chart_size, expand)
+            chart_page = 1
+            if chart_pages > 1:
+                chart_page = f_col3.number_input(f"Chart page (of {chart_pages})", min_value=1, max_value=chart_pages, value=1, step=1)
+
             # Use Mermaid.js Visualizer
-            mermaid_code = visualizer_mermaid.generate_mermaid(logic_data)
+            mermaid_code = cached_mermaid(logic_hash, logic_data, view, chart_page, chart_size, expand)
             
             # Render Mermaid
             st.markdown(f"```mermaid\n{mermaid_code}\n```")
@@ -72,11 +381,22 @@ if 'logic_data' in st.session_state:
     # Tab 2: JSON
     with tab2:
         st.subheader("Extracted Business Rules")
-        st.json(logic_data)
-        json_str = json.dumps(logic_data, indent=2)
+        if "error" in logic_data:
+            st.error(logic_data["error"])
+        st.caption(f"Module: **{logic_data.get('module_name', 'Unknown')}** · {len(exports['rows'])} rules")
+
+        # Paginated view: only the visible page is sent to the browser
+        rows = exports["rows"]
+        p_col1, p_col2 = st.columns([1, 3])
+        page_size = p_col1.selectbox("Rules per page", [25, 50, 100, 250], index=1)
+        page_count = max(1, -(-len(rows) // page_size))
+        page = p_col2.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1, step=1)
+        start = (page - 1) * page_size
+        st.dataframe(rows[start:start + page_size], hide_index=True)
+
         st.download_button(
             label="Download JSON Analysis",
-            data=json_str,
+            data=exports["json_bytes"],
             file_name="logic_analysis.json",
             mime="application/json"
         )
@@ -84,22 +404,39 @@ if 'logic_data' in st.session_state:
     # Tab 3: Code Generator
     with tab3:
         st.subheader("Generate Modern Implementation")
-        target_lang = st.selectbox("Target Language", ["Python 3.12", "TypeScript (Node)", "Go", "Java 21"])
-        
-        if st.button("Generate Code"):
+        target_lang = st.selectbox("Target Language", generator.TARGET_LANGUAGES)
+        g_col1, g_col2 = st.columns(2)
+        generate_one = g_col1.button("Generate Code")
+        generate_every = g_col2.button("Generate All Targets", help="Generate every target language concurrently; each one appears in its own tab as soon as it is ready.")
+
+        # One implementation per language, so the Validator can audit any of them
+        modern_codes = st.session_state.setdefault('modern_codes', {})
+        if generate_one or generate_every:
+            languages = generator.TARGET_LANGUAGES if generate_every else [target_lang]
+            placeholders = {}
+            for language, lang_tab in zip(languages, st.tabs(languages)):
+                with lang_tab:
+                    placeholders[language] = st.empty()
+                    placeholders[language].info("Refactoring...")
+
             with st.spinner("Refactoring..."):
                 # Pass empty dict for keys to use env defaults from extractor
-                modern_code = generator.generate_modern_code(
-                        logic_data, 
-                        target_lang,
-                        {}, 
-                        model_name
-                )
-                # SAVE TO SESSION STATE so Validator can see it
-                st.session_state['modern_code'] = modern_code 
-                st.code(modern_code, language=target_lang.lower().split()[0])
-        elif 'modern_code' in st.session_state and st.session_state['modern_code']:
-            st.code(st.session_state['modern_code'], language=target_lang.lower().split()[0])
+                if SERVICE is not None:
+                    generated = remote_generate_all(logic_data, languages, model_name, use_cache)
+                else:
+                    generated = generator.generate_all(logic_data, languages, {}, model_name, use_cache=use_cache, policy=llm_policy, compact=compact_prompts)
+                for language, modern_code in generated:
+                    # SAVE TO SESSION STATE so Validator can see it
+                    modern_codes[language] = modern_code
+                    if not modern_code.startswith("# Error generating code"):
+                        save_artifact("save_code", logic_hash, language, modern_code, model_name)
+                    placeholders[language].code(modern_code, language=language.lower().split()[0])
+            st.session_state['modern_code_lang'] = target_lang
+        elif modern_codes:
+            languages = [lang for lang in generator.TARGET_LANGUAGES if lang in modern_codes]
+            for language, lang_tab in zip(languages, st.tabs(languages)):
+                with lang_tab:
+                    st.code(modern_codes[language], language=language.lower().split()[0])
 
     # Tab 4: VALIDATOR (The New Section)
     with tab4:
@@ -108,54 +445,150 @@ if 'logic_data' in st.session_state:
         
         # Check if we have both pieces of data
         has_logic = 'logic_data' in st.session_state
-        has_code = 'modern_code' in st.session_state and st.session_state['modern_code'] is not None
-        
+        modern_codes = st.session_state.get('modern_codes') or {}
+        has_code = bool(modern_codes)
+        audit_lang = None
+        if has_code:
+            audit_options = [lang for lang in generator.TARGET_LANGUAGES if lang in modern_codes]
+            last_lang = st.session_state.get('modern_code_lang')
+            audit_lang = st.selectbox(
+                "Implementation to audit",
+                audit_options,
+                index=audit_options.index(last_lang) if last_lang in audit_options else 0
+            )
+
+        audits = st.session_state.setdefault('audits', {})
+        audit_result = None
+        just_audited = False
         if st.button("Run Verification Audit", disabled=not (has_logic and has_code)):
             with st.spinner("Auditing Code Logic..."):
-                audit_result = validator.validate_equivalence(
-                    st.session_state['logic_data'], 
-                    st.session_state['modern_code'], 
-                    model_name
-                )
-                
-                # Display High-Level Metrics
-                m_col1, m_col2, m_col3 = st.columns(3)
-                
-                # Score Metric
-                score = audit_result.get('score', 0)
-                m_col1.metric("Equivalence Score", f"{score}/100")
-                
-                # Status Metric
-                status = audit_result.get('status', 'UNKNOWN')
-                if status == "PASS":
-                    m_col2.success(f"✅ {status}")
-                elif status == "FAIL":
-                    m_col2.error(f"❌ {status}")
+                if SERVICE is not None:
+                    audit_result = remote_validate(st.session_state['logic_data'], modern_codes[audit_lang], model_name, use_cache, audit_lang, local_execution)
                 else:
-                    m_col2.warning(f"⚠️ {status}")
-
-                st.info(f"**Summary:** {audit_result.get('summary', 'No summary provided')}")
-
-                # Display Discrepancies if any
-                discrepancies = audit_result.get('discrepancies', [])
-                if discrepancies:
-                    st.write("### 🚨 Discrepancies Found")
-                    for issue in discrepancies:
-                        with st.expander(f"{issue.get('severity', 'ISSUE')}: {issue.get('rule_id', 'Unknown Rule')}"):
-                            st.write(issue.get('issue'))
-                elif status == "PASS":
+                    audit_result = validator.validate_equivalence(
+                        st.session_state['logic_data'], 
+                        modern_codes[audit_lang],
+                        model_name,
+                        use_cache=use_cache,
+                        target_language=audit_lang,
+                        # Opt-in: Python targets are checked by executing the generated code here
+                        local_execution=local_execution,
+                        policy=llm_policy,
+                        compact=compact_prompts
+                    )
+            just_audited = True
+            if audit_result.get('status') != "ERROR":
+                audits[audit_lang] = audit_result
+                save_artifact("save_audit", logic_hash, audit_lang, modern_codes[audit_lang], audit_result, model_name)
+        elif audit_lang in audits:
+            # Audit restored from history or from an earlier run in this session
+            audit_result = audits[audit_lang]
+            st.caption("Showing the stored audit of this implementation.")
+
+        if audit_result is not None:
+            # Display High-Level Metrics
+            m_col1, m_col2, m_col3 = st.columns(3)
+            
+            # Score Metric
+            score = audit_result.get('score', 0)
+            m_col1.metric("Equivalence Score", f"{score}/100")
+            
+            # Status Metric
+            status = audit_result.get('status', 'UNKNOWN')
+            if status == "PASS":
+                m_col2.success(f"✅ {status}")
+            elif status == "FAIL":
+                m_col2.error(f"❌ {status}")
+            else:
+                m_col2.warning(f"⚠️ {status}")
+
+            st.info(f"**Summary:** {audit_result.get('summary', 'No summary provided')}")
+
+            # Display Discrepancies if any
+            discrepancies = audit_result.get('discrepancies', [])
+            if discrepancies:
+                st.write("### 🚨 Discrepancies Found")
+                for issue in discrepancies:
+                    with st.expander(f"{issue.get('severity', 'ISSUE')}: {issue.get('rule_id', 'Unknown Rule')}"):
+                        st.write(issue.get('issue'))
+            elif status == "PASS":
+                if just_audited:
                     st.balloons()
-                    st.write("### ✨ Perfect Match. No regressions detected.")
+                st.write("### ✨ Perfect Match. No regressions detected.")
         
         if not has_code:
             st.warning("⚠️ You must generate Modern Code (Tab 3) before you can validate it.")
 
     # Tab 5: Stats
     with tab5:
-         stats = logic_data.get("stats", {})
-         st.metric("Rule Count", stats.get("rule_count", 0))
-         st.metric("Complexity Score", stats.get("complexity_score", 0))
+         st.metric("Rule Count", exports["rule_count"])
+         st.metric("Complexity Score", exports["complexity_score"])
+         if exports["zone_counts"]:
+             st.write("**Rules per zone**")
+             st.bar_chart(exports["zone_counts"])
+
+         # Performance metrics for this server process (all sessions)
+         st.divider()
+         st.subheader("Performance")
+         pm_col1, pm_col2, pm_col3, pm_col4 = st.columns(4)
+         pm_col1.metric("LLM Requests", metrics.counter_total("logic_foundry_llm_requests_total"))
+         pm_col2.metric("Retries", metrics.counter_total("logic_foundry_llm_retries_total"))
+         pm_col3.metric("Cache Hits", metrics.counter_total("logic_foundry_cache_hits_total"))
+         pm_col4.metric("JSON Repairs", metrics.counter_total("logic_foundry_json_repairs_total"))
+
+         st.write("**Stage wall time (s)**")
+         st.dataframe(metrics.summary("logic_foundry_stage_seconds"), hide_index=True)
+         st.write("**LLM latency (s)**")
+         st.dataframe(metrics.summary("logic_foundry_llm_request_seconds"), hide_index=True)
+         st.write("**Time to first token (s)**")
+         st.dataframe(metrics.summary("logic_foundry_llm_ttft_seconds"), hide_index=True)
+         st.write("**Tokens per request**")
+         st.dataframe(
+             [dict(row, kind="prompt") for row in metrics.summary("logic_foundry_llm_prompt_tokens")]
+             + [dict(row, kind="completion") for row in metrics.summary("logic_foundry_llm_completion_tokens")],
+             hide_index=True
+         )
+         st.write("**Render time (s)**")
+         st.dataframe(metrics.summary("logic_foundry_render_seconds", group_by="renderer"), hide_index=True)
+
+         x_col1, x_col2 = st.columns(2)
+         x_col1.download_button("Download Metrics (JSON)", json.dumps(metrics.snapshot(), indent=2), file_name="logic_foundry_metrics.json", mime="application/json")
+         x_col2.download_button("Download Metrics (Prometheus)", metrics.to_prometheus(), file_name="logic_foundry_metrics.prom", mime="text/plain")
 
 else:
     if not code_input:
         st.info("👈 Enter Legacy Code and click 'Extract Logic' to start.")
+
+# Tab 6: Rule catalog across every module extracted so far
+with tab6:
+    st.subheader("Rule Catalog")
+    st.caption("Search rules from every analyzed module. Mix words and conditions, e.g. `vip discount total >= 50`.")
+    q_col1, q_col2 = st.columns([3, 1])
+    catalog_query = q_col1.text_input("Search rules", key="catalog_query")
+    catalog_zone = q_col2.selectbox("Zone", ["All"] + ZONE_PRIORITY)
+    try:
+        catalog = rule_index.get_index()
+        if catalog_query or catalog_zone != "All":
+            started = time.perf_counter()
+            hits = catalog.search(catalog_query, zone=None if catalog_zone == "All" else catalog_zone)
+            st.caption(f"{len(hits)} rules in {(time.perf_counter() - started) * 1000:.0f} ms")
+            st.dataframe(
+                [{"module": h["module_name"], "rule": h["rule_id"], "trigger": h["trigger"], "action": h["action"], "zone": h["zone"]} for h in hits],
+                hide_index=True
+            )
+
+        st.divider()
+        st.write("**Near-duplicate rules across modules**")
+        catalog_stats = catalog.stats()
+        d_col1, d_col2, d_col3 = st.columns(3)
+        d_col1.metric("Indexed Rules", catalog_stats["rules"])
+        d_col2.metric("Duplicate Clusters", catalog_stats["duplicate_clusters"])
+        d_col3.metric("Rules in Clusters", catalog_stats["duplicated_rules"])
+        for group in catalog.duplicates(limit=10):
+            with st.expander(f"{group['size']} rules in {group['modules']} modules: {group['rules'][0]['trigger']}"):
+                st.dataframe(
+                    [{"module": row["module_name"], "rule": row["rule_id"], "trigger": row["trigger"], "action": row["action"]} for row in group["rules"]],
+                    hide_index=True
+                )
+    except (sqlite3.Error, OSError) as e:
+        st.warning(f"Rule catalog unavailable: {e}")
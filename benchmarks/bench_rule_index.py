@@ -0,0 +1,85 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+from core import rule_index
+
+# Rule index benchmark.
+#
+#   python -m benchmarks.bench_rule_index --rules 100000 1000000
+#
+# Builds an index of synthetic modules (a share of rules copied across modules, so
+# duplicate clusters form), then reports indexing throughput and the latency of
+# text, range, mixed and duplicate queries.
+
+TEMPLATES = [
+    ("customer.isVip and order.total >= {n}", "apply {p}% VIP discount"),
+    ("weight > {n}", "add shipping fee of {p}"),
+    ("account.status == {n}", "reject order with error code {p}"),
+    ("promo_code is set and cart.items >= {n}", "apply coupon rate {p}"),
+    ("destination is AK or HI and weight > {n}", "add freight surcharge {p}"),
+    ("retry_count > {n}", "log audit entry {p} and raise TimeoutError"),
+]
+QUERIES = [
+    "vip discount",
+    "vip discount total >= 50",
+    "weight > 990",
+    "freight surcharge",
+    "total == 500",
+    "which modules apply the VIP discount at >= 50",
+]
+RULES_PER_MODULE = 40
+DUPLICATE_SHARE = 0.2
+
+
+def make_module(index, rng):
+    rules = []
+    for i in range(RULES_PER_MODULE):
+        trigger, action = rng.choice(TEMPLATES)
+        if rng.random() < DUPLICATE_SHARE:
+            n, p = 50, 10  # the same business rule copied between modules
+        else:
+            n, p = rng.randrange(1, 1000), rng.randrange(1, 100)
+        rules.append({"id": f"rule_{i + 1}", "trigger": trigger.format(n=n), "action": action.format(p=p), "reason": "synthetic"})
+    return {"module_name": f"Module{index}", "stats": {"rule_count": len(rules)}, "rules": rules}
+
+
+def time_ms(call, repeat=5):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = call()
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 2), result
+
+
+def bench(count, directory):
+    rng = random.Random(count)
+    index = rule_index.RuleIndex(os.path.join(directory, f"rules_{count}.db"))
+    started = time.perf_counter()
+    for m in range(count // RULES_PER_MODULE):
+        index.index_module(make_module(m, rng), f"module_{m}.py")
+    build = time.perf_counter() - started
+
+    print(f"\n{count} rules: indexed in {build:.1f}s ({count / build:,.0f} rules/s)")
+    for query in QUERIES:
+        ms, rows = time_ms(lambda: index.search(query))
+        print(f"  {ms:8.2f} ms  {len(rows):3d} rows  search {query!r}")
+    ms, groups = time_ms(lambda: index.duplicates())
+    print(f"  {ms:8.2f} ms  {len(groups):3d} clusters  duplicates (largest: {groups[0]['size'] if groups else 0} rules)")
+    print(f"  {index.stats()}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the cross-module rule index.")
+    parser.add_argument("--rules", type=int, nargs="+", default=[10000, 100000])
+    options = parser.parse_args(argv)
+    with tempfile.TemporaryDirectory() as directory:
+        for count in options.rules:
+            bench(count, directory)
+
+
+if __name__ == "__main__":
+    main()
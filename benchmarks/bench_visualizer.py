@@ -0,0 +1,85 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from core import visualizer
+from core import visualizer_mermaid
+
+# Graphviz renderer benchmark.
+#
+#   python -m benchmarks.bench_visualizer --sizes 100 1000 10000
+#
+# Reports DOT build time, DOT size, cluster blocks and (when the `dot` binary is
+# installed) layout time for synthetic rule sets spread across all zones, plus the
+# build time and edge count of the Mermaid chart the Flowchart tab shows by default.
+
+TEMPLATES = [
+    ("weight > {n}", "add shipping fee of {n}"),
+    ("customer is VIP and total >= {n}", "apply {n}% discount"),
+    ("account is banned", "return -{n}"),
+    ("flag_{n} is set", "log audit entry {n}"),
+]
+
+
+def make_rules(count):
+    rules = []
+    for i in range(count):
+        trigger, action = TEMPLATES[i % len(TEMPLATES)]
+        rules.append({
+            "id": f"rule_{i + 1}",
+            "trigger": trigger.format(n=i),
+            "action": action.format(n=i),
+            "reason": "synthetic"
+        })
+    return {"module_name": "Bench", "stats": {"complexity_score": 5, "rule_count": count}, "rules": rules}
+
+
+def bench(count, layout, out_dir=None):
+    logic_data = make_rules(count)
+    started = time.perf_counter()
+    source = visualizer.create_graph(logic_data).source
+    build = time.perf_counter() - started
+
+    row = {
+        "rules": count,
+        "build_ms": round(build * 1000, 1),
+        "dot_kb": round(len(source.encode("utf-8")) / 1024, 1),
+        "clusters": source.count("subgraph cluster_"),
+        "layout_ms": None,
+    }
+    started = time.perf_counter()
+    mermaid = visualizer_mermaid.generate_mermaid(logic_data)
+    row["mermaid_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    row["mermaid_edges"] = mermaid.count("-->")
+    if layout:
+        started = time.perf_counter()
+        visualizer._render_source(source, "svg", os.path.join(out_dir, f"bench_{count}.svg"))
+        row["layout_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return row
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Graphviz flowchart renderer.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--no-layout", dest="layout", action="store_false", help="Skip the `dot` layout step")
+    options = parser.parse_args(argv)
+
+    layout = options.layout and shutil.which("dot") is not None
+    if options.layout and not layout:
+        print("`dot` not found on PATH; reporting DOT build time only")
+
+    # Rendered images go to a private directory that is removed afterwards
+    out_dir = tempfile.mkdtemp(prefix="logic_foundry_bench_")
+    try:
+        print(f"{'rules':>8} {'build ms':>10} {'DOT KB':>10} {'clusters':>9} {'layout ms':>10} {'mermaid ms':>11} {'edges':>6}")
+        for count in options.sizes:
+            row = bench(count, layout, out_dir)
+            layout_ms = "-" if row["layout_ms"] is None else row["layout_ms"]
+            print(f"{row['rules']:>8} {row['build_ms']:>10} {row['dot_kb']:>10} {row['clusters']:>9} {layout_ms:>10} {row['mermaid_ms']:>11} {row['mermaid_edges']:>6}")
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+# Import-time regression check.
+#
+#   python -m benchmarks.import_time
+#
+# Runs `python -X importtime -c "import <module>"` for each core module in a fresh
+# interpreter, fails if any heavy SDK is pulled in at import time, and fails if the
+# cumulative import time exceeds the budget. Exits non-zero on regression.
+
+MODULES = [
+    "core.extractor",
+    "core.generator",
+    "core.validator",
+    "core.visualizer",
+    "core.visualizer_mermaid",
+]
+# SDKs that must only load on first use
+HEAVY = ["openai", "httpx", "google.generativeai", "graphviz", "streamlit"]
+BUDGET_MS = float(os.getenv("LOGIC_FOUNDRY_IMPORT_BUDGET_MS", 150))
+RUNS = 3
+
+LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(module):
+    """
+    Returns (cumulative_ms, imported_module_names) for one cold import of module.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=ROOT,
+        env=dict(os.environ, PYTHONDONTWRITEBYTECODE="1"),
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr}")
+
+    cumulative_us = None
+    imported = set()
+    for line in proc.stderr.splitlines():
+        match = LINE_RE.match(line)
+        if not match:
+            continue
+        name = match.group(4)
+        imported.add(name)
+        if name == module:
+            cumulative_us = int(match.group(2))
+    return (cumulative_us or 0) / 1000, imported
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check cold import time of core modules.")
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS)
+    options = parser.parse_args(argv)
+
+    failures = []
+    for module in MODULES:
+        # Best of a few runs, to keep filesystem noise out of the number
+        samples = [measure(module) for _ in range(RUNS)]
+        best_ms = min(ms for ms, _ in samples)
+        imported = samples[0][1]
+        heavy = sorted(h for h in HEAVY if h in imported)
+        status = "ok"
+        if heavy:
+            status = "FAIL"
+            failures.append(f"{module} imports {', '.join(heavy)} at import time")
+        if best_ms > options.budget_ms:
+            status = "FAIL"
+            failures.append(f"{module} took {best_ms:.1f} ms (budget {options.budget_ms:.0f} ms)")
+        print(f"{module:28} {best_ms:8.1f} ms  {status}")
+
+    for failure in failures:
+        print(f"  - {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
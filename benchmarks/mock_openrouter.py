@@ -0,0 +1,236 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for the OpenRouter chat-completions endpoint.
+#
+#   python -m benchmarks.mock_openrouter --port 8900 --latency 0.2 --payload fenced
+#
+# Replies are canned per stage (recognized from the system prompt) and support
+# streaming (SSE), configurable latency/jitter and deliberately broken payloads:
+#   ok         valid JSON / code
+#   fenced     valid JSON wrapped in ```json fences
+#   malformed  trailing commas and stray prose around the JSON
+#   truncated  the reply stops halfway through the rules array
+
+PAYLOADS = ["ok", "fenced", "malformed", "truncated"]
+MAX_RULES = 2000
+
+
+class MockConfig:
+    def __init__(self, latency=0.05, jitter=0.0, ttft=None, payload="ok", stream_chunk=24, error_rate=0.0, model_latency=None):
+        self.latency = latency          # seconds before a non-streamed reply (or before the first token)
+        self.jitter = jitter            # +/- uniform jitter added to latency
+        self.ttft = ttft                # time to first token when streaming (defaults to latency)
+        self.payload = payload
+        self.stream_chunk = stream_chunk
+        self.error_rate = error_rate    # fraction of requests answered with HTTP 500
+        self.model_latency = model_latency or {}  # per-model latency overrides (e.g. to exercise hedging)
+        self.requests = 0
+        self.lock = threading.Lock()
+
+
+def _rules_for(user_text):
+    # One rule per branch in the input keeps reply size proportional to input size
+    count = min(max(len(re.findall(r"\bif\b|\belif\b|\belse\b", user_text)), 1), MAX_RULES)
+    zones = [
+        ("weight > {n}", "add shipping fee"),
+        ("customer is VIP and total >= {n}", "apply discount"),
+        ("account is banned", "return -1"),
+        ("ELSE", "return base price"),
+    ]
+    rules = []
+    for i in range(count):
+        trigger, action = zones[i % len(zones)]
+        rules.append({"id": f"rule_{i + 1}", "trigger": trigger.format(n=i), "action": action, "reason": "mock"})
+    return rules
+
+
+def _extraction_reply(user_text):
+    rules = _rules_for(user_text)
+    return {
+        "module_name": "MockModule",
+        "stats": {"complexity_score": min(10, 1 + len(rules) // 10), "rule_count": len(rules)},
+        "rules": rules
+    }
+
+
+def _generation_reply(user_text):
+    ids = re.findall(r'"id":\s*"(rule_\d+)"', user_text)
+    lines = ["from dataclasses import dataclass", "", "@dataclass", "class Order:", "    total: float", "    weight: float", ""]
+    lines.append("def process(order: Order) -> float:")
+    for n, rule_id in enumerate(ids or ["rule_1"]):
+        lines.append(f"    # Implements {rule_id}")
+        lines.append(f"    if order.total > {n}:")
+        lines.append(f"        return {n}.0")
+    lines.append("    return 0.0")
+    return "\n".join(lines)
+
+
+def _audit_reply(user_text):
+    ids = re.findall(r'"id":\s*"(rule_\d+)"', user_text)
+    discrepancies = []
+    if ids:
+        discrepancies.append({"rule_id": ids[0], "severity": "MINOR", "issue": "Mock discrepancy"})
+    return {"score": 95, "status": "WARNING", "summary": "Mock audit.", "discrepancies": discrepancies}
+
+
+def build_content(messages, payload):
+    """
+    Returns the assistant text for a request, shaped by the payload mode.
+    """
+    system = next((m["content"] for m in messages if m["role"] == "system"), "")
+    user = "\n".join(m["content"] for m in messages if m["role"] == "user")
+
+    if "Clean Code Expert" in system:
+        code = _generation_reply(user)
+        return f"```python\n{code}\n```" if payload == "fenced" else code
+
+    body = _audit_reply(user) if "Verification Engine" in system else _extraction_reply(user)
+    text = json.dumps(body, indent=2)
+    if payload == "fenced":
+        return f"```json\n{text}\n```"
+    if payload == "malformed":
+        return "Here is the analysis:\n" + text.replace("}\n  ]", "},\n  ]") + "\nLet me know if you need more."
+    if payload == "truncated":
+        return text[: max(len(text) * 2 // 3, 1)]
+    return text
+
+
+def _estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+class Handler(BaseHTTPRequestHandler):
+    config = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("chat/completions"):
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        config = self.config
+        with config.lock:
+            config.requests += 1
+
+        model = request.get("model", "mock-model")
+        latency = config.model_latency.get(model, config.latency)
+        delay = max(0.0, latency + random.uniform(-config.jitter, config.jitter))
+        if config.error_rate and random.random() < config.error_rate:
+            time.sleep(delay)
+            self._send_json(500, {"error": {"message": "mock upstream error", "code": 500}})
+            return
+
+        content = build_content(request.get("messages", []), config.payload)
+        if request.get("stream"):
+            self._stream(content, model, config.ttft if config.ttft is not None else delay)
+        else:
+            time.sleep(delay)
+            prompt_text = "".join(m.get("content", "") for m in request.get("messages", []))
+            self._send_json(200, {
+                "id": "mock-completion",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {
+                    "prompt_tokens": _estimate_tokens(prompt_text),
+                    "completion_tokens": _estimate_tokens(content),
+                    "total_tokens": _estimate_tokens(prompt_text) + _estimate_tokens(content)
+                }
+            })
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, content, model, ttft):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        time.sleep(ttft)
+        size = self.config.stream_chunk
+        pieces = [content[i:i + size] for i in range(0, len(content), size)]
+        for piece in pieces:
+            self._write_event({
+                "id": "mock-stream",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]
+            })
+        self._write_event({
+            "id": "mock-stream",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+        })
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _write_event(self, body):
+        self._write_chunk(f"data: {json.dumps(body)}\n\n".encode("utf-8"))
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+def start_server(port=0, **options):
+    """
+    Starts the mock server in a daemon thread.
+    Returns (server, base_url); call server.shutdown() to stop it.
+    """
+    config = MockConfig(**options)
+    handler = type("ConfiguredHandler", (Handler,), {"config": config})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.config = config
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/api/v1"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mock OpenRouter chat-completions server.")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--ttft", type=float, default=None)
+    parser.add_argument("--payload", choices=PAYLOADS, default="ok")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    options = parser.parse_args(argv)
+
+    server, url = start_server(
+        options.port,
+        latency=options.latency,
+        jitter=options.jitter,
+        ttft=options.ttft,
+        payload=options.payload,
+        error_rate=options.error_rate
+    )
+    print(f"Mock OpenRouter listening on {url} (OPENROUTER_BASE_URL={url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
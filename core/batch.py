@@ -0,0 +1,236 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from core import extractor
+from core import generator
+from core import llm_client
+from core import metrics
+from core import validator
+
+# Headless batch mode: runs extract -> generate -> validate over a whole source tree.
+#
+#   python -m core.batch path/to/legacy --out results.jsonl --concurrency 32 --rate 10
+#
+# Each finished file is appended to the JSONL output immediately. Re-running with the
+# same --out skips files whose content already completed, so interrupted runs resume.
+
+DEFAULT_EXTENSIONS = [
+    ".py", ".js", ".ts", ".java", ".go", ".c", ".h", ".cpp", ".cs", ".php", ".rb",
+    ".cbl", ".cob", ".cpy", ".vb", ".bas", ".pas", ".sql", ".pl", ".kt", ".scala", ".rs"
+]
+SKIP_DIRS = {".git", ".hg", ".svn", "node_modules", "venv", ".venv", "__pycache__", "build", "dist"}
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter: `rate` requests per second with bursts up to `capacity`.
+    acquire() blocks the calling thread, so it can be installed as the llm_client rate
+    limiter and charged for every upstream request the stages make.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(rate, 1))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        tokens = min(float(tokens), self.capacity)
+        # Waiters queue on the lock, so one thread sleeping for its token holds back the rest
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                time.sleep((tokens - self._tokens) / self.rate)
+
+
+def find_source_files(root, extensions=None):
+    """
+    Walks root and returns source files with a known extension, sorted for stable ordering.
+    """
+    extensions = {e.lower() for e in (extensions or DEFAULT_EXTENSIONS)}
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS and not d.startswith(".")]
+        for name in filenames:
+            if os.path.splitext(name)[1].lower() in extensions:
+                found.append(os.path.join(dirpath, name))
+    return sorted(found)
+
+
+def read_source(path):
+    """
+    Returns (code_text, sha256) for a source file; undecodable bytes are replaced.
+    """
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        code_text = f.read()
+    return code_text, hashlib.sha256(code_text.encode("utf-8")).hexdigest()
+
+
+def load_completed(out_path):
+    """
+    Reads an existing JSONL output and returns {(path, sha256)} of files that finished successfully.
+    """
+    done = set()
+    if not os.path.exists(out_path):
+        return done
+    with open(out_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A partially written last line from an interrupted run
+                continue
+            if record.get("status") == "ok":
+                done.add((record.get("path"), record.get("sha256")))
+    return done
+
+
+async def process_file(path, root, options):
+    """
+    Runs the pipeline for one file and returns its JSONL record.
+    Rate limiting happens in llm_client, per upstream request (see run_batch).
+    """
+    started = time.monotonic()
+    rel_path = os.path.relpath(path, root)
+    code_text, digest = read_source(path)
+    record = {
+        "path": rel_path,
+        "sha256": digest,
+        "model": options.model,
+        "status": "ok",
+    }
+
+    logic = await asyncio.to_thread(extractor.extract_logic_chunked, code_text, options.model, use_cache=options.use_cache)
+    record["logic"] = logic
+    if "error" in logic:
+        record["status"] = "error"
+        record["error"] = logic["error"]
+
+    if record["status"] == "ok" and options.generate:
+        modern_code = await asyncio.to_thread(
+            generator.generate_modern_code, logic, options.target, {}, options.model, use_cache=options.use_cache
+        )
+        record["target_language"] = options.target
+        record["modern_code"] = modern_code
+        if modern_code.startswith("# Error generating code"):
+            record["status"] = "error"
+            record["error"] = modern_code
+
+        if record["status"] == "ok" and options.validate:
+            audit = await asyncio.to_thread(
+                validator.validate_equivalence, logic, modern_code, options.model,
+                use_cache=options.use_cache, target_language=options.target,
+                local_execution=options.local_execution
+            )
+            record["audit"] = audit
+            if audit.get("status") == "ERROR":
+                record["status"] = "error"
+                record["error"] = audit.get("summary")
+
+    record["elapsed"] = round(time.monotonic() - started, 3)
+    return record
+
+
+async def run_batch(root, options):
+    """
+    Processes every pending file under root with bounded concurrency.
+    Returns (ok_count, error_count, skipped_count).
+    """
+    files = find_source_files(root, options.extensions)
+    completed = load_completed(options.out)
+    # Every upstream request takes a token where it is sent: extraction chunks, the LLM pass
+    # after a partial static extraction, validator shards and fix-ups, retries and hedges.
+    # Cache hits send nothing and cost nothing.
+    limiter = TokenBucket(options.rate, options.burst)
+    semaphore = asyncio.Semaphore(options.concurrency)
+
+    # The stages are blocking calls, so give the loop enough threads for every in-flight file
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=options.concurrency))
+    llm_client.configure(pool_size=max(options.concurrency, llm_client.POOL_SIZE))
+
+    pending = []
+    skipped = 0
+    for path in files:
+        _, digest = read_source(path)
+        if (os.path.relpath(path, root), digest) in completed:
+            skipped += 1
+        else:
+            pending.append(path)
+
+    print(f"{len(files)} files found, {skipped} already done, {len(pending)} to process", file=sys.stderr)
+
+    async def bounded(path):
+        async with semaphore:
+            try:
+                return await process_file(path, root, options)
+            except Exception as e:
+                return {"path": os.path.relpath(path, root), "status": "error", "error": str(e)}
+
+    ok = errors = 0
+    llm_client.set_rate_limiter(limiter.acquire)
+    try:
+        with open(options.out, "a", encoding="utf-8") as out:
+            tasks = [asyncio.create_task(bounded(path)) for path in pending]
+            for i, task in enumerate(asyncio.as_completed(tasks), start=1):
+                record = await task
+                # Stream each result out as soon as its file finishes
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                if record["status"] == "ok":
+                    ok += 1
+                else:
+                    errors += 1
+                print(f"[{i}/{len(pending)}] {record['status'].upper():5} {record['path']}", file=sys.stderr)
+    finally:
+        llm_client.set_rate_limiter(None)
+
+    return ok, errors, skipped
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m core.batch", description="Run Logic Foundry over a source tree.")
+    parser.add_argument("root", help="Directory of legacy source files")
+    parser.add_argument("--out", default="logic_foundry_results.jsonl", help="JSONL output file (also used to resume)")
+    parser.add_argument("--model", default="anthropic/claude-3.5-sonnet", help="OpenRouter model name")
+    parser.add_argument("--target", default="Python 3.12", help="Target language for code generation")
+    parser.add_argument("--concurrency", type=int, default=32, help="Files processed in parallel")
+    parser.add_argument("--rate", type=float, default=8.0, help="Max API requests per second")
+    parser.add_argument("--burst", type=float, default=None, help="Token bucket capacity (defaults to --rate)")
+    parser.add_argument("--ext", dest="extensions", action="append", help="File extension to include (repeatable)")
+    parser.add_argument("--no-generate", dest="generate", action="store_false", help="Only extract logic")
+    parser.add_argument("--no-validate", dest="validate", action="store_false", help="Skip the equivalence audit")
+    parser.add_argument("--no-cache", dest="use_cache", action="store_false", help="Bypass the result cache")
+    parser.add_argument("--local-execution", action="store_true", help="Check Python targets by running the generated code on this machine, unsandboxed (only for trusted input)")
+    parser.add_argument("--metrics-out", default=None, help="Write a metrics snapshot here when done (.prom/.txt for Prometheus text, JSON otherwise)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    if not os.path.isdir(options.root):
+        print(f"Not a directory: {options.root}", file=sys.stderr)
+        return 2
+    started = time.monotonic()
+    ok, errors, skipped = asyncio.run(run_batch(options.root, options))
+    print(f"Done in {time.monotonic() - started:.1f}s: {ok} ok, {errors} errors, {skipped} skipped", file=sys.stderr)
+    if options.metrics_out:
+        metrics.write_snapshot(options.metrics_out)
+        print(f"Metrics written to {options.metrics_out}", file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
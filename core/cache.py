@@ -0,0 +1,236 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from core import metrics
+
+# Persistent result cache for the LLM stages.
+# Entries are stored as one JSON file per key, so the cache survives restarts
+# and can be shared by every Streamlit session running on the same host.
+CACHE_DIR = os.getenv("LOGIC_FOUNDRY_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "logic_foundry"))
+MAX_BYTES = int(os.getenv("LOGIC_FOUNDRY_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+MAX_AGE_SECONDS = int(os.getenv("LOGIC_FOUNDRY_CACHE_MAX_AGE", 7 * 24 * 3600))
+
+
+def content_hash(*parts):
+    """
+    Returns a stable SHA-256 hex digest for any JSON-serializable parts.
+    Dicts are serialized with sorted keys so equal payloads hash equally.
+    """
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def make_key(stage, input_text, model_name, prompt_version, target_language=""):
+    """
+    Builds the cache key for one LLM stage call.
+    The key covers everything that changes the model's answer.
+    """
+    return content_hash(stage, input_text, model_name, prompt_version, target_language)
+
+
+def evict_files(directory, suffixes, max_bytes=MAX_BYTES, max_age=MAX_AGE_SECONDS):
+    """
+    Size- and age-based LRU over the files in directory, by modification time: removes
+    files older than max_age, then the least recently used until the rest fit in max_bytes.
+    Only names ending in one of suffixes (e.g. (".json",)) are considered, so other files
+    in a shared directory are never touched. Returns how many files were removed.
+    """
+    now = time.time()
+    entries = []
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return 0
+    for name in names:
+        if not name.endswith(tuple(suffixes)):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+
+    removed = 0
+    total = 0
+    kept = []
+    for mtime, size, path in entries:
+        # mtime is refreshed on every hit, so it is a lower bound for the entry age
+        if now - mtime > max_age:
+            ResultCache._remove(path)
+            removed += 1
+        else:
+            kept.append((mtime, size, path))
+            total += size
+
+    kept.sort()
+    for mtime, size, path in kept:
+        if total <= max_bytes:
+            break
+        ResultCache._remove(path)
+        total -= size
+        removed += 1
+    return removed
+
+
+class ResultCache:
+    """
+    Disk-backed LRU cache with size- and age-based eviction.
+    File modification times track recency, so eviction order survives restarts.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_BYTES, max_age=MAX_AGE_SECONDS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        """
+        Returns the cached value for key, or None on a miss.
+        Expired entries count as misses and are removed.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        if time.time() - entry.get("created", 0) > self.max_age:
+            self._remove(path)
+            with self._lock:
+                self.misses += 1
+                self.evictions += 1
+            return None
+
+        # Touch the file so LRU eviction sees it as recently used
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return entry.get("value")
+
+    def put(self, key, value):
+        """
+        Stores value under key, then evicts old entries if the cache is over budget.
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Write to a temp file first so concurrent readers never see partial JSON
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"created": time.time(), "value": value}, f)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            return
+        with self._lock:
+            self.writes += 1
+        self.evict()
+
+    def evict(self):
+        """
+        Drops expired entries, then the least recently used ones until under max_bytes.
+        """
+        removed = evict_files(self.directory, (".json",), self.max_bytes, self.max_age)
+        with self._lock:
+            self.evictions += removed
+
+    def clear(self):
+        """
+        Removes every cached entry.
+        """
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            if name.endswith(".json"):
+                self._remove(os.path.join(self.directory, name))
+
+    def stats(self):
+        """
+        Returns hit/miss counters for display in the UI.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+# Per-thread flag set by skip_store() while cached_call computes a value
+_local = threading.local()
+
+
+def get_cache():
+    """
+    Returns the process-wide cache shared by all stages and sessions.
+    """
+    global _default_cache
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                _default_cache = ResultCache()
+    return _default_cache
+
+
+def skip_store():
+    """
+    Keeps the value cached_call is computing in this thread out of the cache, e.g. because
+    it came from a different model than the one in its key.
+    """
+    _local.skip_store = True
+
+
+def cached_call(key, compute, use_cache=True, is_error=None, stage=None):
+    """
+    Returns the cached value for key, or computes and stores it.
+    With use_cache=False the lookup is skipped but the fresh result still refreshes the entry.
+    Results flagged by is_error, or by skip_store() during compute, are never stored.
+    stage labels the hit/miss metrics.
+    """
+    cache = get_cache()
+    if use_cache:
+        value = cache.get(key)
+        if value is not None:
+            metrics.increment("logic_foundry_cache_hits_total", stage=stage)
+            return value
+    metrics.increment("logic_foundry_cache_misses_total", stage=stage)
+
+    _local.skip_store = False
+    try:
+        value = compute()
+    finally:
+        skipped = _local.skip_store
+        _local.skip_store = False
+    if not skipped and (is_error is None or not is_error(value)):
+        cache.put(key, value)
+    return value
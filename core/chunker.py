@@ -0,0 +1,222 @@
+import ast
+import re
+
+# Splits source files into units at function/class boundaries so large modules
+# can be extracted chunk by chunk. Python is split with `ast`; everything else
+# falls back to brace depth and block keyword heuristics.
+
+# Lines that open a new top-level block in common legacy/modern languages
+BLOCK_START_RE = re.compile(
+    r"^\s*("
+    r"(export\s+)?(async\s+)?(def|class|function|func|fn|sub|procedure|interface|struct|enum|module|namespace)\b"
+    r"|(public|private|protected|static|final|abstract|internal)\b"
+    r"|[A-Za-z0-9-]+\s+(SECTION|DIVISION)\s*\."
+    r"|(?!END-|EXIT\b|GOBACK\b|CONTINUE\b)[A-Za-z0-9][A-Za-z0-9-]*\s*\.\s*$"
+    r")",
+    re.IGNORECASE,
+)
+# Block openers whose members are split individually (e.g. methods of a Java class)
+CONTAINER_RE = re.compile(r"^\s*([\w\s]*\s)?(class|interface|namespace|module|struct|enum|object|impl)\b", re.IGNORECASE)
+# Lines that close a keyword-delimited block (VB, Pascal, PL/SQL, COBOL)
+BLOCK_END_RE = re.compile(r"^\s*(end\s+(sub|function|procedure|class|module)|end\s*;|end-perform)\b", re.IGNORECASE)
+
+
+def split_units(code_text, max_lines=None):
+    """
+    Splits code_text into consecutive units covering every line of the input.
+    Each unit is a dict with "name", "start" and "end" (1-based, inclusive) and "text".
+    Classes larger than max_lines are split further at their member boundaries.
+    """
+    lines = code_text.splitlines()
+    if not lines:
+        return []
+
+    try:
+        tree = ast.parse(code_text)
+    except (SyntaxError, ValueError):
+        tree = None
+
+    if tree is not None and tree.body:
+        spans = _python_spans(tree, len(lines), max_lines)
+    else:
+        spans = _heuristic_spans(lines)
+
+    units = []
+    for name, start, end in spans:
+        units.append({
+            "name": name,
+            "start": start,
+            "end": end,
+            "text": "\n".join(lines[start - 1:end])
+        })
+    return units
+
+
+def split_chunks(code_text, max_lines=300):
+    """
+    Packs consecutive units into chunks of at most max_lines lines.
+    A single unit larger than max_lines becomes its own chunk, cut at blank lines where possible.
+    Returns a list of dicts with "names", "start", "end" and "text".
+    """
+    lines = code_text.splitlines()
+    chunks = []
+    current = []
+
+    def flush():
+        if current:
+            start = current[0]["start"]
+            end = current[-1]["end"]
+            chunks.append({
+                "names": [u["name"] for u in current],
+                "start": start,
+                "end": end,
+                "text": "\n".join(lines[start - 1:end])
+            })
+            current.clear()
+
+    for unit in split_units(code_text, max_lines=max_lines):
+        size = unit["end"] - unit["start"] + 1
+        if size > max_lines:
+            flush()
+            for start, end in _cut_lines(lines, unit["start"], unit["end"], max_lines):
+                chunks.append({
+                    "names": [unit["name"]],
+                    "start": start,
+                    "end": end,
+                    "text": "\n".join(lines[start - 1:end])
+                })
+            continue
+
+        used = current[-1]["end"] - current[0]["start"] + 1 if current else 0
+        if used + size > max_lines:
+            flush()
+        current.append(unit)
+
+    flush()
+    return chunks
+
+
+def _python_spans(tree, line_count, max_lines):
+    """
+    Returns (name, start, end) spans for the top-level statements of a Python module.
+    Consecutive non-definition statements are grouped into a single "module" span.
+    """
+    spans = []
+    body = tree.body
+    for i, node in enumerate(body):
+        start = _node_start(node)
+        # A statement owns every line up to the start of the next one (comments, blank lines)
+        end = _node_start(body[i + 1]) - 1 if i + 1 < len(body) else line_count
+        if i == 0:
+            start = 1
+
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            if isinstance(node, ast.ClassDef) and max_lines and end - start + 1 > max_lines and len(node.body) > 1:
+                spans.extend(_class_member_spans(node, start, end))
+            else:
+                spans.append((node.name, start, end))
+        elif spans and spans[-1][0] == "module":
+            spans[-1] = ("module", spans[-1][1], end)
+        else:
+            spans.append(("module", start, end))
+    return spans
+
+
+def _class_member_spans(node, start, end):
+    """
+    Splits a large class into member spans; the first span also carries the class header.
+    """
+    spans = []
+    members = node.body
+    for i, member in enumerate(members):
+        m_start = start if i == 0 else _node_start(member)
+        m_end = _node_start(members[i + 1]) - 1 if i + 1 < len(members) else end
+        name = getattr(member, "name", "body")
+        spans.append((f"{node.name}.{name}", m_start, m_end))
+    return spans
+
+
+def _node_start(node):
+    decorators = getattr(node, "decorator_list", None)
+    if decorators:
+        return min(d.lineno for d in decorators)
+    return node.lineno
+
+
+def _heuristic_spans(lines):
+    """
+    Splits non-Python source at brace depth 0 and at block keywords.
+    """
+    boundaries = [1]
+    depth = 0
+    # Depth at which blocks are split; 1 while inside a top-level class/namespace
+    split_depth = 0
+    for number, line in enumerate(lines, start=1):
+        stripped = _strip_strings(line)
+        if number > 1 and depth == split_depth and BLOCK_START_RE.match(line) and boundaries[-1] != number:
+            boundaries.append(number)
+
+        opened = stripped.count("{")
+        closed = stripped.count("}")
+        was_top = depth == 0
+        depth = max(depth + opened - closed, 0)
+
+        if was_top and depth == 1 and CONTAINER_RE.match(line):
+            split_depth = 1
+        elif depth == 0:
+            split_depth = 0
+
+        # A closing brace or end keyword back at the split depth ends the current block
+        if depth <= split_depth and (closed or BLOCK_END_RE.match(line)) and number < len(lines):
+            if boundaries[-1] != number + 1:
+                boundaries.append(number + 1)
+
+    spans = []
+    for i, start in enumerate(boundaries):
+        end = boundaries[i + 1] - 1 if i + 1 < len(boundaries) else len(lines)
+        if end < start:
+            continue
+        spans.append((_block_name(lines[start - 1:end], i), start, end))
+    return spans
+
+
+def _strip_strings(line):
+    # Drop string literals and line comments so braces inside them do not count
+    line = re.sub(r'"(\\.|[^"\\])*"|\'(\\.|[^\'\\])*\'', '""', line)
+    return re.split(r"//|#(?!include)", line, maxsplit=1)[0]
+
+
+def _block_name(block_lines, index):
+    for line in block_lines:
+        match = re.match(r"^\s*([A-Za-z0-9-]+\s+(SECTION|DIVISION))\s*\.", line, re.IGNORECASE)
+        if match:
+            return match.group(1)
+        match = re.search(r"(?:def|function|func|fn|sub|procedure|class|interface|struct)\s+([A-Za-z_][\w$]*)", line, re.IGNORECASE)
+        if match:
+            return match.group(1)
+        match = re.match(r"^\s*([A-Za-z0-9][A-Za-z0-9-]*)\s*(SECTION\s*)?\.\s*$", line, re.IGNORECASE)
+        if match:
+            return match.group(1)
+        match = re.search(r"([A-Za-z_][\w$]*)\s*\([^;]*\)\s*\{?\s*$", line)
+        if match:
+            return match.group(1)
+    return f"block_{index + 1}"
+
+
+def _cut_lines(lines, start, end, max_lines):
+    """
+    Cuts an oversized span into pieces of at most max_lines, preferring blank lines as cut points.
+    """
+    pieces = []
+    while end - start + 1 > max_lines:
+        limit = start + max_lines - 1
+        cut = limit
+        # Look back over the last quarter of the window for a blank line
+        for number in range(limit, start + (max_lines * 3) // 4, -1):
+            if not lines[number - 1].strip():
+                cut = number
+                break
+        pieces.append((start, cut))
+        start = cut + 1
+    pieces.append((start, end))
+    return pieces
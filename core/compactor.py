@@ -0,0 +1,373 @@
+import ast
+import io
+import json
+import math
+import os
+import re
+import textwrap
+import threading
+import tokenize
+from core import chunker
+from core import metrics
+
+# Prompt compaction.
+# Shrinks what is sent to the model without changing what it means: comments,
+# blank lines, alignment padding and copy-pasted blocks are dropped from source
+# code, and rule payloads are sent as minified JSON. Every call is measured with
+# a local token estimate so the savings show up in stats(), and per call in the
+# logic_foundry_prompt_saved_tokens histogram (labelled by stage).
+#
+#   LOGIC_FOUNDRY_COMPACT=0   sends prompts verbatim (original behaviour)
+
+# Bump whenever the compaction output changes so cached results are not reused
+VERSION = "1"
+
+# Repeated blocks shorter than this are left alone
+DEDUPE_MIN_LINES = 4
+
+# Comment syntax per language family.
+# "line" and "block" are regex fragments; "quotes" are the string delimiters that
+# must be skipped while looking for comments; "marker" starts an inserted note.
+COMMENT_SYNTAX = {
+    "python": {"line": [r"#"], "block": [], "quotes": "\"'", "marker": "#"},
+    "c_like": {"line": [r"//"], "block": [(r"/\*", r"\*/")], "quotes": "\"'`", "marker": "//"},
+    "php": {"line": [r"//", r"#(?!\[)"], "block": [(r"/\*", r"\*/")], "quotes": "\"'", "marker": "//"},
+    "sql": {"line": [r"--"], "block": [(r"/\*", r"\*/")], "quotes": "'\"", "marker": "--"},
+    "vb": {"line": [r"'", r"(?<![\w.])REM\b"], "block": [], "quotes": "\"", "marker": "'"},
+    "cobol": {"line": [r"\*>"], "block": [], "quotes": "'\"", "marker": "*>"},
+    "hash": {"line": [r"#"], "block": [], "quotes": "\"'", "marker": "#"},
+    "text": {"line": [], "block": [], "quotes": "", "marker": "#"},
+}
+
+COBOL_RE = re.compile(r"\b(IDENTIFICATION|PROCEDURE|DATA|ENVIRONMENT)\s+DIVISION\b|\bPIC(TURE)?\s+[SX9AV(]|\bPERFORM\s+[A-Z0-9-]+", re.IGNORECASE)
+SQL_RE = re.compile(r"^\s*(CREATE\s+(OR\s+REPLACE\s+)?(PROCEDURE|FUNCTION|TRIGGER|PACKAGE)|SELECT\s.+\sFROM\s|DECLARE\s)", re.IGNORECASE | re.MULTILINE)
+VB_RE = re.compile(r"^\s*((Public|Private)\s+)?(Sub|Function)\s+\w+\s*\(|^\s*End\s+(Sub|Function|If)\b|^\s*Dim\s+\w+\s+As\b", re.MULTILINE)
+HASH_RE = re.compile(r"^\s*#(?!include|define|if|endif|pragma|region|endregion)", re.MULTILINE)
+FIXED_COBOL_LINE_RE = re.compile(r"^[\d ]{6}[ *\-/Dd]")
+
+_settings = {
+    "enabled": os.getenv("LOGIC_FOUNDRY_COMPACT", "1") != "0",
+    "strip_comments": True,
+    "dedupe": True,
+}
+_patterns = {}
+_lock = threading.Lock()
+_counters = {"calls": 0, "tokens_before": 0, "tokens_after": 0}
+
+
+def configure(enabled=None, strip_comments=None, dedupe=None):
+    """
+    Overrides the process-wide compaction defaults for every later call.
+    A per-session choice is passed as `enabled` to the calls below instead.
+    """
+    with _lock:
+        if enabled is not None:
+            _settings["enabled"] = enabled
+        if strip_comments is not None:
+            _settings["strip_comments"] = strip_comments
+        if dedupe is not None:
+            _settings["dedupe"] = dedupe
+
+
+def cache_tag(prompt_version, enabled=None):
+    """
+    Returns the prompt version to use in cache keys, so compacted and verbatim
+    prompts never share cached results. enabled=None uses the process setting.
+    """
+    if not _is_enabled(enabled):
+        return prompt_version
+    flags = ("c" if _settings["strip_comments"] else "") + ("d" if _settings["dedupe"] else "")
+    return f"{prompt_version}+compact{VERSION}{flags}"
+
+
+def _is_enabled(enabled):
+    return _settings["enabled"] if enabled is None else enabled
+
+
+# --- TOKEN ESTIMATE ---
+
+_TOKEN_RE = re.compile(r"[A-Za-z]+|\d+|\n|[ \t]+|[^\sA-Za-z\d]")
+
+
+def estimate_tokens(text):
+    """
+    Approximates a BPE token count without a tokenizer: about four letters or three
+    digits per token, one per punctuation mark or newline, and a single space is
+    folded into the following word. Good enough to compare two versions of a prompt.
+    """
+    if not text:
+        return 0
+    total = 0
+    for piece in _TOKEN_RE.findall(text):
+        first = piece[0]
+        if first.isalpha():
+            total += math.ceil(len(piece) / 4)
+        elif first.isdigit():
+            total += math.ceil(len(piece) / 3)
+        elif first == " " or first == "\t":
+            if len(piece) > 1:
+                total += math.ceil(len(piece) / 4)
+        else:
+            total += 1
+    return total
+
+
+def stats():
+    """
+    Returns cumulative token accounting for this process.
+    """
+    with _lock:
+        before = _counters["tokens_before"]
+        after = _counters["tokens_after"]
+        return {
+            "calls": _counters["calls"],
+            "tokens_before": before,
+            "tokens_after": after,
+            "tokens_saved": before - after,
+            "saved_ratio": (before - after) / before if before else 0.0
+        }
+
+
+def reset_stats():
+    with _lock:
+        for name in _counters:
+            _counters[name] = 0
+
+
+def _report(language, before, after, stage=None):
+    tokens_before = estimate_tokens(before)
+    tokens_after = estimate_tokens(after)
+    with _lock:
+        _counters["calls"] += 1
+        _counters["tokens_before"] += tokens_before
+        _counters["tokens_after"] += tokens_after
+    metrics.observe("logic_foundry_prompt_saved_tokens", tokens_before - tokens_after, stage=stage)
+    return {
+        "language": language,
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_saved": tokens_before - tokens_after
+    }
+
+
+# --- LANGUAGE DETECTION ---
+
+def detect_language(code_text, hint=None):
+    """
+    Returns the comment-syntax family for code_text: one of the COMMENT_SYNTAX keys.
+    hint is a language name such as "Python" or "Java" (e.g. the generation target).
+    """
+    if hint:
+        name = hint.strip().lower()
+        for family, names in (
+            ("python", ("python", "py")),
+            ("php", ("php",)),
+            ("sql", ("sql", "pl/sql", "plsql", "t-sql", "tsql")),
+            ("vb", ("vb", "vba", "vb.net", "visual basic")),
+            ("cobol", ("cobol", "cbl")),
+            ("hash", ("ruby", "perl", "bash", "shell", "sh")),
+            ("c_like", ("java", "javascript", "typescript", "c", "c++", "c#", "go", "rust", "kotlin", "swift", "scala", "dart")),
+        ):
+            if name in names:
+                return family
+
+    if "<?php" in code_text[:2000]:
+        return "php"
+    if COBOL_RE.search(code_text):
+        return "cobol"
+    try:
+        ast.parse(code_text)
+        return "python"
+    except (SyntaxError, ValueError):
+        pass
+    if VB_RE.search(code_text):
+        return "vb"
+    if SQL_RE.search(code_text):
+        return "sql"
+    if "{" in code_text or ";" in code_text:
+        return "c_like"
+    if HASH_RE.search(code_text):
+        return "hash"
+    return "text"
+
+
+# --- COMMENTS ---
+
+def _string_pattern(quotes):
+    # Backslash escapes cover C-style languages; doubled quotes ('' / "") simply parse
+    # as two adjacent strings, which is just as safe for SQL, VB and COBOL.
+    return [f"{re.escape(q)}(?:\\\\.|[^{re.escape(q)}\\\\\\n])*{re.escape(q)}" for q in quotes]
+
+
+def _comment_pattern(language):
+    pattern = _patterns.get(language)
+    if pattern is None:
+        syntax = COMMENT_SYNTAX[language]
+        strings = _string_pattern(syntax["quotes"])
+        comments = [f"{start}.*?{end}" for start, end in syntax["block"]]
+        comments += [f"{marker}[^\\n]*" for marker in syntax["line"]]
+        if not comments:
+            return None
+        flags = re.DOTALL | (re.IGNORECASE if language in ("vb", "sql", "cobol") else 0)
+        pattern = re.compile(f"({'|'.join(strings) or '(?!)'})|({'|'.join(comments)})", flags)
+        _patterns[language] = pattern
+    return pattern
+
+
+def _strip_python_comments(code_text):
+    lines = code_text.splitlines()
+    cuts = {}
+    try:
+        for tok in tokenize.generate_tokens(io.StringIO(code_text).readline):
+            if tok.type == tokenize.COMMENT:
+                cuts[tok.start[0]] = tok.start[1]
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        return _strip_with_pattern(code_text, "hash")
+    for row, col in cuts.items():
+        lines[row - 1] = lines[row - 1][:col]
+    return "\n".join(lines)
+
+
+def _strip_with_pattern(code_text, language):
+    pattern = _comment_pattern(language)
+    if pattern is None:
+        return code_text
+
+    def keep_strings(match):
+        if match.group(1) is not None:
+            return match.group(1)
+        # Keep line breaks from block comments so line structure survives
+        return "\n" * match.group(2).count("\n") or " "
+
+    return pattern.sub(keep_strings, code_text)
+
+
+def _strip_cobol_fixed(code_text):
+    lines = code_text.splitlines()
+    body = [line for line in lines if line.strip()]
+    # Fixed format: columns 1-6 are a sequence area, column 7 an indicator and
+    # columns 73-80 an identification area. Only treated as such when the file
+    # actually uses it (sequence numbers or column-7 comments).
+    if not body or not all(FIXED_COBOL_LINE_RE.match(line) or len(line) < 7 for line in body):
+        return code_text
+    if not any(line[:6].strip() or line[6:7] in ("*", "/") for line in body):
+        return code_text
+
+    out = []
+    for line in lines:
+        if len(line) >= 7 and line[6] in "*/":
+            continue
+        out.append(line[7:72] if len(line) <= 80 else line[7:])
+    return "\n".join(out)
+
+
+def remove_comments(code_text, language):
+    """
+    Removes comments from code_text without touching string literals.
+    Python docstrings are kept; they often carry the business reasoning.
+    """
+    if language == "python":
+        return _strip_python_comments(code_text)
+    if language == "cobol":
+        code_text = _strip_cobol_fixed(code_text)
+    return _strip_with_pattern(code_text, language)
+
+
+# --- WHITESPACE ---
+
+def normalize_whitespace(code_text, language):
+    """
+    Drops blank lines and trailing whitespace and removes the common indentation.
+    Outside Python, runs of alignment spaces inside a line are collapsed to one.
+    """
+    lines = [line.rstrip() for line in code_text.splitlines()]
+    lines = [line for line in lines if line]
+    text = textwrap.dedent("\n".join(lines))
+    if language == "python":
+        return text
+
+    strings = _string_pattern(COMMENT_SYNTAX[language]["quotes"])
+    pattern = _patterns.get(("space", language))
+    if pattern is None:
+        pattern = re.compile(f"({'|'.join(strings) or '(?!)'})|[ \\t]{{2,}}")
+        _patterns[("space", language)] = pattern
+
+    out = []
+    for line in text.splitlines():
+        body = line.lstrip()
+        indent = line[:len(line) - len(body)]
+        out.append(indent + pattern.sub(lambda m: m.group(1) if m.group(1) is not None else " ", body))
+    return "\n".join(out)
+
+
+# --- REPEATED BLOCKS ---
+
+def dedupe_blocks(code_text, language, min_lines=DEDUPE_MIN_LINES):
+    """
+    Replaces the body of a function/paragraph that repeats an earlier one verbatim
+    with a one-line note pointing at the first copy. Headers are kept, so every
+    name the model needs to report on is still present.
+    """
+    units = chunker.split_units(code_text)
+    if len(units) < 2:
+        return code_text
+
+    marker = COMMENT_SYNTAX[language]["marker"]
+    seen = {}
+    out = []
+    for unit in units:
+        lines = unit["text"].splitlines()
+        body = [line for line in lines[1:] if line.strip()]
+        if len(body) >= min_lines:
+            key = "\n".join(line.strip() for line in body)
+            first = seen.get(key)
+            if first is not None:
+                indent = body[0][:len(body[0]) - len(body[0].lstrip())]
+                out.append(lines[0])
+                out.append(f"{indent}{marker} (same body as {first} above)")
+                continue
+            seen[key] = unit["name"]
+        out.extend(lines)
+    return "\n".join(out)
+
+
+# --- PUBLIC ENTRY POINTS ---
+
+def compact_code(code_text, language=None, strip_comments=None, dedupe=None, enabled=None, stage=None):
+    """
+    Compacts source code for a prompt.
+    Returns (compacted_text, report) where report holds the detected language and
+    the estimated tokens before/after. Disabled compaction returns the text unchanged;
+    enabled=None uses the process setting. stage labels the per-call savings metric.
+    """
+    if not _is_enabled(enabled):
+        return code_text, _report(language or "off", code_text, code_text, stage)
+
+    family = detect_language(code_text, hint=language)
+    if strip_comments is None:
+        strip_comments = _settings["strip_comments"]
+    if dedupe is None:
+        dedupe = _settings["dedupe"]
+
+    text = code_text
+    if strip_comments:
+        text = remove_comments(text, family)
+    text = normalize_whitespace(text, family)
+    if dedupe:
+        text = dedupe_blocks(text, family)
+    return text, _report(family, code_text, text, stage)
+
+
+def compact_json(data, enabled=None, stage=None):
+    """
+    Serializes a rule payload for a prompt: minified when compaction is on,
+    indented (the original format) when it is off.
+    Strings are passed through as-is. Returns (text, report).
+    """
+    if isinstance(data, str):
+        return data, _report("json", data, data, stage)
+    verbose = json.dumps(data, indent=2)
+    if not _is_enabled(enabled):
+        return verbose, _report("json", verbose, verbose, stage)
+    text = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+    return text, _report("json", verbose, text, stage)
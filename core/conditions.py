@@ -0,0 +1,127 @@
+import re
+
+# Parses the numeric comparisons in a rule's "trigger" text, e.g.
+#   "order.total >= 50 and weight > 10"  ->  [total >= 50, weight > 10]
+#   "customer spends at least $1,000"    ->  [spends >= 1000]
+
+NUMBER = r"-?\$?\d[\d,]*(?:\.\d+)?"
+# Hyphens allow COBOL-style names such as WS-ORDER-TOTAL
+IDENTIFIER = r"[A-Za-z_][\w.\[\]'\"-]*(?<!-)"
+
+SYMBOL_OPS = {
+    ">=": ">=", "=>": ">=", "≥": ">=",
+    "<=": "<=", "=<": "<=", "≤": "<=",
+    ">": ">", "<": "<",
+    "==": "==", "=": "==", "===": "==",
+    "!=": "!=", "<>": "!=", "!==": "!=", "≠": "!=",
+}
+WORD_OPS = [
+    ("is greater than or equal to", ">="),
+    ("greater than or equal to", ">="),
+    ("is less than or equal to", "<="),
+    ("less than or equal to", "<="),
+    ("is at least", ">="),
+    ("at least", ">="),
+    ("is at most", "<="),
+    ("at most", "<="),
+    ("is greater than", ">"),
+    ("greater than", ">"),
+    ("is more than", ">"),
+    ("more than", ">"),
+    ("exceeds", ">"),
+    ("is over", ">"),
+    ("over", ">"),
+    ("above", ">"),
+    ("is less than", "<"),
+    ("less than", "<"),
+    ("is under", "<"),
+    ("under", "<"),
+    ("below", "<"),
+    ("is equal to", "=="),
+    ("equals", "=="),
+    ("is not", "!="),
+]
+# When the number comes first ("50 < total") the comparison is mirrored
+FLIPPED = {">": "<", "<": ">", ">=": "<=", "<=": ">=", "==": "==", "!=": "!="}
+
+_symbols = "|".join(re.escape(op) for op in sorted(SYMBOL_OPS, key=len, reverse=True))
+_words = "|".join(re.escape(words) for words, _ in WORD_OPS)
+_WORD_MAP = dict(WORD_OPS)
+
+VAR_FIRST_RE = re.compile(rf"({IDENTIFIER})\s*({_symbols}|\b(?:{_words})\b)\s*({NUMBER})", re.IGNORECASE)
+NUMBER_FIRST_RE = re.compile(rf"(?<![\w.])({NUMBER})\s*({_symbols})\s*({IDENTIFIER})")
+
+# Words that can precede a word operator but are not variable names
+STOP_WORDS = {"if", "when", "and", "or", "not", "is", "the", "a", "an", "then", "else", "elif", "while"}
+
+
+def normalize_name(name):
+    """
+    Normalizes a variable reference to snake_case, keeping only the last attribute/key:
+    "order.totalAmount" -> "total_amount", "data['Weight']" -> "weight".
+    """
+    name = re.sub(r"[\[\]'\"]", ".", name).strip(".")
+    last = [part for part in name.split(".") if part][-1] if name else name
+    last = re.sub(r"(?<=[a-z0-9])(?=[A-Z])", "_", last).replace("-", "_")
+    return last.lower().strip("_")
+
+
+def parse_number(text):
+    value = float(text.replace("$", "").replace(",", ""))
+    return int(value) if value.is_integer() else value
+
+
+def parse_conditions(trigger):
+    """
+    Returns the numeric comparisons found in trigger as dicts with
+    "variable" (normalized), "raw_variable", "op" (one of > >= < <= == !=) and "value".
+    """
+    if not trigger:
+        return []
+
+    conditions = []
+    seen = set()
+
+    for match in VAR_FIRST_RE.finditer(trigger):
+        raw_var, op_text, number = match.groups()
+        if raw_var.lower() in STOP_WORDS:
+            continue
+        op = SYMBOL_OPS.get(op_text) or _WORD_MAP.get(op_text.lower())
+        _add(conditions, seen, raw_var, op, number)
+
+    for match in NUMBER_FIRST_RE.finditer(trigger):
+        number, op_text, raw_var = match.groups()
+        _add(conditions, seen, raw_var, FLIPPED[SYMBOL_OPS[op_text]], number)
+
+    return conditions
+
+
+def _add(conditions, seen, raw_var, op, number):
+    if op is None:
+        return
+    variable = normalize_name(raw_var)
+    if not variable or variable.isdigit():
+        return
+    value = parse_number(number)
+    key = (variable, op, value)
+    if key in seen:
+        return
+    seen.add(key)
+    conditions.append({"variable": variable, "raw_variable": raw_var, "op": op, "value": value})
+
+
+def holds(op, left, right):
+    """
+    Evaluates a parsed comparison.
+    """
+    if op == ">":
+        return left > right
+    if op == ">=":
+        return left >= right
+    if op == "<":
+        return left < right
+    if op == "<=":
+        return left <= right
+    if op == "==":
+        return left == right
+    return left != right
@@ -0,0 +1,521 @@
+import itertools
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from core import conditions
+
+# Execution-based equivalence engine for generated Python.
+# The generated module is loaded in a separate Python process and driven with boundary
+# inputs derived from each rule's trigger thresholds. Every call is traced, and the set
+# of executed lines is the call's "path": a correct `total >= 50` check must switch
+# paths between 49.99 and 50, while `total > 50` switches between 50 and 50.01.
+#
+# This is not a sandbox. The child runs with the same user, filesystem and network
+# access as the caller; only CPU time, memory and the working directory are limited.
+# Loading the module runs its top-level code, so only check code you would run
+# yourself. Callers keep this off unless the user opts in (see
+# validator.validate_equivalence(local_execution=...)).
+
+RUN_TIMEOUT = 10           # seconds for the whole batch of cases
+MEMORY_LIMIT = 512 * 1024 * 1024
+MAX_COMBOS = 16            # settings of the other parameters tried per condition
+GRID_STEPS = 4             # coarse grid points on each side of a threshold
+MAX_STRING_CHOICES = 4
+MAX_ENUM_CHOICES = 6
+
+# What the paths around a threshold t must look like: (changes between t-eps and t, changes between t and t+eps)
+EXPECTED_BREAKS = {
+    ">": (False, True),
+    "<=": (False, True),
+    ">=": (True, False),
+    "<": (True, False),
+    "==": (True, True),
+    "!=": (True, True),
+}
+BREAK_AS_OP = {(False, True): ">", (True, False): ">=", (True, True): "=="}
+# Fallback branches have no threshold of their own; they are the far side of their siblings' checks
+FALLBACK_RE = re.compile(r"^\W*(else|otherwise|default|fallback)\b", re.IGNORECASE)
+
+# Runs in the child process. Reads one JSON request from stdin and writes one JSON reply.
+_RUNNER = r'''
+import dataclasses, decimal, enum, importlib.util, inspect, io, json, sys, typing
+
+def type_info(ann, depth=0):
+    origin = typing.get_origin(ann)
+    if origin is typing.Union or type(ann).__name__ == "UnionType":
+        args = [a for a in typing.get_args(ann) if a is not type(None)]
+        if args:
+            return type_info(args[0], depth)
+    if ann in (int, float, bool, str):
+        return {"type": ann.__name__}
+    if ann is decimal.Decimal:
+        return {"type": "Decimal"}
+    if inspect.isclass(ann) and issubclass(ann, enum.Enum):
+        return {"type": "enum", "cls": ann.__name__, "members": [m.name for m in ann]}
+    if inspect.isclass(ann) and dataclasses.is_dataclass(ann) and depth < 2:
+        try:
+            hints = typing.get_type_hints(ann)
+        except Exception:
+            hints = {}
+        fields = []
+        for f in dataclasses.fields(ann):
+            if not f.init:
+                continue
+            info = type_info(hints.get(f.name, f.type), depth + 1)
+            info["name"] = f.name
+            if f.default is not dataclasses.MISSING and isinstance(f.default, (int, float, str, bool, type(None))):
+                info["default"] = f.default
+            fields.append(info)
+        return {"type": "dataclass", "cls": ann.__name__, "fields": fields}
+    return {"type": "unknown"}
+
+def describe_callable(qualname, fn, skip_self=False):
+    try:
+        sig = inspect.signature(fn)
+    except (TypeError, ValueError):
+        return None
+    try:
+        hints = typing.get_type_hints(fn)
+    except Exception:
+        hints = {}
+    params = []
+    for i, (name, p) in enumerate(sig.parameters.items()):
+        if skip_self and i == 0:
+            continue
+        if p.kind in (p.VAR_POSITIONAL, p.VAR_KEYWORD):
+            continue
+        info = type_info(hints.get(name, p.annotation))
+        info["name"] = name
+        if p.default is not p.empty and isinstance(p.default, (int, float, str, bool, type(None))):
+            info["default"] = p.default
+        params.append(info)
+    # Names the body touches (attributes, globals, locals) tell which function uses which field
+    code = getattr(fn, "__code__", None)
+    names = sorted(set(code.co_names) | set(code.co_varnames)) if code else []
+    return {"name": qualname, "params": params, "names": names}
+
+def constructible(cls):
+    try:
+        sig = inspect.signature(cls)
+    except (TypeError, ValueError):
+        return False
+    return all(
+        p.default is not p.empty or p.kind in (p.VAR_POSITIONAL, p.VAR_KEYWORD)
+        for p in sig.parameters.values()
+    )
+
+def describe(mod):
+    found = []
+    for name, obj in vars(mod).items():
+        if name.startswith("_") or getattr(obj, "__module__", None) != mod.__name__:
+            continue
+        if inspect.isfunction(obj):
+            d = describe_callable(name, obj)
+            if d:
+                found.append(d)
+        elif inspect.isclass(obj) and not dataclasses.is_dataclass(obj) and not issubclass(obj, enum.Enum):
+            # Methods are only reachable if the class can be built without arguments. Check the
+            # signature instead of calling it: a constructor may do anything
+            if not constructible(obj):
+                continue
+            for mname, member in vars(obj).items():
+                if mname.startswith("_"):
+                    continue
+                if isinstance(member, staticmethod):
+                    d = describe_callable(f"{name}.{mname}", member.__func__)
+                elif inspect.isfunction(member):
+                    d = describe_callable(f"{name}.{mname}", member, skip_self=True)
+                else:
+                    d = None
+                if d:
+                    found.append(d)
+    return found
+
+def decode(mod, value):
+    if isinstance(value, dict):
+        if "__decimal__" in value:
+            return decimal.Decimal(value["__decimal__"])
+        if "__enum__" in value:
+            return getattr(mod, value["__enum__"])[value["member"]]
+        if "__dataclass__" in value:
+            cls = getattr(mod, value["__dataclass__"])
+            return cls(**{k: decode(mod, v) for k, v in value["fields"].items()})
+    return value
+
+def resolve(mod, qualname):
+    if "." in qualname:
+        cls_name, member = qualname.split(".", 1)
+        return getattr(getattr(mod, cls_name)(), member)
+    return getattr(mod, qualname)
+
+def run(mod, path, cases):
+    results = []
+    for case in cases:
+        lines = set()
+        def tracer(frame, event, arg):
+            if frame.f_code.co_filename != path:
+                return None
+            if event == "line":
+                lines.add(frame.f_lineno)
+            return tracer
+        raised = None
+        try:
+            fn = resolve(mod, case["function"])
+            args = {k: decode(mod, v) for k, v in case["args"].items()}
+            sys.settrace(tracer)
+            try:
+                fn(**args)
+            finally:
+                sys.settrace(None)
+        except Exception as e:
+            raised = type(e).__name__
+        results.append([sorted(lines), raised])
+    return results
+
+def main():
+    request = json.loads(sys.stdin.read())
+    out = sys.stdout
+    # Keep prints and input() calls in the generated code away from our protocol
+    sys.stdout = io.StringIO()
+    sys.stdin = io.StringIO("")
+    path = request["module_path"]
+    try:
+        spec = importlib.util.spec_from_file_location("generated_module", path)
+        mod = importlib.util.module_from_spec(spec)
+        sys.modules["generated_module"] = mod
+        spec.loader.exec_module(mod)
+        if request["action"] == "describe":
+            reply = {"functions": describe(mod)}
+        else:
+            reply = {"results": run(mod, path, request["cases"])}
+    except BaseException as e:
+        reply = {"error": f"{type(e).__name__}: {e}"}
+    out.write(json.dumps(reply))
+
+main()
+'''
+
+
+def _limit_resources():
+    # Runs in the child before exec (POSIX only): cap CPU time and memory
+    import resource
+    resource.setrlimit(resource.RLIMIT_CPU, (RUN_TIMEOUT, RUN_TIMEOUT))
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (MEMORY_LIMIT, MEMORY_LIMIT))
+    except (ValueError, OSError):
+        pass
+
+
+def _run_subprocess(module_path, request, timeout=RUN_TIMEOUT):
+    """
+    Runs the runner script once in a child process and returns its decoded reply.
+    """
+    request = dict(request, module_path=module_path)
+    workdir = os.path.dirname(module_path)
+    try:
+        proc = subprocess.run(
+            [sys.executable, "-I", "-S", "-c", _RUNNER],
+            input=json.dumps(request),
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+            cwd=workdir,
+            env={"PATH": os.environ.get("PATH", ""), "HOME": workdir, "PYTHONHASHSEED": "0"},
+            preexec_fn=_limit_resources if os.name == "posix" else None
+        )
+    except subprocess.TimeoutExpired:
+        return {"error": f"Generated code did not finish within {timeout}s"}
+    try:
+        return json.loads(proc.stdout)
+    except ValueError:
+        # The last stderr line carries the exception; whitespace-only stderr has none
+        lines = (proc.stderr or "").strip().splitlines()
+        return {"error": lines[-1] if lines else "Runner produced no output"}
+
+
+def _names_match(variable, name):
+    name = conditions.normalize_name(name)
+    return variable == name or variable.endswith("_" + name) or name.endswith("_" + variable)
+
+
+def _find_target(functions, variable):
+    """
+    Finds the callable taking a parameter (or dataclass field) named like variable.
+    Callables whose body actually references the name are preferred.
+    Returns (function, param_name, field_name_or_None), or None.
+    """
+    numeric = ("int", "float", "Decimal", "unknown")
+    candidates = []
+    for fn in functions:
+        for param in fn["params"]:
+            if param["type"] in numeric and _names_match(variable, param["name"]):
+                candidates.append((0, fn, param["name"], None))
+            elif param["type"] == "dataclass":
+                for field in param["fields"]:
+                    if field["type"] in numeric and _names_match(variable, field["name"]):
+                        used = field["name"] in fn.get("names", [])
+                        candidates.append((0 if used else 1, fn, param["name"], field["name"]))
+    if not candidates:
+        return None
+    rank, fn, param_name, field_name = min(candidates, key=lambda c: c[0])
+    return fn, param_name, field_name
+
+
+def _baseline(info):
+    """
+    A neutral value for a parameter that the current check is not varying.
+    """
+    kind = info["type"]
+    if kind == "dataclass":
+        return {"__dataclass__": info["cls"], "fields": {f["name"]: _baseline(f) for f in info["fields"]}}
+    if "default" in info:
+        return info["default"]
+    if kind == "bool":
+        return False
+    if kind == "str":
+        return ""
+    if kind == "float":
+        return 0.0
+    if kind == "Decimal":
+        return {"__decimal__": "0"}
+    if kind == "enum":
+        return {"__enum__": info["cls"], "member": info["members"][0]} if info["members"] else None
+    return 0
+
+
+def _choices(info, literals):
+    """
+    Alternative values to try for a parameter so conditions guarded by flags or categories are reached.
+    """
+    kind = info["type"]
+    if kind == "bool":
+        return [False, True]
+    if kind == "str":
+        return ([info["default"]] if "default" in info else [""]) + literals[:MAX_STRING_CHOICES]
+    if kind == "enum":
+        return [{"__enum__": info["cls"], "member": m} for m in info["members"][:MAX_ENUM_CHOICES]]
+    return [_baseline(info)]
+
+
+def _encode_number(info, value):
+    if info["type"] == "Decimal":
+        return {"__decimal__": repr(value)}
+    if info["type"] == "int":
+        return int(value)
+    return value
+
+
+def _satisfying_value(cond):
+    """
+    A value that makes cond true, used to hold the other conditions of a rule open.
+    """
+    step = 1 if isinstance(cond["value"], int) else 0.5
+    op = cond["op"]
+    if op in (">", "!="):
+        return cond["value"] + step
+    if op == "<":
+        return cond["value"] - step
+    return cond["value"]
+
+
+def _sweep(info, threshold):
+    """
+    Returns (eps, boundary points, coarse grid) for a threshold.
+    """
+    if info["type"] == "int" or (info["type"] in ("unknown",) and isinstance(threshold, int)):
+        eps = 1
+    else:
+        eps = max(abs(threshold), 1) * 1e-6
+    boundary = [threshold - eps, threshold, threshold + eps]
+    step = max(abs(threshold) * 0.25, 1)
+    grid = sorted({threshold + k * step for k in range(-GRID_STEPS, GRID_STEPS + 1)} | set(boundary))
+    if info["type"] == "int":
+        grid = sorted({int(round(x)) for x in grid})
+    return eps, boundary, grid
+
+
+def _string_literals(rule):
+    text = f"{rule.get('trigger', '')} {rule.get('action', '')}"
+    found = re.findall(r"['\"]([^'\"]{1,40})['\"]", text)
+    # Upper-case codes such as VIP, AK, HI are common category values
+    found += re.findall(r"\b[A-Z][A-Z0-9_]{1,15}\b", rule.get("trigger", ""))
+    unique = []
+    for value in found:
+        if value not in unique and value.lower() not in conditions.STOP_WORDS and value not in ("IF", "ELSE", "AND", "OR"):
+            unique.append(value)
+    return unique
+
+
+def _plan_condition(rule, cond, target, other_conds):
+    """
+    Builds every case needed to check one condition of one rule.
+    Returns (cases, layout) where layout maps results back to combos and points.
+    """
+    fn, param_name, field_name = target
+    params = {p["name"]: p for p in fn["params"]}
+    literals = _string_literals(rule)
+
+    varied = params[param_name]
+    if field_name:
+        varied = next(f for f in params[param_name]["fields"] if f["name"] == field_name)
+    eps, boundary, grid = _sweep(varied, cond["value"])
+
+    # Every other parameter (or field of the varied dataclass) gets a list of values to combine
+    slots = []
+    for p in fn["params"]:
+        if p["type"] == "dataclass":
+            for f in p["fields"]:
+                if p["name"] == param_name and f["name"] == field_name:
+                    continue
+                slots.append(((p["name"], f["name"]), f))
+        elif p["name"] != param_name:
+            slots.append(((p["name"], None), p))
+
+    options = []
+    for (p_name, f_name), info in slots:
+        forced = None
+        for other in other_conds:
+            if _names_match(other["variable"], f_name or p_name) and info["type"] in ("int", "float", "Decimal", "unknown"):
+                forced = [_encode_number(info, _satisfying_value(other))]
+        options.append(forced or _choices(info, literals))
+
+    combos = list(itertools.islice(itertools.product(*options), MAX_COMBOS))
+    points = boundary + [x for x in grid if x not in boundary]
+
+    cases = []
+    for combo in combos:
+        base = {}
+        for ((p_name, f_name), info), value in zip(slots, combo):
+            if f_name is None:
+                base[p_name] = value
+            else:
+                base.setdefault(p_name, _baseline(params[p_name]))["fields"][f_name] = value
+        for x in points:
+            args = json.loads(json.dumps(base))
+            encoded = _encode_number(varied, x)
+            if field_name:
+                args.setdefault(param_name, _baseline(params[param_name]))["fields"][field_name] = encoded
+            else:
+                args[param_name] = encoded
+            cases.append({"function": fn["name"], "args": args})
+
+    return cases, {"combos": len(combos), "points": points, "eps": eps}
+
+
+def _judge(cond, layout, results):
+    """
+    Classifies one condition as "pass", "mismatch" (with details) or "inconclusive".
+    """
+    expected = EXPECTED_BREAKS[cond["op"]]
+    points = layout["points"]
+    per_combo = len(points)
+    threshold = cond["value"]
+    observed_breaks = []
+    elsewhere = []
+
+    for c in range(layout["combos"]):
+        sigs = [json.dumps(r) for r in results[c * per_combo:(c + 1) * per_combo]]
+        below, at, above = sigs[0], sigs[1], sigs[2]
+        observed = (below != at, at != above)
+        if observed == expected:
+            return "pass", None
+        if observed != (False, False):
+            observed_breaks.append(observed)
+
+        # Look for a path change somewhere else on the grid
+        ordered = sorted(zip(points, sigs))
+        for (x0, s0), (x1, s1) in zip(ordered, ordered[1:]):
+            if s0 != s1 and not (threshold - layout["eps"] <= x0 and x1 <= threshold + layout["eps"]):
+                elsewhere.append((x0, x1))
+
+    if observed_breaks:
+        like = BREAK_AS_OP.get(observed_breaks[0], "?")
+        return "mismatch", f"Rule says {cond['raw_variable']} {cond['op']} {threshold}, but the code switches branches as if it used '{like}' at {threshold}."
+    if elsewhere:
+        x0, x1 = min(elsewhere, key=lambda pair: abs((pair[0] + pair[1]) / 2 - threshold))
+        return "mismatch", f"Rule threshold {cond['raw_variable']} {cond['op']} {threshold} not found; the code changes behaviour between {x0:g} and {x1:g} instead."
+    return "inconclusive", None
+
+
+def check_rules(rules, code_text, timeout=RUN_TIMEOUT):
+    """
+    Checks rules against generated Python code by executing it in a child process
+    with the caller's privileges (see the note at the top of this module).
+    Returns a dict with "verified" (rule ids), "discrepancies" (validator schema)
+    and "unresolved" (rules the engine could not check, for the LLM fallback).
+    """
+    outcome = {"verified": [], "discrepancies": [], "unresolved": []}
+    with tempfile.TemporaryDirectory(prefix="logic_foundry_") as workdir:
+        module_path = os.path.join(workdir, "generated_module.py")
+        with open(module_path, "w", encoding="utf-8") as f:
+            f.write(code_text)
+
+        described = _run_subprocess(module_path, {"action": "describe"}, timeout)
+        functions = described.get("functions")
+        if not functions:
+            outcome["unresolved"] = list(rules)
+            outcome["error"] = described.get("error", "No callable functions found in generated code")
+            return outcome
+
+        # Plan every check first so all cases run in a single child process
+        plans = []
+        cases = []
+        for rule in rules:
+            conds = conditions.parse_conditions(rule.get("trigger", ""))
+            checks = []
+            for cond in conds:
+                target = _find_target(functions, cond["variable"])
+                if target is None:
+                    continue
+                others = [c for c in conds if c is not cond]
+                rule_cases, layout = _plan_condition(rule, cond, target, others)
+                layout["offset"] = len(cases)
+                layout["count"] = len(rule_cases)
+                cases.extend(rule_cases)
+                checks.append((cond, layout))
+            plans.append((rule, checks))
+
+        results = []
+        if cases:
+            ran = _run_subprocess(module_path, {"action": "run", "cases": cases}, timeout)
+            results = ran.get("results")
+            if results is None:
+                outcome["unresolved"] = list(rules)
+                outcome["error"] = ran.get("error", "Running the generated code failed")
+                return outcome
+
+    fallbacks = []
+    for rule, checks in plans:
+        if not checks:
+            if FALLBACK_RE.match(rule.get("trigger", "")):
+                fallbacks.append(rule)
+            else:
+                outcome["unresolved"].append(rule)
+            continue
+        verdicts = []
+        for cond, layout in checks:
+            chunk = results[layout["offset"]:layout["offset"] + layout["count"]]
+            verdicts.append(_judge(cond, layout, chunk))
+
+        problems = [detail for verdict, detail in verdicts if verdict == "mismatch"]
+        if problems:
+            outcome["discrepancies"].append({
+                "rule_id": rule.get("id", "Unknown Rule"),
+                "severity": "CRITICAL",
+                "issue": " ".join(problems)
+            })
+        elif all(verdict == "pass" for verdict, _ in verdicts):
+            outcome["verified"].append(rule.get("id"))
+        else:
+            outcome["unresolved"].append(rule)
+
+    # Else-paths count as covered only when every threshold around them checked out
+    if outcome["verified"] and not outcome["discrepancies"] and not outcome["unresolved"]:
+        outcome["verified"].extend(rule.get("id") for rule in fallbacks)
+    else:
+        outcome["unresolved"].extend(fallbacks)
+
+    return outcome
@@ -1,21 +1,53 @@
-import json
-import google.generativeai as genai
-from openai import OpenAI
-import streamlit as st
 import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from core import cache
+from core import chunker
+from core import compactor
+from core import json_repair
+from core import json_stream
+from core import llm_client
+from core import metrics
+from core import static_extractor
 
-# HARDCODED KEYS (Replace with real keys or use env vars)
-# User: Paste your OpenRouter "Key for Model Requests" here
-api_key = st.secrets.get("OPENROUTER_API_KEY", os.getenv("OPENROUTER_API_KEY"))
+# Bump whenever the system prompt changes so cached results are not reused
+PROMPT_VERSION = "1"
 
-def extract_logic(code_text, model_name):
+# Inputs longer than this are split into chunks and extracted concurrently
+CHUNK_LINES = 300
+MAX_CHUNK_WORKERS = 8
+
+# Plain Python if/elif/else ladders are extracted locally with `ast` (core.static_extractor);
+# set LOGIC_FOUNDRY_STATIC_EXTRACT=0 to always ask the model
+STATIC_EXTRACTION = os.getenv("LOGIC_FOUNDRY_STATIC_EXTRACT", "1") != "0"
+
+def extract_logic(code_text, model_name, use_cache=True, policy=None, compact=None):
     """
     Extracts business logic from code_text using the specified model via OpenRouter.
     Returns a parsed JSON dictionary.
+    Results are served from the persistent cache when the same code and model were seen before;
+    pass use_cache=False to force a fresh call (the cache entry is refreshed).
+    policy overrides the retry/deadline/hedging defaults for the model call (see llm_client.chat);
+    compact turns prompt compaction on or off for this call (None uses the process setting).
+    Simple Python input that the static extractor fully covers skips the model entirely.
     """
-    
-    # System prompt to enforce JSON structure
-    system_prompt = """You are an expert logic extractor. Your goal is to extract business logic from the provided code and return it in the following JSON structure:
+    static_result, complete = _static_pass(code_text)
+    if complete:
+        return static_result
+
+    key = _cache_key(code_text, model_name, static_result, compact)
+    with metrics.timer("logic_foundry_stage_seconds", stage="extract"):
+        return cache.cached_call(
+            key,
+            lambda: _extract_logic_uncached(code_text, model_name, static_result, policy, compact),
+            use_cache=use_cache,
+            # Partial (truncated) results are not cached, so the next run tries again
+            is_error=lambda result: "error" in result or "warnings" in result,
+            stage="extract"
+        )
+
+# System prompt to enforce JSON structure
+SYSTEM_PROMPT = """You are an expert logic extractor. Your goal is to extract business logic from the provided code and return it in the following JSON structure:
 {
   "module_name": "string",
   "stats": { 
@@ -36,46 +68,313 @@ CRITICAL INSTRUCTIONS:
 2. For "else" blocks, create a specific rule with a trigger like "ELSE" or "OTHERWISE".
 3. Return ONLY valid JSON. Do not include markdown formatting like ```json."""
 
-    user_prompt = f"Code to analyze:\n\n{code_text}"
+def _build_messages(code_text, seed=None, compact=None):
+    # Comments, blank lines and repeated blocks carry no rules; drop them before sending
+    compact_text, _ = compactor.compact_code(code_text, enabled=compact, stage="extract")
+    user_prompt = f"Code to analyze:\n\n{compact_text}"
+    if seed and seed.get("rules"):
+        # Partial static extraction: the model keeps these rules, writes their reasons and adds what is missing
+        seed_text, _ = compactor.compact_json(seed["rules"], enabled=compact, stage="extract")
+        user_prompt += (
+            "\n\nRules already extracted from the syntax tree (keep their triggers and actions, "
+            "write a business reason for each, and add any rules they miss):\n\n" + seed_text
+        )
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt}
+    ]
+
+def _parse_content(content, model_name=None):
+    # Tolerant parse: fences, stray prose, syntax slips and cut-off replies are repaired
+    # locally; model_name allows one cheap fix-up call when that is not enough
+    result, report = json_repair.parse_reply(content, model_name, stage="extract")
+    if isinstance(result, list):
+        result = {"rules": result}
+    if not isinstance(result, dict):
+        raise ValueError(report.get("error", "Model reply is not a JSON object"))
+
+    if report["truncated"]:
+        rules = result.setdefault("rules", [])
+        result.setdefault("module_name", "Module")
+        result.setdefault("stats", {"complexity_score": 0, "rule_count": len(rules)})
+        result["warnings"] = result.get("warnings", []) + ["Model output was incomplete; showing the rules received before it ended."]
+    return result
 
+def _error_result(message):
+    return {
+        "error": message,
+        "rules": [],
+        "module_name": "Error",
+        "stats": {"complexity_score": 0, "rule_count": 0}
+    }
+
+def _static_pass(code_text):
+    """
+    Runs the local AST extractor. Returns (result, complete); result is None for non-Python input.
+    """
+    if not STATIC_EXTRACTION:
+        return None, False
     try:
-        # Initialize OpenAI client pointing to OpenRouter
-        client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=OPENROUTER_API_KEY,
-            default_headers={
-                "HTTP-Referer": "http://localhost:8501", # Optional
-                "X-Title": "Logic Foundry", # Optional
-            }
-        )
-        
-        response = client.chat.completions.create(
-            model=model_name,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
+        result, complete = static_extractor.extract(code_text)
+    except Exception:
+        # Never let the shortcut break extraction; the model handles the input instead
+        return None, False
+    if result is not None and result.get("rules"):
+        metrics.increment("logic_foundry_static_extractions_total", coverage="complete" if complete else "partial")
+    return result, complete
+
+def _cache_key(code_text, model_name, seed, compact=None):
+    # The static seed is part of the prompt, so results differ with the setting and
+    # whenever the static extractor reads the same code differently
+    seed_tag = cache.content_hash(seed) if seed and seed.get("rules") else "none"
+    prompt_version = f"{compactor.cache_tag(PROMPT_VERSION, compact)}|static={int(STATIC_EXTRACTION)}:{seed_tag}"
+    return cache.make_key("extract", code_text, model_name, prompt_version)
+
+def _extract_logic_uncached(code_text, model_name, seed=None, policy=None, compact=None):
+    try:
+        response = llm_client.chat(
+            model_name,
+            _build_messages(code_text, seed, compact),
+            stage="extract",
+            policy=policy,
             # Helper to ensure JSON if model supports it (optional, removing for broad compatibility)
             # response_format={"type": "json_object"} 
         )
         
-        content = response.choices[0].message.content.strip()
-        
-        # Clean up potential markdown
-        if content.startswith("```json"):
-            content = content[7:]
-        elif content.startswith("```"):
-            content = content[3:]
-            
-        if content.endswith("```"):
-            content = content[:-3]
-            
-        return json.loads(content.strip())
+        return _parse_content(response.choices[0].message.content, model_name)
         
     except Exception as e:
-        return {
-            "error": f"OpenRouter extraction failed: {str(e)}",
+        return _error_result(f"OpenRouter extraction failed: {str(e)}")
+
+def extract_logic_stream(code_text, model_name, use_cache=True, policy=None, compact=None):
+    """
+    Streaming variant of extract_logic.
+    Yields each rule dict as soon as its JSON object closes in the completion stream,
+    and returns the full result dictionary (same schema as extract_logic) when the stream ends:
+
+        stream = extract_logic_stream(code, model)
+        while True:
+            try:
+                rule = next(stream)
+            except StopIteration as done:
+                result = done.value
+                break
+    """
+    static_result, complete = _static_pass(code_text)
+    if complete:
+        for rule in static_result["rules"]:
+            yield rule
+        return static_result
+
+    key = _cache_key(code_text, model_name, static_result, compact)
+    if use_cache:
+        cached = cache.get_cache().get(key)
+        if cached is not None:
+            metrics.increment("logic_foundry_cache_hits_total", stage="extract")
+            for rule in cached.get("rules", []):
+                yield rule
+            return cached
+
+    metrics.increment("logic_foundry_cache_misses_total", stage="extract")
+    parser = json_stream.ArrayItemStream("rules")
+    try:
+        stream = llm_client.chat(model_name, _build_messages(code_text, static_result, compact), stage="extract", policy=policy, stream=True)
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            for rule in parser.feed(delta):
+                yield rule
+    except Exception as e:
+        if not parser.items:
+            return _error_result(f"OpenRouter extraction failed: {str(e)}")
+
+    try:
+        # Rules already streamed are worth more than a fix-up call
+        result = _parse_content(parser.text, None if parser.items else model_name)
+    except Exception:
+        # The reply could not be repaired; keep the rules that did arrive
+        if not parser.items:
+            return _error_result("OpenRouter extraction failed: model returned no parseable rules")
+        result = {
+            "module_name": "Module",
+            "stats": {"complexity_score": 0, "rule_count": len(parser.items)},
+            "rules": parser.items,
+            "warnings": ["Model output was incomplete; showing the rules received before it ended."]
+        }
+        return result
+
+    if "warnings" not in result:
+        cache.get_cache().put(key, result)
+    return result
+
+
+def extract_logic_chunked(code_text, model_name, max_chunk_lines=CHUNK_LINES, max_workers=MAX_CHUNK_WORKERS, use_cache=True, policy=None, compact=None):
+    """
+    Map-reduce extraction for large files.
+    Splits code_text at function/class boundaries, extracts every chunk concurrently
+    and merges the partial results, so wall-clock time follows the largest chunk.
+    Inputs that fit in a single chunk go straight to extract_logic.
+    """
+    chunks = chunker.split_chunks(code_text, max_lines=max_chunk_lines)
+    if len(chunks) <= 1:
+        return extract_logic(code_text, model_name, use_cache=use_cache, policy=policy, compact=compact)
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as pool:
+        results = list(pool.map(
+            lambda chunk: extract_logic(chunk["text"], model_name, use_cache=use_cache, policy=policy, compact=compact),
+            chunks
+        ))
+
+    return merge_results(results, chunks)
+
+def merge_results(results, chunks=None):
+    """
+    Merges partial extraction results into one result in the extractor schema.
+    Rule IDs are re-numbered in source order, and rule_count / complexity_score are recomputed.
+    """
+    ok = [r for r in results if "error" not in r]
+    if not ok:
+        return results[0] if results else {
+            "error": "No code to analyze",
             "rules": [],
             "module_name": "Error",
             "stats": {"complexity_score": 0, "rule_count": 0}
         }
+
+    rules = []
+    weighted_complexity = 0
+    for result in ok:
+        partial = result.get("rules", [])
+        for rule in partial:
+            rules.append(dict(rule, id=f"rule_{len(rules) + 1}"))
+        # Weight each chunk's complexity by how many rules it contributed
+        score = result.get("stats", {}).get("complexity_score", 0) or 0
+        weighted_complexity += score * max(len(partial), 1)
+
+    total_weight = sum(max(len(r.get("rules", [])), 1) for r in ok)
+    complexity = round(weighted_complexity / total_weight) if total_weight else 0
+
+    names = Counter(r.get("module_name") for r in ok if r.get("module_name"))
+    merged = {
+        "module_name": names.most_common(1)[0][0] if names else "Module",
+        "stats": {
+            "complexity_score": min(max(complexity, 1), 10),
+            "rule_count": len(rules)
+        },
+        "rules": rules
+    }
+
+    failed = [i for i, r in enumerate(results) if "error" in r]
+    if failed:
+        merged["warnings"] = []
+        for i in failed:
+            where = ""
+            if chunks:
+                where = f" (lines {chunks[i]['start']}-{chunks[i]['end']})"
+            merged["warnings"].append(f"Chunk {i + 1}{where}: {results[i]['error']}")
+    return merged
+
+def unit_fingerprint(unit_text):
+    """
+    Fingerprints a function/block so whitespace-only edits do not count as changes.
+    """
+    lines = [line.rstrip() for line in unit_text.strip("\n").splitlines()]
+    return cache.content_hash("unit", "\n".join(line for line in lines if line))
+
+def extract_logic_incremental(code_text, model_name, previous_state=None, max_workers=MAX_CHUNK_WORKERS, use_cache=True, policy=None, compact=None):
+    """
+    Re-extracts only the functions/blocks that changed since previous_state.
+    Rules of untouched units are reused with their IDs unchanged; new rules get fresh IDs.
+    Returns (result, state); pass state back in on the next call (e.g. via st.session_state).
+    """
+    units = chunker.split_units(code_text, max_lines=CHUNK_LINES)
+
+    state = previous_state or {}
+    if state.get("model") != model_name or state.get("prompt_version") != PROMPT_VERSION:
+        # Rules from another model/prompt are not comparable; start over but keep IDs unique
+        state = {"next_id": state.get("next_id", 1), "units": []}
+
+    previous = {}
+    for entry in state.get("units", []):
+        previous.setdefault(entry["fingerprint"], []).append(entry)
+
+    entries = []
+    changed = []
+    for unit in units:
+        fingerprint = unit_fingerprint(unit["text"])
+        reused = previous.get(fingerprint)
+        if reused:
+            entries.append(reused.pop(0))
+        elif not _has_code(unit["text"]):
+            entries.append({"fingerprint": fingerprint, "name": unit["name"], "rules": [], "complexity_score": 0})
+        else:
+            entries.append(None)
+            changed.append((len(entries) - 1, unit, fingerprint))
+
+    results = []
+    if changed:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(changed))) as pool:
+            results = list(pool.map(
+                lambda item: extract_logic(item[1]["text"], model_name, use_cache=use_cache, policy=policy, compact=compact),
+                changed
+            ))
+
+    next_id = state.get("next_id", 1)
+    warnings = []
+    for (index, unit, fingerprint), result in zip(changed, results):
+        if "error" in result:
+            warnings.append(f"{unit['name']} (lines {unit['start']}-{unit['end']}): {result['error']}")
+            entries[index] = None
+            continue
+        rules = []
+        for rule in result.get("rules", []):
+            rules.append(dict(rule, id=f"rule_{next_id}"))
+            next_id += 1
+        entries[index] = {
+            "fingerprint": fingerprint,
+            "name": unit["name"],
+            "rules": rules,
+            "complexity_score": result.get("stats", {}).get("complexity_score", 0) or 0,
+            "module_name": result.get("module_name")
+        }
+
+    kept = [entry for entry in entries if entry is not None]
+    rules = [rule for entry in kept for rule in entry["rules"]]
+    weighted = sum(e["complexity_score"] * len(e["rules"]) for e in kept)
+    complexity = round(weighted / len(rules)) if rules else 0
+    names = Counter(e.get("module_name") for e in kept if e.get("module_name"))
+
+    if not rules and warnings:
+        return _error_result("; ".join(warnings)), state
+
+    result = {
+        "module_name": state.get("module_name") or (names.most_common(1)[0][0] if names else "Module"),
+        "stats": {
+            "complexity_score": min(max(complexity, 1), 10),
+            "rule_count": len(rules)
+        },
+        "rules": rules
+    }
+    if warnings:
+        result["warnings"] = warnings
+
+    new_state = {
+        "model": model_name,
+        "prompt_version": PROMPT_VERSION,
+        "module_name": result["module_name"],
+        "next_id": next_id,
+        "units": kept,
+        "last_run": {"units": len(units), "reextracted": len(changed), "reused": len(units) - len(changed)}
+    }
+    return result, new_state
+
+def _has_code(text):
+    # Blank or comment-only blocks carry no rules
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped and not stripped.startswith(("#", "//", "/*", "*", "--")):
+            return True
+    return False
@@ -1,17 +1,59 @@
-import google.generativeai as genai
-from openai import OpenAI
-import json
-# Reusing keys from extractor
-from core.extractor import OPENROUTER_API_KEY
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from core import cache
+from core import compactor
+from core import json_repair
+from core import llm_client
+from core import metrics
 
-def generate_modern_code(logic_json, target_language, api_keys_input, model_name):
+# Bump whenever the system prompt changes so cached results are not reused
+PROMPT_VERSION = "1"
+
+# Targets offered in the UI; generate_all runs any subset of them side by side
+TARGET_LANGUAGES = ["Python 3.12", "TypeScript (Node)", "Go", "Java 21"]
+MAX_GENERATE_WORKERS = 4
+
+def generate_modern_code(logic_json, target_language, api_keys_input, model_name, use_cache=True, policy=None, compact=None):
     """
     Generates modern, idiomatic code in the target_language based on the extracted business logic.
+    Repeat requests for the same rules, language and model are served from the persistent cache.
+    policy overrides the retry/deadline/hedging defaults for the model call (see llm_client.chat);
+    compact turns prompt compaction on or off for this call (None uses the process setting).
+    """
+    key = cache.make_key("generate", logic_json, model_name, compactor.cache_tag(PROMPT_VERSION, compact), target_language)
+    with metrics.timer("logic_foundry_stage_seconds", stage="generate"):
+        return cache.cached_call(
+            key,
+            lambda: _generate_modern_code_uncached(logic_json, target_language, api_keys_input, model_name, policy, compact),
+            use_cache=use_cache,
+            is_error=lambda code: code.startswith("# Error generating code"),
+            stage="generate"
+        )
+
+def generate_all(logic_json, target_languages, api_keys_input, model_name, max_workers=MAX_GENERATE_WORKERS, use_cache=True, policy=None, compact=None):
+    """
+    Generates code for several target languages concurrently on a bounded worker pool.
+    Yields (target_language, code) pairs as each one completes, fastest first.
+    Each language goes through generate_modern_code, so it is cached independently.
     """
-    
-    # Determine keys to use (Input overrides hardcoded)
+    languages = list(dict.fromkeys(target_languages))
+    if not languages:
+        return
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(languages)))) as pool:
+        futures = {
+            pool.submit(generate_modern_code, logic_json, language, api_keys_input, model_name, use_cache, policy, compact): language
+            for language in languages
+        }
+        for future in as_completed(futures):
+            language = futures[future]
+            try:
+                yield language, future.result()
+            except Exception as e:
+                yield language, f"# Error generating code with OpenRouter: {str(e)}"
+
+def _generate_modern_code_uncached(logic_json, target_language, api_keys_input, model_name, policy=None, compact=None):
+    # Determine keys to use (Input overrides secrets/env)
     # In this OpenRouter version, we only use the OpenRouter key
-    openrouter_key = api_keys_input.get("api_key") or OPENROUTER_API_KEY
+    openrouter_key = api_keys_input.get("api_key")
 
     system_prompt = f"""You are a Clean Code Expert. I will give you a list of Business Rules in JSON format.
 Your goal is to implement these rules in highly readable, idiomatic {target_language} code.
@@ -27,35 +69,22 @@ CRITICAL INSTRUCTIONS:
 - Return ONLY the code block. Do not wrap in markdown code fences if possible, or if you do, ensure it's clean.
 """
 
-    user_prompt = f"Business Rules to Implement:\n\n{json.dumps(logic_json, indent=2)}"
+    rules_text, _ = compactor.compact_json(logic_json, enabled=compact, stage="generate")
+    user_prompt = f"Business Rules to Implement:\n\n{rules_text}"
 
     try:
-         # Initialize OpenAI client pointing to OpenRouter
-        client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=openrouter_key,
-            default_headers={
-                "HTTP-Referer": "http://localhost:8501", 
-                "X-Title": "Logic Foundry", 
-            }
-        )
-
-        response = client.chat.completions.create(
-            model=model_name,
-            messages=[
+        # Shared pooled client pointing to OpenRouter
+        response = llm_client.chat(
+            model_name,
+            [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
-            ]
+            ],
+            api_key=openrouter_key,
+            stage="generate",
+            policy=policy
         )
-        content = response.choices[0].message.content
-        # Clean up markdown if present
-        if content.startswith("```"):
-            lines = content.splitlines()
-            if lines[0].startswith("```"):
-                lines = lines[1:]
-            if lines[-1].startswith("```"):
-                lines = lines[:-1]
-            content = "\n".join(lines)
-        return content
+        # Clean up markdown if present (also when the model adds prose around the block)
+        return json_repair.strip_fences(response.choices[0].message.content)
     except Exception as e:
         return f"# Error generating code with OpenRouter: {str(e)}"
@@ -0,0 +1,375 @@
+import json
+import re
+from core import llm_client
+from core import metrics
+
+# Tolerant JSON parsing for model replies.
+# parse() first tries json.loads on the reply with any markdown fence removed. If that
+# fails, it re-tokenizes the reply and rebuilds valid JSON, recording each fix:
+#
+#   fence            ```json ... ``` around the payload
+#   leading_text     prose before the first { or [
+#   trailing_text    prose after the payload
+#   trailing_comma   [1, 2,]  /  {"a": 1,}
+#   missing_comma    {"a": 1 "b": 2}  /  [{...} {...}]
+#   extra_comma      [1,, 2]
+#   missing_colon    {"a" 1}
+#   missing_value    {"a": }
+#   single_quotes    {'a': 'b'}
+#   unquoted_key     {a: 1}
+#   unquoted_value   {"a": yes please}
+#   python_literal   True / False / None / NaN
+#   comment          // ... and /* ... */
+#   control_char     raw newlines/tabs or bad escapes inside strings
+#   bracket          a ] or } that does not match the open container
+#   truncated        the reply stops early; the last incomplete item is dropped and
+#                    every open container closed, so the largest valid prefix survives
+#
+# parse_reply() adds one cheap follow-up when nothing can be recovered: only the broken
+# reply (not the original prompt) is sent back with a request to fix it.
+
+# Markdown fences only count at the start of a line; an indented one (an example in a
+# docstring, say) is part of the code around it
+OPEN_FENCE_RE = re.compile(r"^```[\w+-]*[ \t]*$")
+CLOSE_FENCE_RE = re.compile(r"^```[ \t]*$")
+# Text outside the fences longer than this is code, not prose around a block
+MAX_PROSE_LINES = 3
+
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<ws>\s+)
+  | (?P<comment>//[^\n]*|/\*.*?(?:\*/|\Z))
+  | (?P<dstr>"(?:[^"\\]|\\.)*(?:"|\Z))
+  | (?P<sstr>'(?:[^'\\]|\\.)*(?:'|\Z))
+  | (?P<num>-?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<word>[A-Za-z_$][\w$-]*)
+  | (?P<punct>[{}\[\]:,])
+  | (?P<other>.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+# Inside a string: valid escapes (kept), stray backslashes and raw control characters (fixed)
+_STRING_PART_RE = re.compile(r'\\u[0-9a-fA-F]{4}|\\["\\/bfnrt]|\\|[\x00-\x1f]')
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t", "\b": "\\b", "\f": "\\f"}
+_LITERALS = {"true": "true", "false": "false", "null": "null",
+             "True": "true", "False": "false", "None": "null",
+             "NaN": "null", "Infinity": "null", "undefined": "null"}
+
+FIX_PROMPT = """The following text was meant to be a single JSON value but does not parse.
+Return ONLY the corrected JSON: same keys, same values, no commentary, no markdown fences.
+If it was cut off, close it after the last complete item."""
+
+
+def strip_fences(text):
+    """
+    Returns the code inside the markdown fences of a reply, or text unchanged when the
+    reply is not a fenced one. Fences are unwrapped when the reply starts with one or when
+    everything outside them is a few lines of prose ("Here is the code:"); several blocks
+    are joined with a blank line. Unfenced code that only contains a fenced example is
+    returned as is. An opening fence without a closing one (a cut-off reply) keeps
+    everything after it.
+    """
+    if "```" not in text:
+        return text
+    blocks, outside = _code_blocks(text.strip())
+    if not blocks:
+        return text
+    starts_fenced = not outside[0].strip()
+    prose = all(sum(1 for line in part.splitlines() if line.strip()) <= MAX_PROSE_LINES for part in outside)
+    if not (starts_fenced or prose):
+        return text
+    return "\n\n".join(block for block in blocks if block.strip())
+
+
+def _code_blocks(text):
+    # Splits text at line-start fences into (fenced blocks, the stretches of text around them)
+    blocks, outside = [], []
+    current, inside = [], False
+    for line in text.split("\n"):
+        if not inside and OPEN_FENCE_RE.match(line):
+            outside.append("\n".join(current))
+            current, inside = [], True
+        elif inside and CLOSE_FENCE_RE.match(line):
+            blocks.append("\n".join(current))
+            current, inside = [], False
+        else:
+            current.append(line)
+    if inside:
+        # Unclosed block; a fence glued to the last line (`}```) still closes it
+        last = "\n".join(current).rstrip()
+        blocks.append(last[:-3] if last.endswith("```") else last)
+    else:
+        outside.append("\n".join(current))
+    return blocks, outside
+
+
+def parse(text):
+    """
+    Parses a model reply that should hold one JSON value.
+    Returns (value, report); report has "repaired", "truncated" and "fixes" (a list of
+    the fix names above), plus "error" when nothing could be recovered (value is None).
+    """
+    report = {"repaired": False, "truncated": False, "fixes": []}
+    if text is None:
+        report["error"] = "Empty reply"
+        return None, report
+
+    body = text.strip()
+    if "```" in body:
+        unfenced = strip_fences(body).strip()
+        if unfenced != body:
+            body = unfenced
+            report["fixes"].append("fence")
+    try:
+        value = json.loads(body)
+        report["repaired"] = bool(report["fixes"])
+        return value, report
+    except ValueError:
+        pass
+
+    repaired, fixes, truncated = _repair(body)
+    report["fixes"].extend(fix for fix in fixes if fix not in report["fixes"])
+    report["truncated"] = truncated
+    report["repaired"] = True
+    if repaired is None:
+        report["error"] = "No JSON object or array found in reply"
+        return None, report
+    try:
+        return json.loads(repaired), report
+    except ValueError as e:
+        report["error"] = f"Could not repair JSON: {e}"
+        return None, report
+
+
+def parse_reply(content, model_name=None, stage="llm", api_key=None):
+    """
+    parse() plus metrics, and one "fix this JSON" follow-up call to model_name when the
+    reply cannot be repaired locally. Returns (value, report).
+    """
+    value, report = parse(content)
+    if value is None and model_name and content and content.strip():
+        try:
+            response = llm_client.chat(
+                model_name,
+                [
+                    {"role": "system", "content": FIX_PROMPT},
+                    {"role": "user", "content": content}
+                ],
+                api_key=api_key,
+                stage=f"{stage}_fix"
+            )
+            fixed, fixed_report = parse(response.choices[0].message.content)
+        except Exception as e:
+            fixed, fixed_report = None, {"error": f"Fix-up request failed: {e}", "fixes": []}
+        if fixed is not None:
+            value = fixed
+            report = dict(fixed_report, repaired=True)
+            report["fixes"] = ["model_fix"] + report["fixes"]
+        else:
+            report["error"] = fixed_report.get("error", report.get("error"))
+
+    for fix in report["fixes"]:
+        metrics.increment("logic_foundry_json_repairs_total", stage=stage, kind=fix)
+    return value, report
+
+
+def _repair(text):
+    """
+    Rebuilds valid JSON from text. Returns (json_text, fixes, truncated); json_text is
+    None when text holds no object or array.
+    """
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        return None, [], False
+    start = min(starts)
+    fixes = set()
+    if text[:start].strip():
+        fixes.add("leading_text")
+
+    out = []
+    # Each open container: [bracket, state]; objects move key -> colon -> value -> comma,
+    # arrays move value -> comma
+    stack = []
+    pending_comma = False
+    safe = None  # (len(out), [brackets]) after the last complete top-level member / item
+    finished = False
+    position = start
+
+    def before_value():
+        # Emits the comma owed before a new member/item, inserting a missing one if needed
+        nonlocal pending_comma
+        if stack and stack[-1][1] == "comma":
+            fixes.add("missing_comma")
+            pending_comma = True
+            stack[-1][1] = "key" if stack[-1][0] == "{" else "value"
+        if pending_comma:
+            out.append(",")
+            pending_comma = False
+
+    def value_done():
+        nonlocal safe, finished
+        if not stack:
+            finished = True
+            return
+        stack[-1][1] = "comma"
+        if len(stack) == 1 or (len(stack) == 2 and stack[-1][0] == "["):
+            safe = (len(out), [entry[0] for entry in stack])
+
+    def emit_scalar(token):
+        top = stack[-1] if stack else None
+        if top is not None and top[0] == "{" and top[1] in ("key", "comma"):
+            before_value()
+            out.append(token if token.startswith('"') else json.dumps(token))
+            top[1] = "colon"
+            return
+        if top is not None and top[0] == "{" and top[1] == "colon":
+            fixes.add("missing_colon")
+            out.append(":")
+            top[1] = "value"
+        before_value()
+        out.append(token)
+        value_done()
+
+    for match in _TOKEN_RE.finditer(text, start):
+        if finished:
+            position = match.start()
+            break
+        kind = match.lastgroup
+        token = match.group()
+        position = match.end()
+
+        if kind == "ws":
+            continue
+        if kind == "comment":
+            fixes.add("comment")
+            continue
+
+        if kind == "dstr":
+            if len(token) < 2 or not token.endswith('"') or token.endswith('\\"') and not _closes(token):
+                break  # unterminated string: the reply was cut off here
+            inner = _clean_string(token[1:-1])
+            if inner != token[1:-1]:
+                fixes.add("control_char")
+            emit_scalar('"' + inner + '"')
+        elif kind == "sstr":
+            if len(token) < 2 or not token.endswith("'"):
+                break
+            fixes.add("single_quotes")
+            inner = token[1:-1].replace("\\'", "'")
+            emit_scalar('"' + _clean_string(inner.replace('"', '\\"')) + '"')
+        elif kind == "num":
+            if stack and stack[-1][0] == "{" and stack[-1][1] in ("key", "comma"):
+                fixes.add("unquoted_key")
+                emit_scalar(json.dumps(token))
+            else:
+                emit_scalar(token)
+        elif kind == "word":
+            in_key = stack and stack[-1][0] == "{" and stack[-1][1] in ("key", "comma")
+            if in_key:
+                fixes.add("unquoted_key")
+                emit_scalar(json.dumps(token))
+            elif token in _LITERALS:
+                if _LITERALS[token] != token:
+                    fixes.add("python_literal")
+                emit_scalar(_LITERALS[token])
+            else:
+                # Bare word in value position: keep it as a string
+                fixes.add("unquoted_value")
+                emit_scalar(json.dumps(token))
+        elif token in "{[":
+            if stack and stack[-1][0] == "{" and stack[-1][1] in ("key", "comma"):
+                # A container where a key belongs: the key went missing; keep the structure
+                fixes.add("missing_value")
+                before_value()
+                out.append('"_"')
+                stack[-1][1] = "colon"
+            if stack and stack[-1][1] == "colon":
+                fixes.add("missing_colon")
+                out.append(":")
+                stack[-1][1] = "value"
+            before_value()
+            out.append(token)
+            stack.append([token, "key" if token == "{" else "value"])
+            if len(stack) == 1 or (len(stack) == 2 and token == "["):
+                safe = (len(out), [entry[0] for entry in stack])
+        elif token in "}]":
+            if not stack:
+                continue
+            wanted = "}" if stack[-1][0] == "{" else "]"
+            if token != wanted:
+                fixes.add("bracket")
+                if not any(entry[0] == ("{" if token == "}" else "[") for entry in stack):
+                    continue  # stray closer: drop it
+            # Close containers until the one this bracket belongs to
+            while stack:
+                top = stack[-1]
+                closer = "}" if top[0] == "{" else "]"
+                if pending_comma:
+                    fixes.add("trailing_comma")
+                    pending_comma = False
+                if top[0] == "{" and top[1] in ("colon", "value"):
+                    fixes.add("missing_value")
+                    if top[1] == "colon":
+                        out.append(":")
+                    out.append("null")
+                stack.pop()
+                out.append(closer)
+                value_done()
+                if closer == token:
+                    break
+        elif token == ":":
+            if stack and stack[-1][0] == "{" and stack[-1][1] == "colon":
+                out.append(":")
+                stack[-1][1] = "value"
+            else:
+                fixes.add("stray_text")
+        elif token == ",":
+            if not stack:
+                continue
+            if stack[-1][1] == "comma":
+                pending_comma = True
+                stack[-1][1] = "key" if stack[-1][0] == "{" else "value"
+            elif stack[-1][0] == "{" and stack[-1][1] == "value":
+                fixes.add("missing_value")
+                out.append("null")
+                value_done()
+                pending_comma = True
+                stack[-1][1] = "key"
+            else:
+                fixes.add("extra_comma")
+        else:
+            fixes.add("stray_text")
+    else:
+        position = len(text)
+
+    if finished:
+        if text[position:].strip():
+            fixes.add("trailing_text")
+        return "".join(out), sorted(fixes), False
+
+    # --- TRUNCATED: roll back to the last complete item and close what is open ---
+    fixes.add("truncated")
+    if safe is None:
+        return None, sorted(fixes), True
+    length, brackets = safe
+    del out[length:]
+    for bracket in reversed(brackets):
+        out.append("}" if bracket == "{" else "]")
+    return "".join(out), sorted(fixes), True
+
+
+def _closes(token):
+    # A string ending in \" is closed only if that backslash is itself escaped
+    backslashes = len(token[:-1]) - len(token[:-1].rstrip("\\"))
+    return backslashes % 2 == 0
+
+
+def _clean_string(inner):
+    def fix(match):
+        part = match.group()
+        if len(part) > 1:
+            return part
+        if part == "\\":
+            return "\\\\"
+        return _CONTROL_ESCAPES.get(part, "")
+    return _STRING_PART_RE.sub(fix, inner)
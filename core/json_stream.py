@@ -0,0 +1,92 @@
+import json
+
+# Incremental parser for streamed model output.
+# Watches the character stream for a top-level array (e.g. "rules") and hands back
+# each element as soon as its closing brace arrives, long before the full reply is valid JSON.
+
+
+class ArrayItemStream:
+    """
+    Feed text fragments in arrival order; feed() returns the array items completed by that fragment.
+    Text outside the JSON object (markdown fences, prose) is ignored.
+    """
+
+    def __init__(self, key="rules"):
+        self.key = key
+        self.items = []
+        self.errors = []
+        self._fragments = []
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._key_chars = None
+        self._last_key = None
+        self._array_depth = None
+        self._item_chars = None
+
+    @property
+    def text(self):
+        """
+        Everything fed so far.
+        """
+        return "".join(self._fragments)
+
+    def feed(self, fragment):
+        """
+        Consumes the next fragment and returns a list of newly completed items.
+        """
+        self._fragments.append(fragment)
+        completed = []
+        for ch in fragment:
+            if self._item_chars is not None:
+                self._item_chars.append(ch)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    # Remember object keys of the top-level object
+                    if self._key_chars is not None:
+                        self._last_key = "".join(self._key_chars)
+                        self._key_chars = None
+                elif self._key_chars is not None:
+                    self._key_chars.append(ch)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                if len(self._stack) == 1:
+                    self._key_chars = []
+            elif ch in "{[":
+                if ch == "[" and len(self._stack) == 1 and self._array_depth is None and self._last_key == self.key:
+                    self._array_depth = 2
+                elif ch == "{" and self._array_depth is not None and len(self._stack) == self._array_depth:
+                    self._item_chars = [ch]
+                self._stack.append(ch)
+            elif ch in "}]":
+                if not self._stack:
+                    continue
+                self._stack.pop()
+                if ch == "}" and self._item_chars is not None and len(self._stack) == self._array_depth:
+                    item = self._load("".join(self._item_chars))
+                    if item is not None:
+                        self.items.append(item)
+                        completed.append(item)
+                    self._item_chars = None
+                elif ch == "]" and self._array_depth is not None and len(self._stack) == self._array_depth - 1:
+                    # Target array closed; ignore any later array with the same key
+                    self._array_depth = -1
+            elif ch == "," and len(self._stack) == 1:
+                self._last_key = None
+
+        return completed
+
+    def _load(self, fragment):
+        try:
+            return json.loads(fragment)
+        except ValueError as e:
+            self.errors.append(str(e))
+            return None
@@ -0,0 +1,251 @@
+import os
+import sys
+import threading
+import time
+from core import cache
+from core import metrics
+from core import resilience
+
+# Shared OpenRouter client layer.
+# Every stage goes through one keep-alive connection pool, so repeated calls reuse
+# open TLS connections instead of paying a new handshake per request.
+# `openai`/`httpx` are imported on first use, so importing core modules stays cheap.
+BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+POOL_SIZE = int(os.getenv("LOGIC_FOUNDRY_POOL_SIZE", 32))
+CONNECT_TIMEOUT = float(os.getenv("LOGIC_FOUNDRY_CONNECT_TIMEOUT", 10))
+READ_TIMEOUT = float(os.getenv("LOGIC_FOUNDRY_READ_TIMEOUT", 180))
+KEEPALIVE_EXPIRY = float(os.getenv("LOGIC_FOUNDRY_KEEPALIVE_EXPIRY", 90))
+
+DEFAULT_HEADERS = {
+    "HTTP-Referer": "http://localhost:8501", # Optional
+    "X-Title": "Logic Foundry", # Optional
+}
+
+_settings = {
+    "base_url": BASE_URL,
+    "pool_size": POOL_SIZE,
+    "connect_timeout": CONNECT_TIMEOUT,
+    "read_timeout": READ_TIMEOUT,
+}
+_http_client = None
+_clients = {}
+_lock = threading.Lock()
+# Called once before every upstream request (retries and hedges included); see set_rate_limiter()
+_rate_limiter = None
+
+
+def resolve_api_key():
+    """
+    Returns the OpenRouter key from Streamlit secrets, falling back to the OPENROUTER_API_KEY env var.
+    Secrets are only consulted when running under Streamlit, so headless scripts never import it.
+    """
+    key = None
+    st = sys.modules.get("streamlit")
+    if st is not None:
+        try:
+            key = st.secrets.get("OPENROUTER_API_KEY")
+        except Exception:
+            # No secrets.toml; the env var is the only source
+            key = None
+    return key or os.getenv("OPENROUTER_API_KEY")
+
+
+def configure(base_url=None, pool_size=None, connect_timeout=None, read_timeout=None):
+    """
+    Overrides pool settings. Existing clients are closed and rebuilt on next use.
+    """
+    global _http_client
+    with _lock:
+        if base_url is not None:
+            _settings["base_url"] = base_url
+        if pool_size is not None:
+            _settings["pool_size"] = pool_size
+        if connect_timeout is not None:
+            _settings["connect_timeout"] = connect_timeout
+        if read_timeout is not None:
+            _settings["read_timeout"] = read_timeout
+
+        old = _http_client
+        _http_client = None
+        _clients.clear()
+    if old is not None:
+        old.close()
+
+
+def set_rate_limiter(acquire):
+    """
+    Installs a blocking callable that is invoked before every upstream request, e.g. a
+    token bucket's acquire(). Retries and hedged requests each take their own token.
+    None removes the limiter.
+    """
+    global _rate_limiter
+    _rate_limiter = acquire
+
+
+def get_http_client():
+    """
+    Returns the process-wide httpx pool shared by every OpenAI client.
+    httpx.Client is thread-safe, so one pool serves all Streamlit sessions and worker threads.
+    """
+    global _http_client
+    if _http_client is None:
+        import httpx
+        with _lock:
+            if _http_client is None:
+                _http_client = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=_settings["pool_size"],
+                        max_keepalive_connections=_settings["pool_size"],
+                        keepalive_expiry=KEEPALIVE_EXPIRY
+                    ),
+                    timeout=httpx.Timeout(_settings["read_timeout"], connect=_settings["connect_timeout"]),
+                    follow_redirects=True
+                )
+    return _http_client
+
+
+def get_client(api_key=None):
+    """
+    Returns a shared OpenAI client pointed at OpenRouter.
+    One client is kept per API key; all of them share the same connection pool.
+    """
+    key = api_key or resolve_api_key()
+    client = _clients.get(key)
+    if client is None:
+        from openai import OpenAI
+        http_client = get_http_client()
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = OpenAI(
+                    base_url=_settings["base_url"],
+                    api_key=key,
+                    default_headers=DEFAULT_HEADERS,
+                    http_client=http_client,
+                    # Retries are handled by core.resilience so they respect the call deadline
+                    max_retries=0
+                )
+                _clients[key] = client
+    return client
+
+
+def chat(model_name, messages, api_key=None, stage="llm", policy=None, **kwargs):
+    """
+    Sends a chat-completions request through the shared client under the core.resilience
+    policy: a per-call deadline, retries with jittered backoff on timeouts/429/5xx, and
+    (when enabled) a hedged request to the fallback model if the primary is slower than
+    its recent p95. A reply from the hedge model is kept out of the stage's result cache.
+    policy overrides the process defaults for this call only, as keyword arguments to
+    resilience.policy() (e.g. {"deadline": 60, "hedge": True}).
+    Extra keyword arguments (e.g. stream=True) are passed through to the SDK.
+    Latency, time to first token, token usage and retries are recorded in core.metrics under `stage`.
+    """
+    policy = resilience.policy(**(policy or {}))
+    deadline = time.monotonic() + policy["deadline"]
+
+    def attempt(model):
+        def call(timeout):
+            return _chat_once(model, messages, api_key, stage, timeout=timeout, **kwargs)
+        return lambda: resilience.with_retries(
+            call,
+            deadline,
+            max_retries=policy["max_retries"],
+            on_retry=lambda n, e: metrics.increment("logic_foundry_llm_retries_total", stage=stage, model=model)
+        )
+
+    hedge_model = policy["hedge_model"]
+    # Streams hand back the first chunk almost at once, so there is nothing to hedge
+    if kwargs.get("stream") or not policy["hedge"] or not hedge_model or hedge_model == model_name:
+        return attempt(model_name)()
+
+    response, winner = resilience.hedged(attempt(model_name), attempt(hedge_model), hedge_delay(stage, model_name))
+    if winner == "fallback":
+        metrics.increment("logic_foundry_llm_hedges_total", stage=stage, model=model_name, outcome="fallback_won")
+        # The stage caches results under model_name; a reply from the hedge model must not be stored there
+        cache.skip_store()
+    return response
+
+
+def hedge_delay(stage, model_name):
+    """
+    Seconds to wait for model_name before hedging: its recent p95 latency for this stage,
+    or HEDGE_DEFAULT_DELAY until enough requests have been observed.
+    """
+    p95, count = metrics.quantile("logic_foundry_llm_request_seconds", 0.95, stage=stage, model=model_name)
+    if p95 is None or count < resilience.HEDGE_MIN_SAMPLES:
+        return resilience.HEDGE_DEFAULT_DELAY
+    return max(resilience.HEDGE_MIN_DELAY, p95)
+
+
+def _chat_once(model_name, messages, api_key, stage, **kwargs):
+    limiter = _rate_limiter
+    if limiter is not None:
+        limiter()
+    start = time.perf_counter()
+    try:
+        response = get_client(api_key).chat.completions.create(
+            model=model_name,
+            messages=messages,
+            **kwargs
+        )
+    except Exception:
+        metrics.observe("logic_foundry_llm_request_seconds", time.perf_counter() - start, stage=stage, model=model_name)
+        metrics.increment("logic_foundry_llm_requests_total", stage=stage, model=model_name, outcome="error")
+        raise
+
+    if kwargs.get("stream"):
+        return _TimedStream(response, start, stage, model_name)
+
+    elapsed = time.perf_counter() - start
+    metrics.observe("logic_foundry_llm_request_seconds", elapsed, stage=stage, model=model_name)
+    metrics.observe("logic_foundry_llm_ttft_seconds", elapsed, stage=stage, model=model_name)
+    metrics.increment("logic_foundry_llm_requests_total", stage=stage, model=model_name, outcome="ok")
+    _record_usage(getattr(response, "usage", None), stage, model_name)
+    return response
+
+
+def _record_usage(usage, stage, model_name):
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_tokens", None)
+    completion_tokens = getattr(usage, "completion_tokens", None)
+    if prompt_tokens is not None:
+        metrics.observe("logic_foundry_llm_prompt_tokens", prompt_tokens, stage=stage, model=model_name)
+    if completion_tokens is not None:
+        metrics.observe("logic_foundry_llm_completion_tokens", completion_tokens, stage=stage, model=model_name)
+
+
+class _TimedStream:
+    """
+    Wraps a streaming response so the first chunk and the end of the stream are timed.
+    Iterates exactly like the SDK stream.
+    """
+
+    def __init__(self, stream, start, stage, model_name):
+        self._stream = stream
+        self._start = start
+        self._stage = stage
+        self._model_name = model_name
+
+    def __iter__(self):
+        first = True
+        usage = None
+        outcome = "error"
+        try:
+            for chunk in self._stream:
+                if first:
+                    metrics.observe("logic_foundry_llm_ttft_seconds", time.perf_counter() - self._start, stage=self._stage, model=self._model_name)
+                    first = False
+                # Providers that report usage on a stream put it on the last chunk
+                usage = getattr(chunk, "usage", None) or usage
+                yield chunk
+            outcome = "ok"
+        finally:
+            metrics.observe("logic_foundry_llm_request_seconds", time.perf_counter() - self._start, stage=self._stage, model=self._model_name)
+            metrics.increment("logic_foundry_llm_requests_total", stage=self._stage, model=self._model_name, outcome=outcome)
+            _record_usage(usage, self._stage, self._model_name)
+
+    def close(self):
+        close = getattr(self._stream, "close", None)
+        if close is not None:
+            close()
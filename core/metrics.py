@@ -0,0 +1,259 @@
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# In-process performance metrics.
+# Counters and histograms keyed by name plus a small set of labels (stage, model, ...),
+# aggregated in memory and exported as a JSON snapshot or Prometheus text format.
+#
+#   metrics.increment("logic_foundry_cache_hits_total", stage="extract")
+#   with metrics.timer("logic_foundry_stage_seconds", stage="extract"):
+#       ...
+
+# Upper bounds (inclusive) of the histogram buckets; +Inf is implicit
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+
+HELP = {
+    "logic_foundry_stage_seconds": "Wall time of a pipeline stage, including cache lookups.",
+    "logic_foundry_llm_request_seconds": "Wall time of one chat-completions request.",
+    "logic_foundry_llm_ttft_seconds": "Time to first token (whole response when not streaming).",
+    "logic_foundry_llm_prompt_tokens": "Prompt tokens per request.",
+    "logic_foundry_llm_completion_tokens": "Completion tokens per request.",
+    "logic_foundry_prompt_saved_tokens": "Estimated prompt tokens removed by compaction, per compacted prompt part.",
+    "logic_foundry_llm_requests_total": "Chat-completions requests by outcome.",
+    "logic_foundry_llm_retries_total": "Requests retried after a failure or timeout.",
+    "logic_foundry_llm_hedges_total": "Hedged requests where the fallback model answered first.",
+    "logic_foundry_cache_hits_total": "Result cache hits.",
+    "logic_foundry_cache_misses_total": "Result cache misses.",
+    "logic_foundry_json_repairs_total": "Model replies that needed repair before they parsed.",
+    "logic_foundry_render_seconds": "Time to build or render a flowchart.",
+    "logic_foundry_static_extractions_total": "Inputs extracted locally from the syntax tree, by coverage.",
+    "logic_foundry_store_seconds": "Time to read or write the artifact store.",
+    "logic_foundry_index_seconds": "Time to index a module or query the rule index.",
+    "logic_foundry_service_jobs_total": "Service jobs by kind and final status (rejected when the queue was full).",
+    "logic_foundry_service_wait_seconds": "Time a service job waited in the queue.",
+    "logic_foundry_service_job_seconds": "Time a worker spent running a service job.",
+}
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+
+
+def _series(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _buckets_for(name):
+    return TOKEN_BUCKETS if name.endswith("_tokens") else SECONDS_BUCKETS
+
+
+def increment(name, amount=1, **labels):
+    """
+    Adds amount to a counter.
+    """
+    key = _series(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name, value, **labels):
+    """
+    Records one value in a histogram. Buckets are chosen from the name:
+    *_tokens metrics use TOKEN_BUCKETS, everything else SECONDS_BUCKETS.
+    """
+    key = _series(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            bounds = _buckets_for(name)
+            hist = {"bounds": bounds, "counts": [0] * (len(bounds) + 1), "sum": 0.0, "count": 0, "max": 0.0}
+            _histograms[key] = hist
+        index = next((i for i, bound in enumerate(hist["bounds"]) if value <= bound), len(hist["bounds"]))
+        hist["counts"][index] += 1
+        hist["sum"] += value
+        hist["count"] += 1
+        hist["max"] = max(hist["max"], value)
+
+
+@contextmanager
+def timer(name, **labels):
+    """
+    Times the enclosed block into a seconds histogram, whether or not it raises.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def _quantile(hist, q):
+    # Upper bound of the bucket holding the q-th observation (Prometheus-style estimate)
+    if not hist["count"]:
+        return 0.0
+    rank = q * hist["count"]
+    seen = 0
+    for i, count in enumerate(hist["counts"]):
+        seen += count
+        if seen >= rank and count:
+            return hist["bounds"][i] if i < len(hist["bounds"]) else hist["max"]
+    return hist["max"]
+
+
+def snapshot():
+    """
+    Returns every series as plain data:
+    {"counters": [{name, labels, value}], "histograms": [{name, labels, count, sum, mean, p50, p95, max, buckets}]}.
+    """
+    with _lock:
+        counters = [
+            {"name": name, "labels": dict(labels), "value": value}
+            for (name, labels), value in sorted(_counters.items())
+        ]
+        histograms = []
+        for (name, labels), hist in sorted(_histograms.items()):
+            histograms.append({
+                "name": name,
+                "labels": dict(labels),
+                "count": hist["count"],
+                "sum": round(hist["sum"], 6),
+                "mean": round(hist["sum"] / hist["count"], 6) if hist["count"] else 0.0,
+                "p50": _quantile(hist, 0.5),
+                "p95": _quantile(hist, 0.95),
+                "max": round(hist["max"], 6),
+                "buckets": dict(zip([str(b) for b in hist["bounds"]] + ["+Inf"], hist["counts"]))
+            })
+    return {"counters": counters, "histograms": histograms}
+
+
+def summary(name, group_by="stage"):
+    """
+    Collapses one histogram into a row per label value (e.g. per stage), for tables.
+    """
+    rows = {}
+    for hist in snapshot()["histograms"]:
+        if hist["name"] != name:
+            continue
+        group = hist["labels"].get(group_by, "all")
+        row = rows.setdefault(group, {group_by: group, "count": 0, "sum": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0})
+        row["count"] += hist["count"]
+        row["sum"] += hist["sum"]
+        row["p50"] = max(row["p50"], hist["p50"])
+        row["p95"] = max(row["p95"], hist["p95"])
+        row["max"] = max(row["max"], hist["max"])
+    for row in rows.values():
+        row["mean"] = round(row["sum"] / row["count"], 4) if row["count"] else 0.0
+        row["sum"] = round(row["sum"], 4)
+    return list(rows.values())
+
+
+def quantile(name, q, **labels):
+    """
+    Estimates the q-quantile of one histogram series by interpolating inside its bucket.
+    Returns (value, count); value is None when nothing was observed.
+    """
+    key = _series(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None or not hist["count"]:
+            return None, 0
+        counts = list(hist["counts"])
+        bounds = hist["bounds"]
+        total = hist["count"]
+        top = hist["max"]
+
+    rank = q * total
+    seen = 0
+    lower = 0.0
+    for i, count in enumerate(counts):
+        upper = bounds[i] if i < len(bounds) else top
+        if count and seen + count >= rank:
+            return min(top, lower + (upper - lower) * (rank - seen) / count), total
+        seen += count
+        lower = upper
+    return top, total
+
+
+def counter_total(name, **labels):
+    """
+    Sums a counter across every series whose labels include the given ones.
+    """
+    wanted = {k: str(v) for k, v in labels.items()}
+    with _lock:
+        return sum(
+            value for (series_name, series_labels), value in _counters.items()
+            if series_name == name and wanted.items() <= dict(series_labels).items()
+        )
+
+
+def _format_labels(labels, extra=None):
+    pairs = list(labels) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    escaped = []
+    for key, value in pairs:
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        escaped.append(f'{key}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_number(value):
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def to_prometheus():
+    """
+    Renders every series in the Prometheus text exposition format.
+    """
+    lines = []
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((key, dict(hist, counts=list(hist["counts"]))) for key, hist in _histograms.items())
+
+    declared = set()
+    for (name, labels), value in counters:
+        if name not in declared:
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            declared.add(name)
+        lines.append(f"{name}{_format_labels(labels)} {_format_number(value)}")
+
+    for (name, labels), hist in histograms:
+        if name not in declared:
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            declared.add(name)
+        cumulative = 0
+        for bound, count in zip(list(hist["bounds"]) + [math.inf], hist["counts"]):
+            cumulative += count
+            le = "+Inf" if math.isinf(bound) else _format_number(float(bound))
+            lines.append(f"{name}_bucket{_format_labels(labels, {'le': le})} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_format_number(float(hist['sum']))}")
+        lines.append(f"{name}_count{_format_labels(labels)} {hist['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def write_snapshot(path):
+    """
+    Writes the current metrics to path: Prometheus text for .prom/.txt files, JSON otherwise.
+    """
+    if os.path.splitext(path)[1].lower() in (".prom", ".txt"):
+        data = to_prometheus()
+    else:
+        data = json.dumps(snapshot(), indent=2)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(data)
+    return path
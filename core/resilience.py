@@ -0,0 +1,163 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Retry, deadline and hedging policy for model calls.
+# Kept free of SDK imports: callers hand in plain callables, so the same policy
+# wraps any request.
+#
+#   LOGIC_FOUNDRY_DEADLINE       total seconds a call may take, retries included (120)
+#   LOGIC_FOUNDRY_MAX_RETRIES    retries after the first attempt (3)
+#   LOGIC_FOUNDRY_HEDGE          "1" to enable hedging (off by default)
+#   LOGIC_FOUNDRY_HEDGE_MODEL    model raced against a slow primary (google/gemini-2.0-flash-001)
+DEADLINE_SECONDS = float(os.getenv("LOGIC_FOUNDRY_DEADLINE", 120))
+MAX_RETRIES = int(os.getenv("LOGIC_FOUNDRY_MAX_RETRIES", 3))
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+HEDGE_MODEL = os.getenv("LOGIC_FOUNDRY_HEDGE_MODEL", "google/gemini-2.0-flash-001")
+# Until enough latencies are recorded for a model, hedge after this many seconds
+HEDGE_DEFAULT_DELAY = 8.0
+HEDGE_MIN_DELAY = 1.0
+HEDGE_MIN_SAMPLES = 20
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+_settings = {
+    "deadline": DEADLINE_SECONDS,
+    "max_retries": MAX_RETRIES,
+    "hedge": os.getenv("LOGIC_FOUNDRY_HEDGE", "0") == "1",
+    "hedge_model": HEDGE_MODEL,
+}
+_hedge_pool = None
+_lock = threading.Lock()
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+def configure(deadline=None, max_retries=None, hedge=None, hedge_model=None):
+    """
+    Overrides the process-wide defaults for every later call.
+    Per-session choices (e.g. the app's sidebar) belong in policy() instead.
+    """
+    with _lock:
+        if deadline is not None:
+            _settings["deadline"] = deadline
+        if max_retries is not None:
+            _settings["max_retries"] = max_retries
+        if hedge is not None:
+            _settings["hedge"] = hedge
+        if hedge_model is not None:
+            _settings["hedge_model"] = hedge_model
+
+
+def settings():
+    return dict(_settings)
+
+
+def policy(deadline=None, max_retries=None, hedge=None, hedge_model=None):
+    """
+    Returns the process defaults with the given overrides applied, for one call.
+    """
+    merged = dict(_settings)
+    overrides = {"deadline": deadline, "max_retries": max_retries, "hedge": hedge, "hedge_model": hedge_model}
+    merged.update({name: value for name, value in overrides.items() if value is not None})
+    return merged
+
+
+def is_retryable(exc):
+    """
+    True for timeouts, dropped connections, 429s and 5xx responses.
+    """
+    if isinstance(exc, DeadlineExceeded):
+        return False
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # SDK/httpx timeout and connection errors carry no status code
+    name = type(exc).__name__
+    return "Timeout" in name or "Connection" in name
+
+
+def backoff_delay(attempt, exc=None):
+    """
+    Exponential backoff with full jitter. A Retry-After header on the error wins
+    when it asks for a longer wait.
+    """
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        retry_after = float(headers.get("retry-after", 0))
+    except (TypeError, ValueError):
+        retry_after = 0.0
+    return max(delay, min(retry_after, BACKOFF_MAX))
+
+
+def with_retries(call, deadline, max_retries=None, on_retry=None):
+    """
+    Runs call(timeout) until it succeeds, retrying retryable errors with backoff.
+    timeout is the time left before `deadline` (a time.monotonic() value).
+    on_retry(attempt, exc) is called before each retry.
+    """
+    if max_retries is None:
+        max_retries = _settings["max_retries"]
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded("Request deadline exceeded")
+        try:
+            return call(remaining)
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            delay = backoff_delay(attempt, e)
+            if time.monotonic() + delay >= deadline:
+                raise
+            if on_retry is not None:
+                on_retry(attempt, e)
+            time.sleep(delay)
+            attempt += 1
+
+
+def hedged(primary, fallback, delay):
+    """
+    Runs primary(); if it has not finished after `delay` seconds, also runs fallback()
+    and returns whichever succeeds first, as (value, "primary" | "fallback").
+    If one of them fails, the other one's result is used. The loser is not cancelled
+    (blocking HTTP calls cannot be interrupted); its result is discarded.
+    """
+    pool = _get_hedge_pool()
+    first = pool.submit(primary)
+    done, _ = wait([first], timeout=delay)
+    if done:
+        return first.result(), "primary"
+
+    second = pool.submit(fallback)
+    futures = {first: "primary", second: "fallback"}
+    pending = set(futures)
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                return future.result(), futures[future]
+            except Exception as e:
+                error = error or e
+    raise error
+
+
+def _get_hedge_pool():
+    global _hedge_pool
+    if _hedge_pool is None:
+        with _lock:
+            if _hedge_pool is None:
+                _hedge_pool = ThreadPoolExecutor(max_workers=64, thread_name_prefix="hedge")
+    return _hedge_pool
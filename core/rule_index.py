@@ -0,0 +1,570 @@
+import argparse
+import hashlib
+import json
+import operator
+import os
+import re
+import sqlite3
+import struct
+import sys
+import threading
+import time
+from core import conditions
+from core import metrics
+from core import store
+from core.zones import classify_rules
+
+# Cross-module rule catalog.
+# Rules from every extracted module go into one SQLite index with three access paths:
+#
+#   rules_fts    FTS5 over trigger / action / reason ("vip discount"), plus the zone as a filter
+#   thresholds   numeric comparisons parsed from each trigger (core.conditions), indexed by
+#                (variable, value) for range queries ("total >= 50")
+#   lsh          MinHash band buckets over word shingles; a rule whose estimated Jaccard
+#                similarity to a cluster's first rule reaches DUPLICATE_SIMILARITY joins that
+#                cluster as it is indexed, so listing duplicates is a lookup, not a scan
+#
+#   python -m core.rule_index add results.jsonl logic_analysis.json ...
+#   python -m core.rule_index from-store
+#   python -m core.rule_index search "vip discount total >= 50"
+#   python -m core.rule_index duplicates
+INDEX_PATH = os.getenv("LOGIC_FOUNDRY_RULE_INDEX", os.path.join(os.path.dirname(store.STORE_PATH), "rules.db"))
+
+# 16 bands of 4 rows: pairs at 0.8 similarity share a bucket with probability ~0.9998,
+# pairs at 0.5 with ~0.64, and every candidate is verified against the full signature
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+DUPLICATE_SIMILARITY = 0.8
+# Generic rules ("ELSE -> return None") fill huge buckets; only this many members are read per bucket
+MAX_BUCKET_CANDIDATES = 32
+# A pair at DUPLICATE_SIMILARITY shares ~6.5 of the 16 bands; requiring 2 misses ~0.3% of them
+MIN_SHARED_BANDS = 2
+# Signatures compared per new rule
+MAX_VERIFY = 64
+SEARCH_LIMIT = 50
+# Text matches ranked per query (the newest ones), and the size under which a threshold
+# range is narrow enough to drive a query that also has text (each row then costs an FTS probe)
+RANK_WINDOW = 1000
+SELECTIVE_ROWS = 1000
+# SQLite page cache per connection; the bucket and threshold indexes should stay in memory
+CACHE_KIB = 64 * 1024
+# Question words dropped from free-text queries ("which modules apply the vip discount")
+QUERY_STOP_WORDS = conditions.STOP_WORDS | {"which", "what", "where", "who", "modules", "module", "rules", "rule", "of", "to", "at", "in", "for", "with", "on", "by", "do", "does"}
+
+_WORD_RE = re.compile(r"[a-z]+|\d+(?:\.\d+)?")
+_CAMEL_RE = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+_SIGNATURE = struct.Struct(f"<{NUM_PERM}Q")
+# Rules sharing at least MIN_SHARED_BANDS of a new rule's buckets, most shared first.
+# Each bucket is capped separately so one crowded bucket cannot dominate.
+_CANDIDATES_SQL = (
+    "SELECT r.rowid, r.module_id, r.cluster, r.signature, k.signature FROM ("
+    "SELECT rule_rowid, COUNT(*) AS shared FROM ("
+    + " UNION ALL ".join(["SELECT rule_rowid FROM (SELECT rule_rowid FROM lsh WHERE band = ? AND bucket = ? LIMIT ?)"] * BANDS)
+    + ") GROUP BY rule_rowid HAVING shared >= ? ORDER BY shared DESC LIMIT ?"
+    ") c JOIN rules r ON r.rowid = c.rule_rowid LEFT JOIN clusters k ON k.cluster_id = r.cluster ORDER BY c.shared DESC"
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS modules (
+    module_id INTEGER PRIMARY KEY,
+    module_key TEXT NOT NULL UNIQUE,
+    module_name TEXT,
+    source TEXT,
+    rule_count INTEGER,
+    indexed REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rules (
+    rowid INTEGER PRIMARY KEY,
+    module_id INTEGER NOT NULL,
+    rule_id TEXT,
+    trigger TEXT,
+    action TEXT,
+    reason TEXT,
+    zone TEXT,
+    signature BLOB,
+    cluster INTEGER
+);
+CREATE INDEX IF NOT EXISTS rules_module ON rules (module_id);
+CREATE INDEX IF NOT EXISTS rules_cluster ON rules (cluster, module_id) WHERE cluster IS NOT NULL;
+CREATE VIRTUAL TABLE IF NOT EXISTS rules_fts USING fts5 (
+    trigger, action, reason, zone, content='rules', content_rowid='rowid', tokenize='porter unicode61'
+);
+CREATE TABLE IF NOT EXISTS thresholds (
+    rule_rowid INTEGER NOT NULL,
+    variable TEXT NOT NULL,
+    op TEXT NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS thresholds_range ON thresholds (variable, value);
+CREATE INDEX IF NOT EXISTS thresholds_rule ON thresholds (rule_rowid);
+CREATE TABLE IF NOT EXISTS lsh (
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    rule_rowid INTEGER NOT NULL,
+    PRIMARY KEY (band, bucket, rule_rowid)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS clusters (
+    cluster_id INTEGER PRIMARY KEY,
+    size INTEGER NOT NULL,
+    modules INTEGER NOT NULL,
+    signature BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS clusters_size ON clusters (size);
+"""
+
+
+# --- 1. MINHASH ---
+
+def shingles(rule):
+    """
+    Word bigrams of a rule's trigger and action, with identifiers split into words
+    ("orderTotal" -> "order total") and case folded.
+    """
+    text = f"{rule.get('trigger', '')} {rule.get('action', '')}"
+    words = _WORD_RE.findall(_CAMEL_RE.sub(" ", text).lower())
+    if len(words) < 2:
+        return set(words)
+    return {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def minhash(features):
+    """
+    Returns the NUM_PERM-value MinHash signature of a set of strings, or None when it is empty.
+    """
+    if not features:
+        return None
+    # One SHAKE-128 digest per feature supplies NUM_PERM independent 64-bit hashes, so the
+    # per-position minimum runs in C instead of NUM_PERM Python-level permutations
+    rows = [_SIGNATURE.unpack(hashlib.shake_128(f.encode("utf-8")).digest(_SIGNATURE.size)) for f in features]
+    return list(map(min, zip(*rows)))
+
+
+def similarity(sig_a, sig_b):
+    """
+    Estimated Jaccard similarity of two signatures.
+    """
+    return sum(map(operator.eq, sig_a, sig_b)) / NUM_PERM
+
+
+def _band_keys(signature):
+    keys = []
+    for band in range(BANDS):
+        chunk = struct.pack(f"<{ROWS}Q", *signature[band * ROWS:(band + 1) * ROWS])
+        keys.append((band, int.from_bytes(hashlib.blake2b(chunk, digest_size=8).digest(), "little", signed=True)))
+    return keys
+
+
+def _fts_query(text, joiner=" "):
+    # Quoting keeps FTS5 operators in user input literal; a plain space means every word must appear
+    words = [word for word in re.findall(r"\w+", text) if word.lower() not in QUERY_STOP_WORDS]
+    return joiner.join(f'"{word}"' for word in words)
+
+
+def parse_query(query):
+    """
+    Splits a search string into free text and numeric conditions:
+    "vip discount total >= 50" -> ("vip discount", [total >= 50]).
+    """
+    found = conditions.parse_conditions(query)
+    text = conditions.VAR_FIRST_RE.sub(" ", query)
+    text = conditions.NUMBER_FIRST_RE.sub(" ", text)
+    return " ".join(text.split()), found
+
+
+class RuleIndex:
+    """
+    SQLite FTS5 catalog of rules across modules, with threshold and duplicate lookups.
+    Connections are per thread, as in core.store.
+    """
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{CACHE_KIB}")
+        with self._init_lock:
+            if not self._initialized:
+                conn.executescript(SCHEMA)
+                self._initialized = True
+        self._local.conn = conn
+        return conn
+
+    # --- 2. INDEXING ---
+
+    def index_module(self, logic_data, module_key, source=None):
+        """
+        Adds (or replaces) one module's rules. logic_data is extract_logic output;
+        module_key identifies the module across re-indexing (a path or logic hash).
+        Returns the number of rules indexed.
+        """
+        rules = [rule for rule in logic_data.get("rules", []) if isinstance(rule, dict)]
+        with metrics.timer("logic_foundry_index_seconds", op="index"):
+            conn = self._connect()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                self._remove(conn, module_key)
+                module_id = conn.execute(
+                    "INSERT INTO modules (module_key, module_name, source, rule_count, indexed) VALUES (?, ?, ?, ?, ?)",
+                    (module_key, logic_data.get("module_name", "Unknown"), source, len(rules), time.time())
+                ).lastrowid
+                for rule, zone in zip(rules, classify_rules(rules)):
+                    self._add_rule(conn, module_id, rule, zone)
+        return len(rules)
+
+    def _add_rule(self, conn, module_id, rule, zone):
+        trigger = str(rule.get("trigger", ""))
+        action = str(rule.get("action", ""))
+        reason = str(rule.get("reason", ""))
+        signature = minhash(shingles(rule))
+        rowid = conn.execute(
+            "INSERT INTO rules (module_id, rule_id, trigger, action, reason, zone, signature) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (module_id, str(rule.get("id", "")), trigger, action, reason, zone,
+             _SIGNATURE.pack(*signature) if signature else None)
+        ).lastrowid
+        conn.execute("INSERT INTO rules_fts (rowid, trigger, action, reason, zone) VALUES (?, ?, ?, ?, ?)", (rowid, trigger, action, reason, zone))
+        conn.executemany(
+            "INSERT INTO thresholds (rule_rowid, variable, op, value) VALUES (?, ?, ?, ?)",
+            [(rowid, c["variable"], c["op"], c["value"]) for c in conditions.parse_conditions(trigger)]
+        )
+        if signature is None:
+            return
+        keys = _band_keys(signature)
+        self._link_duplicates(conn, rowid, module_id, signature, keys)
+        conn.executemany("INSERT INTO lsh (band, bucket, rule_rowid) VALUES (?, ?, ?)", [(band, bucket, rowid) for band, bucket in keys])
+
+    def _link_duplicates(self, conn, rowid, module_id, signature, keys):
+        # Leader clustering: a cluster keeps the signature of the rule that started it, and a
+        # new rule joins the cluster whose leader it matches best. Comparing with the leader
+        # rather than with any member stops clusters drifting through chains of pairwise matches.
+        params = []
+        for band, bucket in keys:
+            params.extend((band, bucket, MAX_BUCKET_CANDIDATES))
+        params.extend((MIN_SHARED_BANDS, MAX_VERIFY))
+
+        own = _SIGNATURE.pack(*signature)
+        best = None
+        seen = set()
+        for other, other_module, cluster, blob, leader in conn.execute(_CANDIDATES_SQL, params).fetchall():
+            if cluster is not None:
+                if cluster in seen:
+                    continue
+                seen.add(cluster)
+                blob = leader
+            score = 1.0 if blob == own else similarity(signature, _SIGNATURE.unpack(blob))
+            if score >= DUPLICATE_SIMILARITY and (best is None or score > best[0]):
+                best = (score, cluster, other, other_module, blob)
+                if score == 1.0:
+                    break
+        if best is None:
+            return
+
+        _, cluster, other, other_module, blob = best
+        if cluster is None:
+            # The older rule leads the new cluster
+            cluster = other
+            conn.execute("INSERT INTO clusters (cluster_id, size, modules, signature) VALUES (?, 1, 1, ?)", (cluster, blob))
+            conn.execute("UPDATE rules SET cluster = ? WHERE rowid = ?", (cluster, other))
+            new_module = other_module != module_id
+        else:
+            new_module = conn.execute(
+                "SELECT 1 FROM rules WHERE cluster = ? AND module_id = ? LIMIT 1", (cluster, module_id)
+            ).fetchone() is None
+        conn.execute("UPDATE clusters SET size = size + 1, modules = modules + ? WHERE cluster_id = ?", (int(new_module), cluster))
+        conn.execute("UPDATE rules SET cluster = ? WHERE rowid = ?", (cluster, rowid))
+
+    def remove_module(self, module_key):
+        """
+        Drops one module and its rules from the index.
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._remove(conn, module_key)
+
+    def _remove(self, conn, module_key):
+        row = conn.execute("SELECT module_id FROM modules WHERE module_key = ?", (module_key,)).fetchone()
+        if row is None:
+            return
+        module_id = row[0]
+        rows = conn.execute("SELECT rowid, trigger, action, reason, zone, signature, cluster FROM rules WHERE module_id = ?", (module_id,)).fetchall()
+        for rowid, trigger, action, reason, zone, blob, cluster in rows:
+            # External-content FTS tables need the old values to delete their postings
+            conn.execute(
+                "INSERT INTO rules_fts (rules_fts, rowid, trigger, action, reason, zone) VALUES ('delete', ?, ?, ?, ?, ?)",
+                (rowid, trigger, action, reason, zone)
+            )
+            conn.execute("DELETE FROM thresholds WHERE rule_rowid = ?", (rowid,))
+            if blob is not None:
+                # Bucket entries are keyed by (band, bucket), recomputed from the stored signature
+                conn.executemany(
+                    "DELETE FROM lsh WHERE band = ? AND bucket = ? AND rule_rowid = ?",
+                    [(band, bucket, rowid) for band, bucket in _band_keys(_SIGNATURE.unpack(blob))]
+                )
+            conn.execute("DELETE FROM rules WHERE rowid = ?", (rowid,))
+            if cluster is not None:
+                # The cluster keeps its leader's signature even if the leader itself is removed
+                last_in_module = conn.execute(
+                    "SELECT 1 FROM rules WHERE cluster = ? AND module_id = ? LIMIT 1", (cluster, module_id)
+                ).fetchone() is None
+                conn.execute("UPDATE clusters SET size = size - 1, modules = modules - ? WHERE cluster_id = ?", (int(last_in_module), cluster))
+                if conn.execute("SELECT size FROM clusters WHERE cluster_id = ?", (cluster,)).fetchone()[0] < 2:
+                    conn.execute("DELETE FROM clusters WHERE cluster_id = ?", (cluster,))
+                    conn.execute("UPDATE rules SET cluster = NULL WHERE cluster = ?", (cluster,))
+        conn.execute("DELETE FROM modules WHERE module_id = ?", (module_id,))
+
+    # --- 3. QUERIES ---
+
+    def search(self, query="", zone=None, op=None, limit=SEARCH_LIMIT):
+        """
+        Finds rules matching query, which mixes free text and numeric conditions:
+        "vip discount total >= 50" returns rules mentioning "vip" and "discount" with a
+        threshold on `total` whose value is >= 50. Conditions are range filters on the
+        thresholds parsed from each trigger; op additionally restricts the operator the
+        rule itself uses (e.g. ">=").
+        Text matches are ranked by relevance within the RANK_WINDOW most recently indexed
+        ones (a few times `limit` when conditions also apply); threshold-driven results are
+        ordered by threshold value.
+        """
+        with metrics.timer("logic_foundry_index_seconds", op="search"):
+            text, wanted = parse_query(query)
+            conn = self._connect()
+            filters = [self._threshold_filter(conn, condition, op) for condition in wanted]
+            if op is not None and not wanted:
+                filters.append({"where": "t.op = ?", "params": [op], "rows": None})
+
+            terms = _fts_query(text)
+            if not terms and not filters and not zone:
+                return []
+            rows = self._select(conn, terms, filters, zone, limit)
+            if not rows and " " in terms:
+                # No rule has every word: fall back to any word, best matches first
+                rows = self._select(conn, _fts_query(text, " OR "), filters, zone, limit)
+            return rows
+
+    def _threshold_filter(self, conn, condition, op):
+        # Query "total >= 50": thresholds on `total` whose value satisfies >= 50. A name that
+        # is not an indexed variable ("discount at >= 50") constrains the value only.
+        value_ops = {">": "t.value > ?", ">=": "t.value >= ?", "<": "t.value < ?", "<=": "t.value <= ?", "==": "t.value = ?", "!=": "t.value != ?"}
+        parts = [value_ops[condition["op"]]]
+        params = [condition["value"]]
+        known = conn.execute("SELECT 1 FROM thresholds WHERE variable = ? LIMIT 1", (condition["variable"],)).fetchone()
+        if known:
+            parts.insert(0, "t.variable = ?")
+            params.insert(0, condition["variable"])
+        if op is not None:
+            parts.append("t.op = ?")
+            params.append(op)
+        where = " AND ".join(parts)
+        rows = None
+        if known:
+            # Bounded count on the (variable, value) index: enough to tell a narrow range from a wide one
+            rows = conn.execute(
+                f"SELECT COUNT(*) FROM (SELECT 1 FROM thresholds t WHERE {where} LIMIT ?)", params + [SELECTIVE_ROWS]
+            ).fetchone()[0]
+        return {"where": where, "params": params, "rows": rows}
+
+    def _select(self, conn, terms, filters, zone, limit):
+        # Three plans, picked so no query walks the whole index:
+        #   a narrow threshold range (or no text at all) drives from the (variable, value) index;
+        #   otherwise text drives, streaming FTS matches newest first and ranking a bounded window;
+        #   with neither, the newest rules are scanned until `limit` pass the filters.
+        # Words match rule text only; the zone is an FTS column too, so it narrows the match itself
+        words = f"{{trigger action reason}} : ({terms})" if terms else ""
+        zone = zone.replace('"', "").lower() if zone else None
+        fts = " AND ".join(part for part in (words, f'zone : "{zone}"' if zone else "") if part)
+
+        columns = "r.rowid, m.module_name, m.module_key, m.source, r.rule_id, r.trigger, r.action, r.reason, r.zone, r.cluster"
+        indexed = [f for f in filters if f["rows"] is not None]
+        driver = min(indexed, key=lambda f: f["rows"]) if indexed else None
+        if driver is not None and words and driver["rows"] >= SELECTIVE_ROWS:
+            driver = None
+
+        where = []
+        params = []
+        for f in filters:
+            if f is not driver:
+                # Checked per candidate rule, so pin the per-rule index
+                where.append(f"EXISTS (SELECT 1 FROM thresholds t INDEXED BY thresholds_rule WHERE t.rule_rowid = r.rowid AND {f['where']})")
+                params.extend(f["params"])
+
+        if driver is not None:
+            # The zone is a plain column check here; only words need the FTS probe
+            if zone:
+                where.append("r.zone = ?")
+                params.append(zone)
+            if words:
+                where.append("EXISTS (SELECT 1 FROM rules_fts WHERE rules_fts MATCH ? AND rowid = r.rowid)")
+                params.append(words)
+            sql = (
+                f"SELECT {columns} FROM thresholds t JOIN rules r ON r.rowid = t.rule_rowid "
+                f"JOIN modules m ON m.module_id = r.module_id WHERE {driver['where']}"
+                + "".join(f" AND {clause}" for clause in where)
+                + " ORDER BY t.value LIMIT ?"
+            )
+            # A rule with two matching thresholds appears twice; over-fetch, then dedupe
+            params = driver["params"] + params + [limit * 2]
+        elif fts:
+            inner = (
+                "SELECT f.rowid AS rowid, f.rank AS score FROM rules_fts f JOIN rules r ON r.rowid = f.rowid "
+                "WHERE rules_fts MATCH ?" + "".join(f" AND {clause}" for clause in where)
+                + " ORDER BY f.rowid DESC LIMIT ?"
+            )
+            sql = (
+                f"SELECT {columns} FROM ({inner}) c JOIN rules r ON r.rowid = c.rowid "
+                "JOIN modules m ON m.module_id = r.module_id ORDER BY c.score LIMIT ?"
+            )
+            # Filtered matches are found further down the stream; rank fewer of them
+            window = limit * 4 if where else RANK_WINDOW
+            params = [fts] + params + [window, limit]
+        else:
+            sql = (
+                f"SELECT {columns} FROM rules r JOIN modules m ON m.module_id = r.module_id WHERE 1"
+                + "".join(f" AND {clause}" for clause in where)
+                + " ORDER BY r.rowid DESC LIMIT ?"
+            )
+            params = params + [limit]
+
+        keys = ("module_name", "module_key", "source", "rule_id", "trigger", "action", "reason", "zone", "cluster")
+        rows = []
+        seen = set()
+        for row in conn.execute(sql, params):
+            if row[0] in seen:
+                continue
+            seen.add(row[0])
+            rows.append(dict(zip(keys, row[1:])))
+        return rows[:limit]
+
+    def duplicates(self, limit=20, min_size=2, members=10):
+        """
+        Returns the largest near-duplicate clusters, each as
+        {"cluster", "size", "modules", "rules": [up to `members` rows]}.
+        """
+        with metrics.timer("logic_foundry_index_seconds", op="duplicates"):
+            conn = self._connect()
+            found = []
+            for cluster, size, module_count in conn.execute(
+                "SELECT cluster_id, size, modules FROM clusters WHERE size >= ? ORDER BY size DESC LIMIT ?", (min_size, limit)
+            ).fetchall():
+                rows = conn.execute(
+                    "SELECT m.module_name, m.module_key, r.rule_id, r.trigger, r.action FROM rules r "
+                    "JOIN modules m ON m.module_id = r.module_id WHERE r.cluster = ? LIMIT ?", (cluster, members)
+                ).fetchall()
+                found.append({
+                    "cluster": cluster,
+                    "size": size,
+                    "modules": module_count,
+                    "rules": [dict(zip(("module_name", "module_key", "rule_id", "trigger", "action"), row)) for row in rows]
+                })
+            return found
+
+    def stats(self):
+        """
+        Returns module, rule, threshold and duplicate-cluster counts.
+        """
+        conn = self._connect()
+        count = lambda sql: conn.execute(sql).fetchone()[0]
+        return {
+            "modules": count("SELECT COUNT(*) FROM modules"),
+            "rules": count("SELECT COUNT(*) FROM rules"),
+            "thresholds": count("SELECT COUNT(*) FROM thresholds"),
+            "duplicate_clusters": count("SELECT COUNT(*) FROM clusters"),
+            "duplicated_rules": count("SELECT COALESCE(SUM(size), 0) FROM clusters"),
+        }
+
+
+_default_index = None
+_default_lock = threading.Lock()
+
+
+def get_index():
+    """
+    Returns the process-wide rule index.
+    """
+    global _default_index
+    if _default_index is None:
+        with _default_lock:
+            if _default_index is None:
+                _default_index = RuleIndex()
+    return _default_index
+
+
+# --- 4. CLI ---
+
+def _load_inputs(path):
+    """
+    Yields (module_key, logic_data) from a logic_analysis.json file or a core.batch JSONL output.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record.get("status") == "ok" and isinstance(record.get("logic"), dict):
+                    yield record.get("path") or record.get("sha256"), record["logic"]
+        else:
+            yield os.path.abspath(path), json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and query the cross-module rule index.")
+    parser.add_argument("--db", default=INDEX_PATH, help="Path to the index database")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add_cmd = commands.add_parser("add", help="Index logic_analysis.json files or core.batch .jsonl outputs")
+    add_cmd.add_argument("paths", nargs="+")
+    store_cmd = commands.add_parser("from-store", help="Index every extraction in the artifact store")
+    store_cmd.add_argument("--store", default=store.STORE_PATH)
+    search_cmd = commands.add_parser("search", help='Search rules, e.g. "vip discount total >= 50"')
+    search_cmd.add_argument("query")
+    search_cmd.add_argument("--zone")
+    search_cmd.add_argument("--op", choices=[">", ">=", "<", "<=", "==", "!="])
+    search_cmd.add_argument("--limit", type=int, default=SEARCH_LIMIT)
+    dup_cmd = commands.add_parser("duplicates", help="List the largest near-duplicate clusters")
+    dup_cmd.add_argument("--limit", type=int, default=20)
+    dup_cmd.add_argument("--min-size", type=int, default=2)
+    commands.add_parser("stats", help="Show index counts")
+    args = parser.parse_args(argv)
+
+    index = RuleIndex(args.db)
+    if args.command == "add":
+        total = 0
+        for path in args.paths:
+            for module_key, logic_data in _load_inputs(path):
+                total += index.index_module(logic_data, module_key, source=path)
+        print(f"Indexed {total} rules", file=sys.stderr)
+    elif args.command == "from-store":
+        artifacts = store.ArtifactStore(args.store)
+        total = 0
+        for record in artifacts.export_records():
+            total += index.index_module(record["logic_data"], record["logic_hash"], source=record["module_name"])
+        print(f"Indexed {total} rules", file=sys.stderr)
+    elif args.command == "search":
+        started = time.perf_counter()
+        rows = index.search(args.query, zone=args.zone, op=args.op, limit=args.limit)
+        for row in rows:
+            print(f"{row['module_name']}:{row['rule_id']}  {row['trigger']}  ->  {row['action']}")
+        print(f"{len(rows)} rules in {(time.perf_counter() - started) * 1000:.1f} ms", file=sys.stderr)
+    elif args.command == "duplicates":
+        for group in index.duplicates(limit=args.limit, min_size=args.min_size):
+            print(f"cluster {group['cluster']}: {group['size']} rules in {group['modules']} modules")
+            for row in group["rules"]:
+                print(f"    {row['module_name']}:{row['rule_id']}  {row['trigger']}  ->  {row['action']}")
+    else:
+        print(json.dumps(index.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,607 @@
+import argparse
+import collections
+import hmac
+import ipaddress
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from core import extractor
+from core import generator
+from core import llm_client
+from core import metrics
+from core import validator
+from core import visualizer_mermaid
+
+# Headless job service: one warm process runs the pipeline stages for many callers, so
+# they share its connection pool and result cache.
+#
+#   python -m core.service --port 8600 --workers 4 --queue-size 64
+#
+#   POST   /jobs        {"kind": "extract", "code": "...", "model": "..."}  -> 202 {"id": ..., "status": "queued"}
+#   GET    /jobs/<id>   status and progress; "result" once done. ?since=N adds partial results N onwards
+#   DELETE /jobs/<id>   cancel
+#   GET    /jobs        recent jobs, without results
+#   GET    /health      queue depth and worker count
+#   GET    /metrics     Prometheus text
+#
+# Job kinds and their parameters (model and use_cache are optional everywhere):
+#   extract    code, mode ("chunked" | "stream" | "incremental"), state   -> {"logic", "state"}
+#   generate   logic, languages (or target_language)                      -> {"codes": {language: code}}
+#   validate   logic, code, target_language, local_execution              -> {"report"}
+#   mermaid    logic, view, page, page_size, expand                       -> {"mermaid"}
+#
+# A full queue answers 503. Cancelling a queued job removes it; a running job stops at its
+# next checkpoint (each streamed rule or generated language), and a stage that cannot be
+# interrupted finishes in the background with its result discarded.
+# app.py runs its stages here when LOGIC_FOUNDRY_SERVICE_URL is set.
+#
+# Binding anything but a loopback address requires LOGIC_FOUNDRY_SERVICE_TOKEN. Validate
+# jobs never execute the submitted code unless the service was started with
+# --allow-local-execution and the job asks for it (local_execution=true); that runs the
+# code unsandboxed as the service's user (see core.equivalence).
+
+SERVICE_URL = os.getenv("LOGIC_FOUNDRY_SERVICE_URL")
+# Shared secret, sent as "Authorization: Bearer <token>"; required off loopback
+SERVICE_TOKEN = os.getenv("LOGIC_FOUNDRY_SERVICE_TOKEN")
+DEFAULT_PORT = 8600
+WORKERS = int(os.getenv("LOGIC_FOUNDRY_SERVICE_WORKERS", 4))
+QUEUE_SIZE = int(os.getenv("LOGIC_FOUNDRY_SERVICE_QUEUE", 64))
+# Finished jobs stay available for polling this long
+JOB_TTL = 3600
+MAX_BODY_BYTES = 16 * 1024 * 1024
+DEFAULT_MODEL = "anthropic/claude-3.5-sonnet"
+KINDS = ("extract", "generate", "validate", "mermaid")
+EXTRACT_MODES = ("chunked", "stream", "incremental")
+FINISHED = ("done", "error", "cancelled")
+# Client polling starts fast and backs off to POLL_INTERVAL
+POLL_START = 0.05
+POLL_INTERVAL = 0.5
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class ServiceError(RuntimeError):
+    pass
+
+
+class Job:
+    """
+    One queued stage run: status moves queued -> running -> done | error | cancelled.
+    """
+
+    def __init__(self, kind, params):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.status = "queued"
+        self.message = "Queued"
+        self.partial = []
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.cancel_requested = threading.Event()
+        # Set by JobQueue.submit: the job asked for local execution and the service allows it
+        self.local_execution = False
+        self._lock = threading.Lock()
+
+    def add_partial(self, item, message):
+        with self._lock:
+            self.partial.append(item)
+            self.message = message
+
+    def checkpoint(self):
+        if self.cancel_requested.is_set():
+            raise JobCancelled()
+
+    def to_dict(self, since=None, with_result=True):
+        with self._lock:
+            job = {
+                "id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "message": self.message,
+                "partial_count": len(self.partial),
+                "created": self.created,
+                "started": self.started,
+                "finished": self.finished,
+            }
+            if since is not None:
+                job["partial"] = self.partial[since:]
+            if self.error is not None:
+                job["error"] = self.error
+            if with_result and self.status == "done":
+                job["result"] = self.result
+        return job
+
+
+def _check_params(kind, params):
+    # Returns an error message, or None when the job can be queued
+    if kind not in KINDS:
+        return f"Unknown job kind {kind!r}; expected one of {', '.join(KINDS)}"
+    required = {"extract": ["code"], "generate": ["logic"], "validate": ["logic", "code"], "mermaid": ["logic"]}[kind]
+    missing = [name for name in required if params.get(name) in (None, "")]
+    if missing:
+        return f"Missing parameter(s) for {kind}: {', '.join(missing)}"
+    if kind == "extract" and params.get("mode", "chunked") not in EXTRACT_MODES:
+        return f"Unknown extraction mode {params['mode']!r}; expected one of {', '.join(EXTRACT_MODES)}"
+    if kind == "mermaid" and params.get("view", "auto") not in visualizer_mermaid.VIEWS:
+        return f"Unknown view {params['view']!r}; expected one of {', '.join(visualizer_mermaid.VIEWS)}"
+    if kind == "generate" and not (params.get("languages") or params.get("target_language")):
+        return "Missing parameter(s) for generate: languages or target_language"
+    return None
+
+
+# --- 1. STAGE RUNNERS ---
+
+def _run_extract(job):
+    params = job.params
+    code_text = params["code"]
+    model_name = params.get("model") or DEFAULT_MODEL
+    use_cache = params.get("use_cache", True)
+    mode = params.get("mode", "chunked")
+
+    if mode == "incremental":
+        logic, state = extractor.extract_logic_incremental(code_text, model_name, params.get("state"), use_cache=use_cache)
+        return {"logic": logic, "state": state}
+    if mode == "stream" and len(code_text.splitlines()) <= extractor.CHUNK_LINES:
+        # Rules are published as partial results while the model is still writing
+        stream = extractor.extract_logic_stream(code_text, model_name, use_cache=use_cache)
+        try:
+            while True:
+                job.checkpoint()
+                try:
+                    rule = next(stream)
+                except StopIteration as done:
+                    return {"logic": done.value, "state": None}
+                job.add_partial(rule, f"Received {len(job.partial) + 1} rules")
+        finally:
+            stream.close()
+    return {"logic": extractor.extract_logic_chunked(code_text, model_name, use_cache=use_cache), "state": None}
+
+
+def _run_generate(job):
+    params = job.params
+    languages = params.get("languages") or [params["target_language"]]
+    codes = {}
+    for language, code in generator.generate_all(params["logic"], languages, {}, params.get("model") or DEFAULT_MODEL, use_cache=params.get("use_cache", True)):
+        codes[language] = code
+        job.add_partial([language, code], f"Generated {len(codes)} of {len(languages)} languages")
+        job.checkpoint()
+    return {"codes": codes}
+
+
+def _run_validate(job):
+    params = job.params
+    report = validator.validate_equivalence(
+        params["logic"], params["code"], params.get("model") or DEFAULT_MODEL,
+        use_cache=params.get("use_cache", True), target_language=params.get("target_language"),
+        local_execution=job.local_execution
+    )
+    return {"report": report}
+
+
+def _run_mermaid(job):
+    with metrics.timer("logic_foundry_render_seconds", renderer="mermaid"):
+        params = job.params
+        return {"mermaid": visualizer_mermaid.generate_mermaid(
+            params["logic"], params.get("view", "auto"), params.get("page", 1),
+            params.get("page_size", visualizer_mermaid.PAGE_SIZE), params.get("expand", ())
+        )}
+
+
+RUNNERS = {"extract": _run_extract, "generate": _run_generate, "validate": _run_validate, "mermaid": _run_mermaid}
+
+
+# --- 2. JOB QUEUE ---
+
+class JobQueue:
+    """
+    Bounded FIFO of jobs drained by a fixed pool of worker threads.
+    A job cancelled while queued leaves the FIFO at once, freeing its slot.
+    """
+
+    def __init__(self, workers=WORKERS, queue_size=QUEUE_SIZE, local_execution=False):
+        self.workers = max(1, workers)
+        # Whether validate jobs may run submitted Python on this host (off unless the operator enables it)
+        self.local_execution = local_execution
+        self.queue_size = max(1, queue_size)
+        self._pending = collections.deque()
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._closed = False
+        self._running = 0
+        self._threads = [threading.Thread(target=self._work, name=f"logic-foundry-worker-{i}", daemon=True) for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, kind, params):
+        """
+        Queues a job and returns it, or returns None when the queue is full.
+        Raises ValueError for an unknown kind or missing parameters, or when the job asks
+        for local execution and the service does not allow it.
+        """
+        problem = _check_params(kind, params)
+        if problem:
+            raise ValueError(problem)
+        wants_execution = kind == "validate" and bool(params.get("local_execution"))
+        if wants_execution and not self.local_execution:
+            raise ValueError("Local execution is disabled on this service (start it with --allow-local-execution)")
+        self._prune()
+        job = Job(kind, params)
+        job.local_execution = wants_execution
+        with self._lock:
+            accepted = len(self._pending) < self.queue_size
+            if accepted:
+                self._jobs[job.id] = job
+                self._pending.append(job)
+                self._ready.notify()
+        if not accepted:
+            metrics.increment("logic_foundry_service_jobs_total", kind=kind, status="rejected")
+            return None
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """
+        Requests cancellation; returns the job, or None when it does not exist.
+        """
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.cancel_requested.set()
+        with self._lock:
+            if job in self._pending:
+                self._pending.remove(job)
+        with job._lock:
+            dequeued = job.status == "queued"
+            if dequeued:
+                # A worker that took it off the FIFO just before the removal skips it
+                job.status = "cancelled"
+                job.message = "Cancelled before it started"
+                job.finished = time.time()
+            elif job.status == "running":
+                job.message = "Cancelling"
+        if dequeued:
+            metrics.increment("logic_foundry_service_jobs_total", kind=job.kind, status="cancelled")
+        return job
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def stats(self):
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+            running = self._running
+            queued = len(self._pending)
+        return {
+            "workers": self.workers,
+            "queued": queued,
+            "queue_size": self.queue_size,
+            "running": running,
+            "jobs": len(statuses),
+            "cancelled": statuses.count("cancelled"),
+        }
+
+    def to_prometheus(self):
+        # Point-in-time gauges appended to the core.metrics exposition
+        stats = self.stats()
+        lines = []
+        for name, key, text in (
+            ("logic_foundry_service_queue_depth", "queued", "Jobs waiting for a worker."),
+            ("logic_foundry_service_running_jobs", "running", "Jobs being run by a worker."),
+            ("logic_foundry_service_workers", "workers", "Size of the worker pool."),
+        ):
+            lines += [f"# HELP {name} {text}", f"# TYPE {name} gauge", f"{name} {stats[key]}"]
+        return "\n".join(lines) + "\n"
+
+    def shutdown(self):
+        # Workers finish the jobs already queued, then exit
+        with self._lock:
+            self._closed = True
+            self._ready.notify_all()
+
+    def _prune(self):
+        cutoff = time.time() - JOB_TTL
+        with self._lock:
+            for job_id in [j.id for j in self._jobs.values() if j.finished is not None and j.finished < cutoff]:
+                del self._jobs[job_id]
+
+    def _work(self):
+        while True:
+            with self._lock:
+                while not self._pending and not self._closed:
+                    self._ready.wait()
+                if not self._pending:
+                    return
+                job = self._pending.popleft()
+            with job._lock:
+                if job.status != "queued":
+                    continue
+                job.status = "running"
+                job.message = "Running"
+                job.started = time.time()
+            metrics.observe("logic_foundry_service_wait_seconds", job.started - job.created, kind=job.kind)
+            with self._lock:
+                self._running += 1
+            try:
+                with metrics.timer("logic_foundry_service_job_seconds", kind=job.kind):
+                    result = RUNNERS[job.kind](job)
+                status, error = "done", None
+            except JobCancelled:
+                status, result, error = "cancelled", None, None
+            except Exception as e:
+                status, result, error = "error", None, f"{type(e).__name__}: {e}"
+            finally:
+                with self._lock:
+                    self._running -= 1
+            if status == "done" and job.cancel_requested.is_set():
+                # Cancelled while in a stage that cannot be interrupted
+                status, result = "cancelled", None
+            with job._lock:
+                job.status = status
+                job.result = result
+                job.error = error
+                job.message = {"done": "Finished", "cancelled": "Cancelled", "error": "Failed"}[status]
+                job.finished = time.time()
+            metrics.increment("logic_foundry_service_jobs_total", kind=job.kind, status=status)
+
+
+# --- 3. HTTP SERVER ---
+
+class Handler(BaseHTTPRequestHandler):
+    jobs = None
+    token = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        url = urlsplit(self.path)
+        path = url.path.rstrip("/")
+        if path == "/health":
+            self._send_json(200, dict(self.jobs.stats(), status="ok"))
+        elif path == "/metrics":
+            self._send_text(200, metrics.to_prometheus() + self.jobs.to_prometheus(), "text/plain; version=0.0.4")
+        elif path == "/jobs":
+            jobs = sorted(self.jobs.jobs(), key=lambda job: job.created, reverse=True)
+            self._send_json(200, {"jobs": [job.to_dict(with_result=False) for job in jobs]})
+        elif path.startswith("/jobs/"):
+            job = self.jobs.get(path[len("/jobs/"):])
+            if job is None:
+                self._send_json(404, {"error": "No such job"})
+                return
+            since = parse_qs(url.query).get("since", [None])[0]
+            try:
+                since = max(0, int(since)) if since is not None else None
+            except ValueError:
+                self._send_json(400, {"error": "since must be an integer"})
+                return
+            self._send_json(200, job.to_dict(since=since))
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        if urlsplit(self.path).path.rstrip("/") != "/jobs":
+            self._send_json(404, {"error": "Not found"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self._send_json(413, {"error": f"Request body larger than {MAX_BODY_BYTES} bytes"})
+            self.close_connection = True
+            return
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            self._send_json(400, {"error": f"Invalid JSON: {e}"})
+            return
+        if not isinstance(body, dict):
+            self._send_json(400, {"error": "Request body must be a JSON object"})
+            return
+        params = dict(body)
+        kind = params.pop("kind", None)
+        try:
+            job = self.jobs.submit(kind, params)
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        if job is None:
+            self._send_json(503, {"error": "Job queue is full; retry later"}, {"Retry-After": "1"})
+            return
+        self._send_json(202, job.to_dict(), {"Location": f"/jobs/{job.id}"})
+
+    def do_DELETE(self):
+        if not self._authorized():
+            return
+        path = urlsplit(self.path).path.rstrip("/")
+        job = self.jobs.cancel(path[len("/jobs/"):]) if path.startswith("/jobs/") else None
+        if job is None:
+            self._send_json(404, {"error": "No such job"})
+            return
+        self._send_json(200, job.to_dict(with_result=False))
+
+    def _authorized(self):
+        if not self.token:
+            return True
+        supplied = self.headers.get("Authorization", "")
+        if hmac.compare_digest(supplied.encode("utf-8"), f"Bearer {self.token}".encode("utf-8")):
+            return True
+        self._send_json(401, {"error": "Missing or invalid token"})
+        return False
+
+    def _send_json(self, status, body, headers=None):
+        self._send_text(status, json.dumps(body), "application/json", headers)
+
+    def _send_text(self, status, text, content_type, headers=None):
+        data = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_server(host="127.0.0.1", port=DEFAULT_PORT, workers=WORKERS, queue_size=QUEUE_SIZE, token=SERVICE_TOKEN, local_execution=False):
+    """
+    Starts the service in a daemon thread.
+    Returns (server, base_url); server.jobs is the JobQueue. Call server.shutdown() to stop it.
+    Raises ValueError for a non-loopback host without a token. local_execution lets validate
+    jobs that ask for it execute the submitted Python on this host.
+    """
+    if not token and not is_loopback(host):
+        raise ValueError(f"Refusing to serve {host or 'all interfaces'} without a token; set LOGIC_FOUNDRY_SERVICE_TOKEN")
+    jobs = JobQueue(workers, queue_size, local_execution)
+    handler = type("ConfiguredHandler", (Handler,), {"jobs": jobs, "token": token})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.jobs = jobs
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+# --- 4. CLIENT ---
+
+class ServiceClient:
+    """
+    Minimal client for the job service (stdlib only, so CI scripts need nothing extra).
+
+        client = ServiceClient("http://127.0.0.1:8600")
+        logic = client.run("extract", code=source, model="openai/gpt-4o")["logic"]
+    """
+
+    def __init__(self, base_url=None, token=None, timeout=30):
+        self.base_url = (base_url or SERVICE_URL or f"http://127.0.0.1:{DEFAULT_PORT}").rstrip("/")
+        self.token = token if token is not None else SERVICE_TOKEN
+        self.timeout = timeout
+
+    def submit(self, kind, **params):
+        """
+        Queues a job and returns its status dict. Raises ServiceError when the queue is
+        full, the parameters are rejected or the service is unreachable.
+        """
+        return self._request("POST", "/jobs", dict(params, kind=kind))
+
+    def status(self, job_id, since=None):
+        return self._request("GET", f"/jobs/{job_id}" + (f"?since={since}" if since is not None else ""))
+
+    def cancel(self, job_id):
+        return self._request("DELETE", f"/jobs/{job_id}")
+
+    def health(self):
+        return self._request("GET", "/health")
+
+    def follow(self, job_id, poll=POLL_INTERVAL):
+        """
+        Polls a job until it ends, yielding its partial results (streamed rules, generated
+        [language, code] pairs) as they arrive. Returns the job result; raises ServiceError
+        when the job fails or is cancelled.
+        """
+        seen = 0
+        delay = POLL_START
+        while True:
+            job = self.status(job_id, since=seen)
+            for item in job.get("partial", []):
+                yield item
+            seen += len(job.get("partial", []))
+            if job["status"] in FINISHED:
+                break
+            time.sleep(delay)
+            delay = min(delay * 1.5, poll)
+        if job["status"] != "done":
+            raise ServiceError(job.get("error") or f"Job {job['status']}")
+        return job["result"]
+
+    def run(self, kind, **params):
+        """
+        Submits a job and waits for its result.
+        """
+        job = self.submit(kind, **params)
+        progress = self.follow(job["id"])
+        while True:
+            try:
+                next(progress)
+            except StopIteration as done:
+                return done.value
+
+    def _request(self, method, path, body=None):
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=method)
+        request.add_header("Accept", "application/json")
+        if data is not None:
+            request.add_header("Content-Type", "application/json")
+        if self.token:
+            request.add_header("Authorization", f"Bearer {self.token}")
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read() or b"{}")
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read() or b"{}").get("error")
+            except ValueError:
+                message = None
+            raise ServiceError(message or f"HTTP {e.code}") from e
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            raise ServiceError(f"Service unavailable at {self.base_url}: {e}") from e
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m core.service", description="Run the Logic Foundry job service.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind; any non-loopback address requires LOGIC_FOUNDRY_SERVICE_TOKEN")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Jobs run in parallel")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE, help="Jobs waiting beyond this are refused with 503")
+    parser.add_argument("--allow-local-execution", action="store_true", help="Let validate jobs run the submitted Python on this host, unsandboxed (only for trusted callers)")
+    options = parser.parse_args(argv)
+    if not SERVICE_TOKEN and not is_loopback(options.host):
+        parser.error(f"--host {options.host} is reachable from other machines; set LOGIC_FOUNDRY_SERVICE_TOKEN first")
+
+    # Chunked extraction fans out within a job, so size the pool for every worker doing so
+    llm_client.configure(pool_size=max(llm_client.POOL_SIZE, options.workers * extractor.MAX_CHUNK_WORKERS))
+    server, url = start_server(options.host, options.port, options.workers, options.queue_size, local_execution=options.allow_local_execution)
+    print(f"Logic Foundry service listening on {url} ({options.workers} workers, queue of {options.queue_size})", file=sys.stderr)
+    if options.allow_local_execution:
+        print("Local execution is enabled: validate jobs may run submitted code on this host", file=sys.stderr)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.jobs.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+import ast
+
+# Deterministic rule extraction for plain Python.
+# Walks if/elif/else ladders and the statements in each branch with `ast` and emits
+# the same {"module_name", "stats", "rules"} schema as the LLM extractor. Every else
+# path is mapped: explicit else blocks become "ELSE" rules, and the code after an
+# if-chain whose branches all return becomes an "OTHERWISE" rule.
+#
+# extract() also reports whether coverage is complete, i.e. every statement in the
+# input was understood and is described by some rule. Setup code before a check, code
+# that runs after a check that does not return, and loops or try blocks all make
+# coverage partial. Only a complete result can stand in for an LLM call; otherwise it is
+# a seed for the prompt.
+
+# Statements that are described verbatim as a branch action
+SIMPLE_STATEMENTS = (ast.Return, ast.Assign, ast.AugAssign, ast.AnnAssign, ast.Raise, ast.Pass, ast.Expr, ast.Delete)
+# Statements that end a branch, so the code after an if-chain is its fallback path
+TERMINAL_STATEMENTS = (ast.Return, ast.Raise)
+# Top-level statements that carry no rules of their own
+DECLARATIONS = (ast.Import, ast.ImportFrom, ast.Assign, ast.AnnAssign, ast.Pass)
+
+MAX_ACTION_LENGTH = 200
+
+
+def extract(code_text):
+    """
+    Returns (result, complete).
+    result follows the extractor schema, or is None when code_text is not Python.
+    complete is True only when every statement was understood and at least one
+    rule was found, so the result can be used without asking the model.
+    """
+    try:
+        tree = ast.parse(code_text)
+    except (SyntaxError, ValueError):
+        return None, False
+
+    walker = _Walker()
+    for node in tree.body:
+        walker.visit_top_level(node)
+
+    rules = walker.rules
+    for n, rule in enumerate(rules, start=1):
+        rule["id"] = f"rule_{n}"
+
+    result = {
+        "module_name": walker.module_name(),
+        "stats": {
+            "complexity_score": max(1, min(10, 1 + walker.decisions // 2)),
+            "rule_count": len(rules)
+        },
+        "rules": rules
+    }
+    complete = walker.complete and walker.decisions > 0 and bool(rules)
+    return result, complete
+
+
+def _source(node):
+    text = " ".join(ast.unparse(node).split())
+    return text if len(text) <= MAX_ACTION_LENGTH else text[:MAX_ACTION_LENGTH - 3] + "..."
+
+
+def _is_docstring(node):
+    return isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str)
+
+
+def _is_main_guard(node):
+    test = node.test
+    return (
+        isinstance(test, ast.Compare)
+        and isinstance(test.left, ast.Name) and test.left.id == "__name__"
+        and len(test.comparators) == 1
+        and isinstance(test.comparators[0], ast.Constant) and test.comparators[0].value == "__main__"
+    )
+
+
+def _is_terminal(body):
+    # A branch ends the function if its last statement returns/raises, or if it is an
+    # if/else whose every arm does
+    if not body:
+        return False
+    last = body[-1]
+    if isinstance(last, TERMINAL_STATEMENTS):
+        return True
+    if isinstance(last, ast.If) and last.orelse:
+        return _is_terminal(last.body) and _is_terminal(last.orelse)
+    return False
+
+
+def _chain(node):
+    """
+    Flattens an if/elif/.../else ladder into ([(test, body), ...], else_body).
+    """
+    branches = [(node.test, node.body)]
+    orelse = node.orelse
+    while len(orelse) == 1 and isinstance(orelse[0], ast.If):
+        branches.append((orelse[0].test, orelse[0].body))
+        orelse = orelse[0].orelse
+    return branches, orelse
+
+
+class _Walker:
+    def __init__(self):
+        self.rules = []
+        self.decisions = 0
+        self.complete = True
+        self.functions = []
+        self.classes = []
+
+    def module_name(self):
+        if self.classes:
+            return self.classes[0]
+        if self.functions:
+            return "".join(part.capitalize() for part in self.functions[0].split("_")) or "Module"
+        return "Module"
+
+    # --- 1. MODULE AND CLASS LEVEL ---
+
+    def visit_top_level(self, node, owner=None):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            name = f"{owner}.{node.name}" if owner else node.name
+            self.functions.append(name)
+            self.visit_function(node, name)
+        elif isinstance(node, ast.ClassDef) and owner is None:
+            self.classes.append(node.name)
+            for member in node.body:
+                self.visit_top_level(member, owner=node.name)
+        elif isinstance(node, ast.If) and owner is None and _is_main_guard(node):
+            pass
+        elif not (isinstance(node, DECLARATIONS) or _is_docstring(node)):
+            # Module-level logic (loops, top-level ifs, ...) is left to the model
+            self.complete = False
+
+    def visit_function(self, node, name):
+        body = [stmt for stmt in node.body if not _is_docstring(stmt)]
+        if not any(isinstance(stmt, ast.If) for stmt in body):
+            if not all(isinstance(stmt, SIMPLE_STATEMENTS) for stmt in body):
+                # A loop or try block: a rule built from the rest would misstate what the function does
+                self.complete = False
+                return
+            # Straight-line function: one unconditional rule
+            actions = self.describe(body)
+            if actions:
+                self.add("ALWAYS", actions, f"Unconditional behaviour of {name}()", node.lineno)
+            return
+        self.walk(body, None, name)
+
+    # --- 2. BRANCHES ---
+
+    def walk(self, stmts, prefix, function):
+        # Guard clauses that all return read as one ladder: `if a: return 1` followed by
+        # `if b: return 2` behaves like if/elif, and the code after the last one is the else path.
+        ifs = [index for index, stmt in enumerate(stmts) if isinstance(stmt, ast.If)]
+        if not ifs:
+            return
+        falls_through = False
+        last_if = None
+        for index, stmt in enumerate(stmts):
+            if not isinstance(stmt, ast.If):
+                if not isinstance(stmt, SIMPLE_STATEMENTS):
+                    self.complete = False
+                elif index < ifs[-1] and (prefix is None or index > ifs[0]):
+                    # Setup code or code between checks (`fee = 0`) has no rule of its own; a
+                    # nested branch's leading statements are already the branch's actions
+                    self.complete = False
+                continue
+            last_if = index
+            branches, else_body = _chain(stmt)
+            self.decisions += len(branches)
+
+            for position, (test, body) in enumerate(branches):
+                condition = _source(test)
+                if prefix is not None:
+                    trigger = f"{prefix} and {condition}"
+                elif position == 0 and not falls_through:
+                    trigger = f"if {condition}"
+                else:
+                    trigger = f"elif {condition}"
+                kind = "Condition" if trigger.startswith("if") else "Alternative condition"
+                self.branch(body, trigger, f"{kind} checked in {function}()", test.lineno, function)
+
+            fallback = "OTHERWISE" if prefix is None else f"{prefix}, otherwise"
+            if else_body:
+                trigger = "ELSE" if prefix is None else fallback
+                self.branch(else_body, trigger, f"Fallback when no earlier condition in {function}() matches", else_body[0].lineno, function)
+                falls_through = False
+            elif all(_is_terminal(body) for _, body in branches):
+                falls_through = True
+            else:
+                # "no change" is only true when no other statement runs after the check. A nested
+                # check falls through to its parent's code, so it gets no fallback rule of its own
+                if prefix is None and all(isinstance(later, ast.If) for later in stmts[index + 1:]):
+                    self.add(fallback, "no change", f"Fallback when no condition in {function}() matches", stmt.end_lineno)
+                falls_through = False
+
+        rest = stmts[last_if + 1:]
+        if rest and not falls_through and not _is_terminal([stmts[last_if]]):
+            # Code after a check that does not return (`if x > 10: fee = 5` then `fee += 1`)
+            # runs on every path; the rules above do not say so
+            self.complete = False
+        # A nested ladder with nothing after it falls through to its parent's code, not to "no action"
+        if falls_through and (prefix is None or rest):
+            fallback = "OTHERWISE" if prefix is None else f"{prefix}, otherwise"
+            reason = f"Fallback when no earlier condition in {function}() matches"
+            lineno = rest[0].lineno if rest else stmts[last_if].end_lineno
+            self.add(fallback, self.describe(rest) or "no action", reason, lineno)
+
+    def branch(self, body, trigger, reason, lineno, function):
+        # Actions are this branch's own statements; nested ifs become their own rules
+        actions = self.describe([stmt for stmt in body if not isinstance(stmt, ast.If)])
+        if actions or not any(isinstance(stmt, ast.If) for stmt in body):
+            self.add(trigger, actions or "no action", reason, lineno)
+        self.walk(body, trigger, function)
+
+    def describe(self, stmts):
+        parts = []
+        for stmt in stmts:
+            if _is_docstring(stmt):
+                continue
+            if not isinstance(stmt, SIMPLE_STATEMENTS):
+                # Loops, try/with blocks, nested functions... are beyond this walker
+                self.complete = False
+                continue
+            if isinstance(stmt, ast.Pass):
+                continue
+            parts.append(_source(stmt))
+        return "; ".join(parts)
+
+    def add(self, trigger, action, reason, lineno):
+        self.rules.append({
+            "id": "",
+            "trigger": trigger,
+            "action": action,
+            "reason": f"{reason} (line {lineno})"
+        })
@@ -0,0 +1,391 @@
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from core import cache
+from core import metrics
+
+# Persistent artifact store.
+# Every analysis the app produces -- the source, the extracted logic, the generated code
+# per target language and each audit -- is kept in one SQLite database, so reopening a
+# module after a refresh or restart (or by a second reviewer) is a local read instead of
+# three rounds of model calls.
+#
+# Payloads live in a content-addressed `blobs` table as zlib-compressed JSON; the other
+# tables only hold hashes, small metadata and the links between them:
+#
+#   extractions  logic_hash -> source_hash, module name, model, rule count
+#   generations  (logic_hash, language) -> code_hash
+#   audits       (logic_hash, language, code_hash) -> audit_hash, score, status
+#
+# The database runs in WAL mode, so Streamlit sessions and batch runs can read while
+# another process writes.
+#
+#   python -m core.store list
+#   python -m core.store export history.jsonl.gz
+#   python -m core.store import history.jsonl.gz
+STORE_PATH = os.getenv("LOGIC_FOUNDRY_STORE", os.path.join(os.path.expanduser("~"), ".local", "share", "logic_foundry", "artifacts.db"))
+COMPRESS_LEVEL = 6
+HISTORY_LIMIT = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    raw_size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS extractions (
+    logic_hash TEXT PRIMARY KEY,
+    source_hash TEXT,
+    module_name TEXT,
+    model_name TEXT,
+    rule_count INTEGER,
+    created REAL NOT NULL,
+    opened REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS extractions_opened ON extractions (opened);
+CREATE INDEX IF NOT EXISTS extractions_source ON extractions (source_hash);
+CREATE TABLE IF NOT EXISTS generations (
+    logic_hash TEXT NOT NULL,
+    language TEXT NOT NULL,
+    code_hash TEXT NOT NULL,
+    model_name TEXT,
+    created REAL NOT NULL,
+    PRIMARY KEY (logic_hash, language)
+);
+CREATE TABLE IF NOT EXISTS audits (
+    logic_hash TEXT NOT NULL,
+    language TEXT NOT NULL,
+    code_hash TEXT NOT NULL,
+    audit_hash TEXT NOT NULL,
+    model_name TEXT,
+    score INTEGER,
+    status TEXT,
+    created REAL NOT NULL,
+    PRIMARY KEY (logic_hash, language, code_hash)
+);
+"""
+
+
+class ArtifactStore:
+    """
+    SQLite-backed store for extractions, generated code and audits.
+    Connections are per thread; writes are short transactions.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL keeps committed data safe with NORMAL; only the last transactions can be lost on power failure
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with self._init_lock:
+            if not self._initialized:
+                conn.executescript(SCHEMA)
+                self._initialized = True
+        self._local.conn = conn
+        return conn
+
+    # --- 1. BLOBS ---
+
+    def _put_blob(self, conn, value, blob_hash=None):
+        blob_hash = blob_hash or cache.content_hash(value)
+        raw = json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        data = zlib.compress(raw, COMPRESS_LEVEL)
+        # Content-addressed: the same payload is stored once however often it is saved
+        conn.execute(
+            "INSERT OR IGNORE INTO blobs (hash, data, raw_size, stored_size) VALUES (?, ?, ?, ?)",
+            (blob_hash, data, len(raw), len(data))
+        )
+        return blob_hash
+
+    def _get_blob(self, conn, blob_hash):
+        if blob_hash is None:
+            return None
+        row = conn.execute("SELECT data FROM blobs WHERE hash = ?", (blob_hash,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(zlib.decompress(row[0]).decode("utf-8"))
+
+    # --- 2. SAVING ---
+
+    def save_extraction(self, code_text, logic_data, model_name=None, logic_hash=None):
+        """
+        Stores the source and its extracted logic. Returns the logic hash, which links
+        the generated code and audits saved later.
+        """
+        with metrics.timer("logic_foundry_store_seconds", op="save_extraction"):
+            conn = self._connect()
+            now = time.time()
+            rules = logic_data.get("rules", []) if isinstance(logic_data, dict) else []
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                logic_hash = self._put_blob(conn, logic_data, logic_hash)
+                source_hash = self._put_blob(conn, code_text) if code_text is not None else None
+                conn.execute(
+                    "INSERT INTO extractions (logic_hash, source_hash, module_name, model_name, rule_count, created, opened) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (logic_hash) DO UPDATE SET source_hash = COALESCE(excluded.source_hash, source_hash), opened = excluded.opened",
+                    (logic_hash, source_hash, logic_data.get("module_name", "Unknown"), model_name, len(rules), now, now)
+                )
+            return logic_hash
+
+    def save_code(self, logic_hash, language, code_text, model_name=None):
+        """
+        Stores the generated code for one target language, replacing any earlier version.
+        Returns the code hash.
+        """
+        with metrics.timer("logic_foundry_store_seconds", op="save_code"):
+            conn = self._connect()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                code_hash = self._put_blob(conn, code_text)
+                conn.execute(
+                    "INSERT OR REPLACE INTO generations (logic_hash, language, code_hash, model_name, created) VALUES (?, ?, ?, ?, ?)",
+                    (logic_hash, language, code_hash, model_name, time.time())
+                )
+            return code_hash
+
+    def save_audit(self, logic_hash, language, code_text, report, model_name=None):
+        """
+        Stores an audit report for the logic and the implementation it checked.
+        """
+        with metrics.timer("logic_foundry_store_seconds", op="save_audit"):
+            conn = self._connect()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                code_hash = self._put_blob(conn, code_text)
+                audit_hash = self._put_blob(conn, report)
+                conn.execute(
+                    "INSERT OR REPLACE INTO audits (logic_hash, language, code_hash, audit_hash, model_name, score, status, created) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (logic_hash, language, code_hash, audit_hash, model_name, report.get("score"), report.get("status"), time.time())
+                )
+            return audit_hash
+
+    # --- 3. READING ---
+
+    def history(self, limit=HISTORY_LIMIT, search=None):
+        """
+        Returns the most recently opened analyses, newest first, as metadata dicts.
+        search filters on the module name.
+        """
+        conn = self._connect()
+        query = (
+            "SELECT e.logic_hash, e.module_name, e.model_name, e.rule_count, e.created, e.opened, "
+            "(SELECT COUNT(*) FROM generations g WHERE g.logic_hash = e.logic_hash), "
+            "(SELECT COUNT(*) FROM audits a WHERE a.logic_hash = e.logic_hash) "
+            "FROM extractions e"
+        )
+        params = []
+        if search:
+            query += " WHERE e.module_name LIKE ?"
+            params.append(f"%{search}%")
+        query += " ORDER BY e.opened DESC LIMIT ?"
+        params.append(limit)
+        keys = ("logic_hash", "module_name", "model_name", "rule_count", "created", "opened", "languages", "audits")
+        return [dict(zip(keys, row)) for row in conn.execute(query, params)]
+
+    def find_by_source(self, code_text):
+        """
+        Returns the logic hash of the latest extraction of exactly this source, or None.
+        """
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT logic_hash FROM extractions WHERE source_hash = ? ORDER BY opened DESC LIMIT 1",
+            (cache.content_hash(code_text),)
+        ).fetchone()
+        return row[0] if row else None
+
+    def load(self, logic_hash, touch=True):
+        """
+        Returns everything stored for one analysis:
+        {"logic_hash", "module_name", "model_name", "source", "logic_data",
+         "modern_codes": {language: code}, "audits": {language: report}},
+        or None when the hash is unknown.
+        """
+        with metrics.timer("logic_foundry_store_seconds", op="load"):
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT source_hash, module_name, model_name FROM extractions WHERE logic_hash = ?",
+                (logic_hash,)
+            ).fetchone()
+            if row is None:
+                return None
+            source_hash, module_name, model_name = row
+
+            modern_codes = {}
+            for language, code_hash in conn.execute(
+                "SELECT language, code_hash FROM generations WHERE logic_hash = ?", (logic_hash,)
+            ):
+                modern_codes[language] = self._get_blob(conn, code_hash)
+
+            # Only audits of the code currently stored for a language are current
+            audits = {}
+            for language, audit_hash in conn.execute(
+                "SELECT a.language, a.audit_hash FROM audits a JOIN generations g "
+                "ON g.logic_hash = a.logic_hash AND g.language = a.language AND g.code_hash = a.code_hash "
+                "WHERE a.logic_hash = ? ORDER BY a.created", (logic_hash,)
+            ):
+                audits[language] = self._get_blob(conn, audit_hash)
+
+            artifact = {
+                "logic_hash": logic_hash,
+                "module_name": module_name,
+                "model_name": model_name,
+                "source": self._get_blob(conn, source_hash),
+                "logic_data": self._get_blob(conn, logic_hash),
+                "modern_codes": modern_codes,
+                "audits": audits
+            }
+            if touch:
+                conn.execute("UPDATE extractions SET opened = ? WHERE logic_hash = ?", (time.time(), logic_hash))
+            return artifact
+
+    def delete(self, logic_hash):
+        """
+        Removes one analysis and every blob no longer referenced.
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM audits WHERE logic_hash = ?", (logic_hash,))
+            conn.execute("DELETE FROM generations WHERE logic_hash = ?", (logic_hash,))
+            conn.execute("DELETE FROM extractions WHERE logic_hash = ?", (logic_hash,))
+            self._collect_garbage(conn)
+
+    def _collect_garbage(self, conn):
+        conn.execute(
+            "DELETE FROM blobs WHERE hash NOT IN ("
+            "SELECT logic_hash FROM extractions UNION SELECT source_hash FROM extractions WHERE source_hash IS NOT NULL "
+            "UNION SELECT code_hash FROM generations UNION SELECT code_hash FROM audits UNION SELECT audit_hash FROM audits)"
+        )
+
+    def stats(self):
+        """
+        Returns row counts and raw vs stored payload sizes for display in the UI.
+        """
+        conn = self._connect()
+        analyses = conn.execute("SELECT COUNT(*) FROM extractions").fetchone()[0]
+        blobs, raw_size, stored_size = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(raw_size), 0), COALESCE(SUM(stored_size), 0) FROM blobs"
+        ).fetchone()
+        return {
+            "analyses": analyses,
+            "blobs": blobs,
+            "raw_bytes": raw_size,
+            "stored_bytes": stored_size,
+            "compression_ratio": round(stored_size / raw_size, 3) if raw_size else 0.0,
+        }
+
+    # --- 4. EXPORT / IMPORT ---
+
+    def export_records(self, logic_hashes=None):
+        """
+        Yields one self-contained record per analysis (the load() payload plus timestamps).
+        """
+        conn = self._connect()
+        if logic_hashes is None:
+            logic_hashes = [row[0] for row in conn.execute("SELECT logic_hash FROM extractions ORDER BY created")]
+        for logic_hash in logic_hashes:
+            artifact = self.load(logic_hash, touch=False)
+            if artifact is not None:
+                yield artifact
+
+    def export_archive(self, logic_hashes=None):
+        """
+        Returns a gzip-compressed JSONL archive of the given analyses (all by default).
+        """
+        lines = [json.dumps(record, ensure_ascii=False) for record in self.export_records(logic_hashes)]
+        return gzip.compress(("\n".join(lines) + "\n").encode("utf-8") if lines else b"")
+
+    def import_archive(self, data):
+        """
+        Loads an archive written by export_archive (gzip or plain JSONL bytes).
+        Existing analyses are merged, never duplicated. Returns the number of records read.
+        """
+        if data[:2] == b"\x1f\x8b":
+            data = gzip.decompress(data)
+        count = 0
+        for line in data.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            logic_data = record.get("logic_data")
+            if not isinstance(logic_data, dict):
+                continue
+            logic_hash = self.save_extraction(record.get("source"), logic_data, record.get("model_name"))
+            for language, code_text in (record.get("modern_codes") or {}).items():
+                self.save_code(logic_hash, language, code_text, record.get("model_name"))
+            for language, report in (record.get("audits") or {}).items():
+                code_text = (record.get("modern_codes") or {}).get(language)
+                if code_text is not None and isinstance(report, dict):
+                    self.save_audit(logic_hash, language, code_text, report, record.get("model_name"))
+            count += 1
+        return count
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_store():
+    """
+    Returns the process-wide store shared by all sessions.
+    """
+    global _default_store
+    if _default_store is None:
+        with _default_lock:
+            if _default_store is None:
+                _default_store = ArtifactStore()
+    return _default_store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect, export or import the Logic Foundry artifact store.")
+    parser.add_argument("--db", default=STORE_PATH, help="Path to the SQLite database")
+    commands = parser.add_subparsers(dest="command", required=True)
+    list_cmd = commands.add_parser("list", help="Show recent analyses")
+    list_cmd.add_argument("--limit", type=int, default=HISTORY_LIMIT)
+    export_cmd = commands.add_parser("export", help="Write every analysis to a .jsonl.gz archive")
+    export_cmd.add_argument("path")
+    import_cmd = commands.add_parser("import", help="Merge an archive into the store")
+    import_cmd.add_argument("path")
+    args = parser.parse_args(argv)
+
+    store = ArtifactStore(args.db)
+    if args.command == "list":
+        for row in store.history(limit=args.limit):
+            opened = time.strftime("%Y-%m-%d %H:%M", time.localtime(row["opened"]))
+            print(f"{row['logic_hash'][:12]}  {opened}  {row['module_name']}  {row['rule_count']} rules, "
+                  f"{row['languages']} languages, {row['audits']} audits")
+    elif args.command == "export":
+        data = store.export_archive()
+        with open(args.path, "wb") as f:
+            f.write(data)
+        print(f"Exported {store.stats()['analyses']} analyses to {args.path}", file=sys.stderr)
+    else:
+        with open(args.path, "rb") as f:
+            count = store.import_archive(f.read())
+        print(f"Imported {count} analyses from {args.path}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
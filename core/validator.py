@@ -1,25 +1,277 @@
-import os
 import json
-from openai import OpenAI
-# Reusing keys from extractor
-from core.extractor import OPENROUTER_API_KEY
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from core import cache
+from core import chunker
+from core import compactor
+from core import equivalence
+from core import json_repair
+from core import llm_client
+from core import metrics
 
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=os.getenv("OPENROUTER_API_KEY", OPENROUTER_API_KEY),
-)
+# Bump whenever the system prompt changes so cached results are not reused
+PROMPT_VERSION = "1"
 
-def validate_equivalence(original_logic_json, modern_code_text, model_name="anthropic/claude-3.5-sonnet"):
+# Rule sets larger than this are audited in shards, each with only the code that implements it
+SHARD_RULES = 40
+MAX_SHARD_WORKERS = 8
+# Functions longer than this are cut down to the lines tagged with a shard's rule IDs
+SHARD_UNIT_LINES = 120
+# A merged summary names this many of the most severe findings, each cut to MAX_FINDING_CHARS
+MAX_SUMMARY_FINDINGS = 2
+MAX_FINDING_CHARS = 120
+SEVERITY_ORDER = {"CRITICAL": 0, "MINOR": 1}
+
+def validate_equivalence(original_logic_json, modern_code_text, model_name="anthropic/claude-3.5-sonnet", use_cache=True, target_language=None, policy=None, compact=None, local_execution=False):
     """
     Asks the AI to perform a symbolic equivalence check between the extracted logic rules
     and the generated modern code.
+    With local_execution=True and a Python target_language, rules with numeric thresholds
+    are checked by executing the generated code on this machine (core.equivalence); only the
+    rules it cannot check go to the LLM. That runs untrusted code with this process's
+    privileges, so it stays off unless the caller opts in.
+    Audits of an unchanged rules/code pair are served from the persistent cache.
+    More than SHARD_RULES rules are audited in concurrent shards (see validate_sharded).
+    policy overrides the retry/deadline/hedging defaults for the model calls (see llm_client.chat);
+    compact turns prompt compaction on or off for this call (None uses the process setting).
     """
-    
-    # robustly handle string vs dict input
-    if isinstance(original_logic_json, str):
-        rules_str = original_logic_json
+    with metrics.timer("logic_foundry_stage_seconds", stage="validate"):
+        if local_execution and target_language and target_language.lower().startswith("python"):
+            report = _validate_locally(original_logic_json, modern_code_text, model_name, use_cache, policy, compact)
+            if report is not None:
+                return report
+        return _validate_with_llm(original_logic_json, modern_code_text, model_name, use_cache, policy, compact)
+
+def _validate_with_llm(original_logic_json, modern_code_text, model_name, use_cache, policy=None, compact=None):
+    logic = _load_logic(original_logic_json)
+    if logic is not None and len(logic.get("rules", [])) > SHARD_RULES:
+        return validate_sharded(logic, modern_code_text, model_name, use_cache=use_cache, policy=policy, compact=compact)
+    return _audit(original_logic_json, modern_code_text, model_name, use_cache, policy, compact)
+
+def _audit(original_logic_json, modern_code_text, model_name, use_cache, policy=None, compact=None):
+    key = cache.make_key("validate", [original_logic_json, modern_code_text], model_name, compactor.cache_tag(PROMPT_VERSION, compact))
+    return cache.cached_call(
+        key,
+        lambda: _validate_equivalence_uncached(original_logic_json, modern_code_text, model_name, policy, compact),
+        use_cache=use_cache,
+        # Cut-off audits are not cached, so the next run tries again
+        is_error=lambda report: report.get("status") == "ERROR" or report.get("truncated"),
+        stage="validate"
+    )
+
+def _load_logic(original_logic_json):
+    logic = original_logic_json
+    if isinstance(logic, str):
+        try:
+            logic = json.loads(logic)
+        except ValueError:
+            return None
+    return logic if isinstance(logic, dict) else None
+
+def _validate_locally(original_logic_json, modern_code_text, model_name, use_cache, policy=None, compact=None):
+    """
+    Runs the execution-based engine and falls back to the LLM for unchecked rules.
+    Returns None when the engine could not check anything, so the caller uses the LLM audit.
+    """
+    logic = _load_logic(original_logic_json)
+    rules = logic.get("rules", []) if logic is not None else []
+    if not rules:
+        return None
+
+    outcome = equivalence.check_rules(rules, modern_code_text)
+    unresolved = outcome["unresolved"]
+    checked = len(rules) - len(unresolved)
+    if checked == 0:
+        return None
+
+    local_report = {
+        "score": round(100 * len(outcome["verified"]) / checked),
+        "status": "FAIL" if outcome["discrepancies"] else "PASS",
+        "summary": f"Executed boundary checks for {checked} of {len(rules)} rules locally.",
+        "discrepancies": outcome["discrepancies"]
+    }
+    parts = [(local_report, checked)]
+    if unresolved:
+        fallback_logic = dict(logic, rules=unresolved)
+        parts.append((_validate_with_llm(fallback_logic, modern_code_text, model_name, use_cache, policy, compact), len(unresolved)))
+
+    report = merge_reports(parts)
+    report["engine"] = "local" if len(parts) == 1 else "local+llm"
+    return report
+
+def validate_sharded(original_logic_json, modern_code_text, model_name, shard_size=SHARD_RULES, max_workers=MAX_SHARD_WORKERS, use_cache=True, policy=None, compact=None):
+    """
+    Audits a large rule set as several smaller LLM calls running concurrently.
+    Rules are grouped by where the code implements them ("Implements rule_N" comments),
+    each group is sent with only the code regions that reference it, and the partial
+    reports are merged with merge_reports. Rules the code never mentions are audited
+    against the full code.
+    """
+    logic = _load_logic(original_logic_json)
+    rules = logic.get("rules", []) if logic is not None else []
+    if len(rules) <= shard_size:
+        return _audit(original_logic_json, modern_code_text, model_name, use_cache, policy, compact)
+
+    shards = _plan_shards(rules, modern_code_text, shard_size)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(shards)))) as pool:
+        reports = list(pool.map(
+            lambda shard: _audit(dict(logic, rules=shard["rules"]), shard["code"], model_name, use_cache, policy, compact),
+            shards
+        ))
+
+    report = merge_reports([(r, len(shard["rules"])) for r, shard in zip(reports, shards)])
+    report["shards"] = len(shards)
+    return report
+
+def _plan_shards(rules, code_text, shard_size):
+    """
+    Returns a list of {"rules", "code"} shards of at most shard_size rules.
+    """
+    ids = {str(rule.get("id")) for rule in rules if rule.get("id")}
+    units = chunker.split_units(code_text, max_lines=SHARD_UNIT_LINES)
+    id_re = None
+    if ids and units:
+        # Longest first so "rule_10" is not read as "rule_1"
+        id_re = re.compile(r"(?<!\w)(" + "|".join(re.escape(i) for i in sorted(ids, key=len, reverse=True)) + r")(?!\w)")
+
+    # --- 1. FIND WHERE EACH RULE IS IMPLEMENTED ---
+    unit_refs = []
+    first_seen = {}
+    for unit in units:
+        refs = set()
+        if id_re is not None:
+            for offset, line in enumerate(unit["text"].splitlines()):
+                for rule_id in id_re.findall(line):
+                    refs.add(rule_id)
+                    first_seen.setdefault(rule_id, unit["start"] + offset)
+        unit_refs.append(refs)
+
+    # --- 2. GROUP NEIGHBOURING RULES ---
+    # Ordering by first reference keeps rules that share a function in the same shard
+    referenced = sorted(
+        (rule for rule in rules if str(rule.get("id")) in first_seen),
+        key=lambda rule: first_seen[str(rule.get("id"))]
+    )
+    unreferenced = [rule for rule in rules if str(rule.get("id")) not in first_seen]
+
+    shards = []
+    for i in range(0, len(referenced), shard_size):
+        group = referenced[i:i + shard_size]
+        wanted = {str(rule.get("id")) for rule in group}
+        shards.append({"rules": group, "code": _code_for_rules(units, unit_refs, wanted, id_re)})
+    for i in range(0, len(unreferenced), shard_size):
+        shards.append({"rules": unreferenced[i:i + shard_size], "code": code_text})
+    return shards
+
+def _code_for_rules(units, unit_refs, wanted, id_re):
+    # Units that mention no rule (imports, types, helpers) are shared context for every shard
+    parts = []
+    for unit, refs in zip(units, unit_refs):
+        if refs and not refs & wanted:
+            continue
+        lines = unit["text"].splitlines()
+        if refs <= wanted or len(lines) <= SHARD_UNIT_LINES:
+            parts.append(unit["text"])
+        else:
+            parts.append(_slice_unit(lines, wanted, id_re))
+    return "\n".join(parts)
+
+def _slice_unit(lines, wanted, id_re):
+    """
+    Keeps a long function's header, its untagged preamble and every region tagged with
+    a wanted rule ID (from the tagging line up to the next tagged line).
+    """
+    kept = [lines[0]]
+    keep = True
+    for line in lines[1:]:
+        found = set(id_re.findall(line))
+        if found:
+            keep = bool(found & wanted)
+        if keep:
+            kept.append(line)
+        elif kept[-1].strip() != "...":
+            indent = line[:len(line) - len(line.lstrip())]
+            kept.append(f"{indent}...")
+    return "\n".join(kept)
+
+def merge_reports(parts):
+    """
+    Merges (report, weight) pairs into one report in the validator schema.
+    Scores are weighted by the number of rules each report covered; discrepancies are concatenated.
+    Several parts get one summary: rule and finding counts plus the most severe findings.
+    """
+    usable = [(r, w) for r, w in parts if r.get("status") != "ERROR"]
+    errors = [r for r, w in parts if r.get("status") == "ERROR"]
+    discrepancies = []
+    for report, _ in parts:
+        discrepancies.extend(report.get("discrepancies", []))
+
+    if not usable:
+        return {
+            "score": 0,
+            "status": "ERROR",
+            "summary": _merged_summary(parts, discrepancies, errors),
+            "discrepancies": discrepancies
+        }
+
+    total_weight = sum(w for _, w in usable) or 1
+    score = round(sum(r.get("score", 0) * w for r, w in usable) / total_weight)
+    statuses = {r.get("status") for r, _ in usable}
+    critical = any(d.get("severity") == "CRITICAL" for d in discrepancies)
+
+    if "FAIL" in statuses or critical:
+        status = "FAIL"
+    elif errors or "WARNING" in statuses or discrepancies or score < 100:
+        status = "WARNING"
     else:
-        rules_str = json.dumps(original_logic_json, indent=2)
+        status = "PASS"
+
+    return {
+        "score": score,
+        "status": status,
+        "summary": _merged_summary(parts, discrepancies, errors),
+        "discrepancies": discrepancies
+    }
+
+def _merged_summary(parts, discrepancies, errors):
+    if len(parts) == 1:
+        return parts[0][0].get("summary", "")
+    if len(errors) == len(parts):
+        return f"None of the {len(parts)} audit parts ran: {_clip(errors[0].get('summary', ''))}"
+
+    rule_count = sum(w for _, w in parts)
+    audited = sum(w for r, w in parts if r.get("status") != "ERROR")
+    summary = f"Audited {audited} of {rule_count} rules" if errors else f"Audited {rule_count} rules"
+    summary += f" in {len(parts)} parts"
+    if discrepancies:
+        counts = Counter(d.get("severity", "MINOR") for d in discrepancies)
+        breakdown = ", ".join(
+            f"{count} {severity.lower()}"
+            for severity, count in sorted(counts.items(), key=lambda item: SEVERITY_ORDER.get(item[0], len(SEVERITY_ORDER)))
+        )
+        noun = "discrepancy" if len(discrepancies) == 1 else "discrepancies"
+        summary += f": {len(discrepancies)} {noun} ({breakdown})."
+        # Stable sort keeps the reports' own order within a severity
+        worst = sorted(discrepancies, key=lambda d: SEVERITY_ORDER.get(d.get("severity"), len(SEVERITY_ORDER)))
+        summary += " Worst: " + "; ".join(
+            f"{d.get('rule_id', 'Unknown Rule')}: {_clip(d.get('issue', ''))}" for d in worst[:MAX_SUMMARY_FINDINGS]
+        ) + "."
+    else:
+        summary += ": no discrepancies found."
+    if errors:
+        summary += f" {len(errors)} of {len(parts)} parts could not be audited ({_clip(errors[0].get('summary', ''))})."
+    return summary
+
+def _clip(text, limit=MAX_FINDING_CHARS):
+    text = " ".join(str(text).split()).rstrip(".")
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+def _validate_equivalence_uncached(original_logic_json, modern_code_text, model_name, policy=None, compact=None):
+    # robustly handle string vs dict input
+    rules_str, _ = compactor.compact_json(original_logic_json, enabled=compact, stage="validate")
+    # Comments stay: the "Implements rule_N" links are what the audit follows
+    modern_code_text, _ = compactor.compact_code(modern_code_text, strip_comments=False, dedupe=False, enabled=compact, stage="validate")
 
     system_prompt = """
     You are a Formal Verification Engine. Your goal is to mathematically verify that a piece of Modern Code 
@@ -54,28 +306,32 @@ def validate_equivalence(original_logic_json, modern_code_text, model_name="anth
     """
 
     try:
-        response = client.chat.completions.create(
-            model=model_name,
-            messages=[
+        response = llm_client.chat(
+            model_name,
+            [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
+            stage="validate",
+            policy=policy,
             # Helper to ensure JSON if model supports it (optional, removing for broad compatibility)
             # response_format={"type": "json_object"} 
         )
         
-        content = response.choices[0].message.content.strip()
-        
-        # Clean up potential markdown
-        if content.startswith("```json"):
-            content = content[7:]
-        elif content.startswith("```"):
-            content = content[3:]
-            
-        if content.endswith("```"):
-            content = content[:-3]
-            
-        return json.loads(content.strip())
+        # Tolerant parse; a cut-off reply keeps the discrepancies that arrived in full
+        report, repair = json_repair.parse_reply(response.choices[0].message.content, model_name, stage="validate")
+        if not isinstance(report, dict):
+            raise ValueError(repair.get("error", "Model reply is not a JSON object"))
+        if repair["truncated"]:
+            report.setdefault("score", 0)
+            # Half an audit is never a clean verdict: only a FAIL or ERROR the model already gave stands
+            if report.get("status") not in ("FAIL", "ERROR"):
+                report["status"] = "WARNING"
+            report.setdefault("summary", "")
+            report["summary"] = (report["summary"] + " Audit reply was cut off; discrepancies may be incomplete.").strip()
+            report["truncated"] = True
+        report.setdefault("discrepancies", [])
+        return report
         
     except Exception as e:
         return {
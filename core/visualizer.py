@@ -1,76 +1,82 @@
-import graphviz
+import os
+import threading
+from concurrent.futures import Future
+from core import cache
+from core import metrics
+from core import zones
+from core.zones import classify_rules
+
+# Rendered images are cached on disk by logic hash and zone keywords, so reopening a module
+# skips `dot` entirely. The directory gets the same size/age LRU as the result cache.
+RENDER_CACHE_DIR = os.getenv("LOGIC_FOUNDRY_RENDER_DIR", os.path.join(cache.CACHE_DIR, "renders"))
+# Image formats the UI renders; eviction only ever removes files with these extensions
+RENDER_FORMATS = ("svg", "png")
+
+ZONE_STYLES = {
+    'validation': {
+        'label': '🛡️ Validation & Errors', 'color': '#FF4B4B', 'node_fill': '#FFEEEE', 'action_fill': '#FF4B4B' # Red
+    },
+    'pricing': {
+        'label': '💰 Pricing & Discounts', 'color': '#00CC96', 'node_fill': '#E8FDF5', 'action_fill': '#00CC96' # Green
+    },
+    'logistics': {
+        'label': '🚚 Logistics & Shipping', 'color': '#636EFA', 'node_fill': '#E6EAFE', 'action_fill': '#636EFA' # Blue
+    },
+}
+DEFAULT_ACTION_FILL = '#F0F2F6' # Default Gray
+
+_render_pool = None
+_render_lock = threading.Lock()
 
 def create_graph(logic_data):
+    # Imported on first use to keep `import core.visualizer` cheap
+    import graphviz
     graph = graphviz.Digraph()
     graph.attr(rankdir='TB', newrank='true', bgcolor='transparent')
     graph.attr('node', shape='box', style='filled', fontname='Helvetica', fontsize='10')
     graph.attr('edge', fontname='Helvetica', fontsize='9', color='#666666')
 
-    if "error" in logic_data: 
+    if "error" in logic_data:
         return graph
 
-    # --- 1. DEFINE ZONES ---
-    with graph.subgraph(name='cluster_validation') as c:
-        c.attr(label='🛡️ Validation & Errors', color='#FF4B4B', style='rounded,dashed', fontcolor='#FF4B4B')
-        c.attr('node', fillcolor='#FFEEEE', color='#FF4B4B')
-
-    with graph.subgraph(name='cluster_pricing') as c:
-        c.attr(label='💰 Pricing & Discounts', color='#00CC96', style='rounded,dashed', fontcolor='#00CC96')
-        c.attr('node', fillcolor='#E8FDF5', color='#00CC96')
+    graph.node('Start', 'Start Order Process', shape='oval', fillcolor='#262730', fontcolor='white')
 
-    with graph.subgraph(name='cluster_logistics') as c:
-        c.attr(label='🚚 Logistics & Shipping', color='#636EFA', style='rounded,dashed', fontcolor='#636EFA')
-        c.attr('node', fillcolor='#E6EAFE', color='#636EFA')
+    # --- 1. GROUP RULES BY ZONE ---
+    rules = logic_data.get('rules', [])
+    # Shared classifier (core.zones) so both visualizers agree on zones
+    rule_zones = classify_rules(rules)
+    rule_ids = [rule.get('id', f'rule_{i}') for i, rule in enumerate(rules)]
 
-    graph.node('Start', 'Start Order Process', shape='oval', fillcolor='#262730', fontcolor='white')
-    last_node = 'Start'
-    
-    # --- 2. SMART MAPPING ---
-    for i, rule in enumerate(logic_data.get('rules', [])):
-        rule_id = rule.get('id', f'rule_{i}')
-        trigger = rule.get('trigger', '').lower()
-        action = rule.get('action', '').lower()
-        
-        # Priority Classification Strategy
-        # Check specific business logic FIRST, before checking for generic "null" errors
-        
-        zone = 'default'
-        
-        # 1. Logistics (Shipping, Weight, Fees)
-        if any(x in action for x in ['shipping', 'fee']) or \
-           any(x in trigger for x in ['weight', 'destination', 'ak', 'hi', 'ship']):
-            zone = 'logistics'
-
-        # 2. Pricing (Discounts, Totals, Promos) - Overrides logistics if ambiguous
-        elif any(x in action for x in ['discount', 'total', 'price', 'rate']) or \
-             any(x in trigger for x in ['vip', 'promo', 'customer']):
-            zone = 'pricing'
-
-        # 3. Validation (Errors, Nulls, Bans) - Only if it returns a negative number or explicit error
-        elif 'return -' in action or 'error' in action or 'banned' in trigger:
-            zone = 'validation'
-
-        # --- DRAW NODES IN ZONES ---
-        if zone == 'logistics':
-            with graph.subgraph(name='cluster_logistics') as c:
-                c.node(rule_id, f"❓ {rule.get('trigger')}", shape='diamond', style='filled,rounded')
-        elif zone == 'pricing':
-            with graph.subgraph(name='cluster_pricing') as c:
-                c.node(rule_id, f"❓ {rule.get('trigger')}", shape='diamond', style='filled,rounded')
-        elif zone == 'validation':
-            with graph.subgraph(name='cluster_validation') as c:
-                c.node(rule_id, f"❓ {rule.get('trigger')}", shape='diamond', style='filled,rounded')
+    grouped = {zone: [] for zone in ZONE_STYLES}
+    defaults = []
+    for i, zone in enumerate(rule_zones):
+        if zone in grouped:
+            grouped[zone].append(i)
         else:
-            graph.node(rule_id, f"❓ {rule.get('trigger')}", shape='diamond', fillcolor='#F0F2F6', color='#808495')
+            defaults.append(i)
+
+    # --- 2. EMIT EACH CLUSTER ONCE ---
+    # Reopening a subgraph per rule appends a new block to the DOT source every time,
+    # so each zone is written as a single cluster holding all of its rules.
+    for zone, indices in grouped.items():
+        if not indices:
+            continue
+        style = ZONE_STYLES[zone]
+        with graph.subgraph(name=f'cluster_{zone}') as c:
+            c.attr(label=style['label'], color=style['color'], style='rounded,dashed', fontcolor=style['color'])
+            c.attr('node', fillcolor=style['node_fill'], color=style['color'])
+            for i in indices:
+                c.node(rule_ids[i], f"❓ {rules[i].get('trigger')}", shape='diamond', style='filled,rounded')
+
+    for i in defaults:
+        graph.node(rule_ids[i], f"❓ {rules[i].get('trigger')}", shape='diamond', fillcolor='#F0F2F6', color='#808495')
 
-        # Action Node Styling
+    # --- 3. ACTIONS AND FLOW ---
+    last_node = 'Start'
+    for i, rule in enumerate(rules):
+        rule_id = rule_ids[i]
         action_id = f"{rule_id}_action"
-        action_fill = '#F0F2F6' # Default Gray
-        
-        if zone == 'validation': action_fill = '#FF4B4B' # Red
-        if zone == 'pricing': action_fill = '#00CC96'    # Green
-        if zone == 'logistics': action_fill = '#636EFA'  # Blue
-        
+        action_fill = ZONE_STYLES.get(rule_zones[i], {}).get('action_fill', DEFAULT_ACTION_FILL)
         graph.node(action_id, f"✅ {rule.get('action')}", shape='box', fillcolor=action_fill, fontcolor='black', style='filled')
 
         # Connect
@@ -80,5 +86,64 @@ def create_graph(logic_data):
 
     graph.edge(last_node, 'End', label="Done")
     graph.node('End', 'End Process', shape='doublecircle', fillcolor='#262730', fontcolor='white')
-        
+
     return graph
+
+def render_graph(logic_data, fmt='svg'):
+    """
+    Renders the flowchart to an image file and returns its path.
+    Output is cached by a hash of the logic data, so unchanged modules skip the `dot` layout.
+    """
+    path = _render_path(logic_data, fmt)
+    if not _touch(path):
+        with metrics.timer("logic_foundry_render_seconds", renderer="graphviz"):
+            _render_source(create_graph(logic_data).source, fmt, path)
+    return path
+
+def render_graph_async(logic_data, fmt='svg'):
+    """
+    Same as render_graph, but runs `dot` in a background process.
+    Returns a concurrent.futures.Future that resolves to the image path.
+    """
+    path = _render_path(logic_data, fmt)
+    if _touch(path):
+        future = Future()
+        future.set_result(path)
+        return future
+    # Build the DOT text here (cheap); only the layout step runs in the worker process
+    return _get_render_pool().submit(_render_source, create_graph(logic_data).source, fmt, path)
+
+def _render_path(logic_data, fmt):
+    # Zone keywords decide the clusters and colours, so a new keyword set means a new image
+    key = cache.content_hash('graphviz', zones.current_keywords(), logic_data)
+    return os.path.join(RENDER_CACHE_DIR, f"{key}.{fmt}")
+
+def _touch(path):
+    # A cache hit refreshes the file's mtime so LRU eviction keeps it
+    try:
+        os.utime(path, None)
+        return True
+    except OSError:
+        return False
+
+def _render_source(source, fmt, path):
+    # Module-level so it can run in a worker process
+    import graphviz
+    data = graphviz.Source(source).pipe(format=fmt)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    formats = RENDER_FORMATS if fmt in RENDER_FORMATS else RENDER_FORMATS + (fmt,)
+    cache.evict_files(os.path.dirname(path), tuple(f".{name}" for name in formats))
+    return path
+
+def _get_render_pool():
+    global _render_pool
+    if _render_pool is None:
+        with _render_lock:
+            if _render_pool is None:
+                from concurrent.futures import ProcessPoolExecutor
+                _render_pool = ProcessPoolExecutor(max_workers=2)
+    return _render_pool
@@ -1,119 +1,210 @@
-def generate_mermaid(logic_data):
+from core.zones import classify_rules
+
+# Mermaid label escaping: quotes would end the label, parentheses change the node shape
+TRIGGER_ESCAPES = str.maketrans({'"': "'", '(': None, ')': None})
+ACTION_ESCAPES = str.maketrans({'"': "'"})
+
+# Level of detail. The browser-side Mermaid render slows to a crawl past a few hundred
+# nodes and by default refuses graphs with more than 500 edges (every rule adds two),
+# so no view draws more than MAX_FULL_RULES rules. Larger rule sets switch to the summary
+# view: one node per zone, with chosen zones expanded a window of rules at a time.
+MAX_FULL_RULES = 150
+PAGE_SIZE = 50
+VIEWS = ["auto", "full", "page", "summary"]
+
+# Zone -> (subgraph id, title); rules outside these zones are drawn without a subgraph
+ZONE_SUBGRAPHS = {
+    "validation": ("Validation", "🛡️ Validation"),
+    "pricing": ("Pricing", "💰 Pricing"),
+    "logistics": ("Logistics", "🚚 Logistics"),
+}
+ZONE_ORDER = ["validation", "pricing", "logistics", "default"]
+
+STYLE_LINES = [
+    "    %% Styles",
+    "    classDef default fill:#f9f9f9,stroke:#333,stroke-width:1px;",
+    "    classDef startend fill:#262730,stroke:#333,stroke-width:2px,color:white;",
+    "    classDef validation fill:#ff4b4b,stroke:#333,stroke-width:2px,color:white;",
+    "    classDef pricing fill:#00cc96,stroke:#333,stroke-width:2px,color:black;",
+    "    classDef logistics fill:#636efa,stroke:#333,stroke-width:2px,color:white;",
+    "    classDef action fill:#e1e1e1,stroke:#333,stroke-width:1px,color:black,shape:rect;",
+]
+
+def generate_mermaid(logic_data, view="auto", page=1, page_size=PAGE_SIZE, expand=()):
     """
     Generates Mermaid.js flowchart syntax from the extracted logic JSON.
+    view is "full" (every rule), "page" (rules page_size at a time; page is 1-based),
+    "summary" (one node per zone; zones named in expand show a page of their rules), or
+    "auto": "full" up to MAX_FULL_RULES rules and "summary" beyond.
     """
     if "error" in logic_data:
         return "graph TD\n    Error[Error Extraction Failed]:::validation\n    classDef validation fill:#ff4b4b,stroke:#333,stroke-width:2px,color:white;"
 
+    rules = logic_data.get('rules', [])
+    if view == "auto":
+        view = "full" if len(rules) <= MAX_FULL_RULES else "summary"
+
+    # 1. Classification Pass (one batched pass through the shared classifier)
+    rule_zones = classify_rules(rules)
+
     mermaid_lines = ["graph TD"]
-    
-    # Define Styles
-    mermaid_lines.append("    %% Styles")
-    mermaid_lines.append("    classDef default fill:#f9f9f9,stroke:#333,stroke-width:1px;")
-    mermaid_lines.append("    classDef startend fill:#262730,stroke:#333,stroke-width:2px,color:white;")
-    mermaid_lines.append("    classDef validation fill:#ff4b4b,stroke:#333,stroke-width:2px,color:white;")
-    mermaid_lines.append("    classDef pricing fill:#00cc96,stroke:#333,stroke-width:2px,color:black;")
-    mermaid_lines.append("    classDef logistics fill:#636efa,stroke:#333,stroke-width:2px,color:white;")
-    mermaid_lines.append("    classDef action fill:#e1e1e1,stroke:#333,stroke-width:1px,color:black,shape:rect;")
+    mermaid_lines.extend(STYLE_LINES)
+    if view == "summary":
+        _summary_flow(mermaid_lines, rules, rule_zones, page, page_size, expand)
+    else:
+        window = range(len(rules))
+        if view == "page":
+            size = _clamp_size(page_size)
+            start = (_clamp_page(page, len(rules), size) - 1) * size
+            window = range(start, min(start + size, len(rules)))
+        _rule_flow(mermaid_lines, rules, rule_zones, window)
+    return "\n".join(mermaid_lines)
 
-    # Organize rules by zone for subgraphs
-    zones = {
-        "validation": [],
-        "pricing": [],
-        "logistics": [],
-        "default": []
+def page_count(zone_counts, view="page", page_size=PAGE_SIZE, expand=()):
+    """
+    Returns how many pages a view has, from {zone: rule count} (see classify_rules).
+    For "summary" that is the page count of the largest expanded zone.
+    """
+    if view == "page":
+        return max(1, -(-sum(zone_counts.values()) // _clamp_size(page_size)))
+    if view == "summary":
+        expanded = [zone for zone in expand if zone_counts.get(zone)]
+        size = _zone_window(page_size, expanded)
+        return max([1] + [-(-zone_counts[zone] // size) for zone in expanded])
+    return 1
+
+def _clamp_size(page_size):
+    return max(1, min(int(page_size), MAX_FULL_RULES))
+
+def _clamp_page(page, total, size):
+    return min(max(1, int(page)), max(1, -(-total // size)))
+
+def _zone_window(page_size, expand):
+    # Expanded zones share the rule budget so the whole chart stays under MAX_FULL_RULES
+    return max(1, min(_clamp_size(page_size), MAX_FULL_RULES // max(1, len(expand))))
+
+def _rule_node(rules, rule_zones, i):
+    rule = rules[i]
+    rule_id = rule.get('id', f'rule_{i}')
+    # Sanitize IDs
+    safe_id = "".join(c for c in rule_id if c.isalnum() or c in ['_'])
+    if not safe_id: safe_id = f"rule_{i}"
+    return {
+        "id": safe_id,
+        "trigger": str(rule.get('trigger', 'Condition')).translate(TRIGGER_ESCAPES),
+        "action": str(rule.get('action', 'Action')).translate(ACTION_ESCAPES),
+        "zone": rule_zones[i]
     }
-    
-    rules = logic_data.get('rules', [])
-    rule_map = {} # Store basic rule info for iteration
-
-    # 1. Classification Pass
-    for i, rule in enumerate(rules):
-        rule_id = rule.get('id', f'rule_{i}')
-        # Sanitize IDs
-        safe_id = "".join(c for c in rule_id if c.isalnum() or c in ['_'])
-        if not safe_id: safe_id = f"rule_{i}"
-        
-        trigger_text = rule.get('trigger', 'Condition').replace('"', "'").replace('(', '').replace(')', '')
-        action_text = rule.get('action', 'Action').replace('"', "'")
-        
-        trigger_lower = trigger_text.lower()
-        action_lower = action_text.lower()
-        
-        zone = "default"
-        if any(x in action_lower for x in ['shipping', 'fee']) or \
-           any(x in trigger_lower for x in ['weight', 'ship', 'location']):
-            zone = "logistics"
-        elif any(x in action_lower for x in ['discount', 'price', 'rate', 'total']) or \
-             any(x in trigger_lower for x in ['vip', 'promo']):
-            zone = "pricing"
-        elif 'error' in action_lower or 'return -' in action_lower or 'invalid' in action_lower:
-            zone = "validation"
-            
-        rule_map[i] = {
-            "id": safe_id,
-            "trigger": trigger_text,
-            "action": action_text,
-            "zone": zone
-        }
-        zones[zone].append(i)
+
+def _rule_flow(mermaid_lines, rules, rule_zones, window):
+    """
+    Draws the rules at the indices in window as one chain, grouped into zone subgraphs.
+    A window that does not cover every rule starts and ends at placeholder nodes that
+    count the rules before and after it.
+    """
+    # Organize rules by zone for subgraphs
+    zones = {zone: [] for zone in ZONE_ORDER}
+    rule_map = {}
+    for i in window:
+        rule_map[i] = _rule_node(rules, rule_zones, i)
+        zones[rule_map[i]["zone"]].append(i)
 
     # 2. Generate Subgraphs
     # We render subgraphs first to group nodes
-    
-    # Start Node (Global)
-    mermaid_lines.append("    Start((Start)):::startend")
-    
-    # Validation Cluster
-    if zones['validation']:
-        mermaid_lines.append("    subgraph Validation [🛡️ Validation]")
-        mermaid_lines.append("    direction TB")
-        for i in zones['validation']:
-            r = rule_map[i]
-            mermaid_lines.append(f"    {r['id']}{{\"{r['trigger']}\"}}:::validation")
-        mermaid_lines.append("    end")
-
-    # Pricing Cluster
-    if zones['pricing']:
-        mermaid_lines.append("    subgraph Pricing [💰 Pricing]")
-        mermaid_lines.append("    direction TB")
-        for i in zones['pricing']:
-            r = rule_map[i]
-            mermaid_lines.append(f"    {r['id']}{{\"{r['trigger']}\"}}:::pricing")
-        mermaid_lines.append("    end")
-
-    # Logistics Cluster
-    if zones['logistics']:
-        mermaid_lines.append("    subgraph Logistics [🚚 Logistics]")
-        mermaid_lines.append("    direction TB")
-        for i in zones['logistics']:
-            r = rule_map[i]
-            mermaid_lines.append(f"    {r['id']}{{\"{r['trigger']}\"}}:::logistics")
-        mermaid_lines.append("    end")
-        
+    if window.start > 0:
+        mermaid_lines.append(f"    Start((\"… {window.start} earlier rules\")):::startend")
+    else:
+        mermaid_lines.append("    Start((Start)):::startend")
+
+    for zone, (subgraph_id, title) in ZONE_SUBGRAPHS.items():
+        if zones[zone]:
+            mermaid_lines.append(f"    subgraph {subgraph_id} [{title}]")
+            mermaid_lines.append("    direction TB")
+            for i in zones[zone]:
+                r = rule_map[i]
+                mermaid_lines.append(f"    {r['id']}{{\"{r['trigger']}\"}}:::{zone}")
+            mermaid_lines.append("    end")
+
     # Default Nodes (No Cluster)
     for i in zones['default']:
         r = rule_map[i]
         mermaid_lines.append(f"    {r['id']}{{\"{r['trigger']}\"}}:::default")
 
     # 3. Generate Edges (The Flow)
-    last_node = "Start"
-    
-    for i in range(len(rules)):
+    last_node = _chain(mermaid_lines, rule_map, window, "Start")
+
+    # End Node
+    later = len(rules) - (window.stop if len(window) else window.start)
+    if later > 0:
+        mermaid_lines.append(f"    {last_node} --> End((\"… {later} more rules\")):::startend")
+    else:
+        mermaid_lines.append(f"    {last_node} --> End((End)):::startend")
+
+def _chain(mermaid_lines, rule_map, indices, last_node):
+    # Next edges through the rules in order, each with its action node; returns the last node
+    for i in indices:
         r = rule_map[i]
         curr_id = r['id']
         action_id = f"{curr_id}_action"
-        
+
         # Main Flow Edge
         mermaid_lines.append(f"    {last_node} -->|Next| {curr_id}")
-        
+
         # Action Node & Edge
         mermaid_lines.append(f"    {action_id}[\"{r['action']}\"]:::action")
         mermaid_lines.append(f"    {curr_id} -- Yes --> {action_id}")
-        
+
         last_node = curr_id
+    return last_node
 
-    # End Node
-    mermaid_lines.append(f"    {last_node} --> End((End)):::startend")
-    
-    return "\n".join(mermaid_lines)
+def _summary_flow(mermaid_lines, rules, rule_zones, page, page_size, expand):
+    """
+    Draws one summary node per zone, linked in the order the rules move between zones
+    (edge labels count the moves). Expanded zones also chain one page of their rules
+    from the summary node.
+    """
+    members = {zone: [] for zone in ZONE_ORDER}
+    for i, zone in enumerate(rule_zones):
+        members[zone].append(i)
+    expanded = [zone for zone in ZONE_ORDER if zone in expand and members[zone]]
+    size = _zone_window(page_size, expanded)
+
+    windows = {}
+    rule_map = {}
+    for zone in expanded:
+        start = (_clamp_page(page, len(members[zone]), size) - 1) * size
+        windows[zone] = members[zone][start:start + size]
+        for i in windows[zone]:
+            rule_map[i] = _rule_node(rules, rule_zones, i)
+
+    mermaid_lines.append("    Start((Start)):::startend")
+    for zone in ZONE_ORDER:
+        if not members[zone]:
+            continue
+        subgraph = ZONE_SUBGRAPHS.get(zone)
+        if subgraph is not None:
+            mermaid_lines.append(f"    subgraph {subgraph[0]} [{subgraph[1]}]")
+            mermaid_lines.append("    direction TB")
+        label = f"{subgraph[1] if subgraph else 'Other rules'}<br/>{len(members[zone])} rules"
+        if zone in windows:
+            first = members[zone].index(windows[zone][0]) + 1
+            label += f"<br/>showing {first}-{first + len(windows[zone]) - 1}"
+        mermaid_lines.append(f"    zone_{zone}[[\"{label}\"]]:::{zone}")
+        for i in windows.get(zone, []):
+            r = rule_map[i]
+            mermaid_lines.append(f"    {r['id']}{{\"{r['trigger']}\"}}:::{zone}")
+        if subgraph is not None:
+            mermaid_lines.append("    end")
+
+    # Zone-to-zone moves along the rule order, counted
+    moves = {}
+    for previous, current in zip(rule_zones, rule_zones[1:]):
+        if previous != current:
+            moves[(previous, current)] = moves.get((previous, current), 0) + 1
+    if rule_zones:
+        mermaid_lines.append(f"    Start --> zone_{rule_zones[0]}")
+    for (previous, current), count in moves.items():
+        mermaid_lines.append(f"    zone_{previous} -->|{count}x| zone_{current}")
+    for zone in expanded:
+        _chain(mermaid_lines, rule_map, windows[zone], f"zone_{zone}")
+    mermaid_lines.append(f"    {f'zone_{rule_zones[-1]}' if rule_zones else 'Start'} --> End((End)):::startend")
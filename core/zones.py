@@ -0,0 +1,131 @@
+import json
+import os
+import re
+import threading
+from functools import lru_cache
+
+# Shared zone classifier for the visualizers.
+# All keywords are compiled into one regex per rule field, so classifying a rule is a
+# single scan of its trigger and a single scan of its action. Results are memoized per
+# (trigger, action) text.
+#
+# Keywords match whole words; a trailing "*" matches any word starting with the keyword
+# ("ship*" matches "shipping"). Zones are tried in ZONE_PRIORITY order.
+
+ZONE_PRIORITY = ["logistics", "pricing", "validation"]
+
+DEFAULT_KEYWORDS = {
+    "logistics": {
+        "action": ["shipping*", "fee*", "freight*", "deliver*"],
+        "trigger": ["weight*", "destination*", "ship*", "location*", "ak", "hi", "country", "zip*"],
+    },
+    "pricing": {
+        "action": ["discount*", "total*", "price*", "pricing", "rate*"],
+        "trigger": ["vip", "promo*", "customer*", "coupon*"],
+    },
+    "validation": {
+        "action": ["return -*", "error*", "invalid*", "reject*", "raise*"],
+        "trigger": ["banned", "null", "none", "empty", "invalid*", "missing"],
+    },
+}
+
+# Optional JSON file with the same shape as DEFAULT_KEYWORDS
+KEYWORDS_FILE = os.getenv("LOGIC_FOUNDRY_ZONE_KEYWORDS")
+
+_lock = threading.Lock()
+_state = {}
+
+
+def _compile_field(keywords, field):
+    """
+    Compiles every zone's keywords for one field into a single alternation.
+    Returns (pattern, {keyword: zones}).
+    """
+    owners = {}
+    alternatives = []
+    for zone in ZONE_PRIORITY:
+        for keyword in keywords.get(zone, {}).get(field, []):
+            prefix = keyword.endswith("*")
+            word = keyword.rstrip("*").lower()
+            if not word:
+                continue
+            owners.setdefault(word, set()).add(zone)
+            tail = "" if prefix else r"(?!\w)"
+            alternatives.append(re.escape(word) + tail)
+
+    if not alternatives:
+        return None, owners
+    # Longest first so "shipping" wins over "ship" at the same position
+    alternatives.sort(key=len, reverse=True)
+    pattern = re.compile(r"(?<!\w)(?:" + "|".join(alternatives) + ")", re.IGNORECASE)
+    return pattern, owners
+
+
+def configure(keywords=None):
+    """
+    Installs a keyword set (defaults to DEFAULT_KEYWORDS, or the JSON file named by
+    LOGIC_FOUNDRY_ZONE_KEYWORDS) and clears the per-rule cache.
+    """
+    if keywords is None:
+        keywords = DEFAULT_KEYWORDS
+        if KEYWORDS_FILE and os.path.exists(KEYWORDS_FILE):
+            with open(KEYWORDS_FILE, "r", encoding="utf-8") as f:
+                keywords = json.load(f)
+
+    trigger_re, trigger_owners = _compile_field(keywords, "trigger")
+    action_re, action_owners = _compile_field(keywords, "action")
+    with _lock:
+        _state.update(
+            keywords=keywords,
+            trigger_re=trigger_re,
+            trigger_owners=trigger_owners,
+            action_re=action_re,
+            action_owners=action_owners,
+        )
+        _classify_text.cache_clear()
+
+
+def current_keywords():
+    """
+    Returns the keyword set in use, e.g. to key cached renders by it.
+    """
+    if not _state:
+        configure()
+    return _state["keywords"]
+
+
+def _zones_in(text, pattern, owners):
+    found = set()
+    if pattern is None or not text:
+        return found
+    for match in pattern.finditer(text):
+        found |= owners.get(match.group(0).lower(), set())
+    return found
+
+
+@lru_cache(maxsize=65536)
+def _classify_text(trigger, action):
+    hits = _zones_in(trigger, _state["trigger_re"], _state["trigger_owners"])
+    hits |= _zones_in(action, _state["action_re"], _state["action_owners"])
+    for zone in ZONE_PRIORITY:
+        if zone in hits:
+            return zone
+    return "default"
+
+
+def classify_rule(rule):
+    """
+    Returns the zone ("logistics", "pricing", "validation" or "default") for one rule dict.
+    """
+    if not _state:
+        configure()
+    return _classify_text(str(rule.get("trigger") or ""), str(rule.get("action") or ""))
+
+
+def classify_rules(rules):
+    """
+    Classifies a list of rules in one pass and returns their zones in the same order.
+    """
+    if not _state:
+        configure()
+    return [_classify_text(str(r.get("trigger") or ""), str(r.get("action") or "")) for r in rules]
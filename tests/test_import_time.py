@@ -0,0 +1,29 @@
+import pytest
+
+from benchmarks import import_time
+
+# Enforces the import-time budget from benchmarks/import_time.py:
+#
+#   python -m pytest tests
+#
+# Each core module is imported in a fresh interpreter. Heavy SDKs must stay out of
+# the import, and the best of a few cold imports must fit LOGIC_FOUNDRY_IMPORT_BUDGET_MS.
+
+
+@pytest.fixture(scope="module", params=import_time.MODULES)
+def samples(request):
+    return request.param, [import_time.measure(request.param) for _ in range(import_time.RUNS)]
+
+
+def test_no_heavy_imports(samples):
+    module, runs = samples
+    imported = runs[0][1]
+    assert module in imported
+    heavy = sorted(h for h in import_time.HEAVY if h in imported)
+    assert not heavy, f"{module} imports {', '.join(heavy)} at import time"
+
+
+def test_import_budget(samples):
+    module, runs = samples
+    best_ms = min(ms for ms, _ in runs)
+    assert best_ms <= import_time.BUDGET_MS, f"{module} took {best_ms:.1f} ms (budget {import_time.BUDGET_MS:.0f} ms)"